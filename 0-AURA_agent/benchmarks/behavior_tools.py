@@ -0,0 +1,381 @@
+# behavior_tools.py
+# Scaling benchmark for the financial behavior tools on synthetic bank data.
+#
+# generate_dataset() writes a seeded fetch_bank_transactions-style file in the real
+# compact schema ([amount, narration, date, type code, mode, balance] per row, newest
+# first, running balances) with UPI/IMPS/NEFT/ATM narrations, monthly salary, autopay
+# subscriptions and EMIs, and discretionary spending drawn over DAYS of history. Rows
+# are spread over accounts of ROWS_PER_ACCOUNT rows each, so 10M rows stay ~2 years.
+#
+# Each size runs in a fresh interpreter, once for timings and once under tracemalloc,
+# through the same calls a chat turn makes: load (fim_connector, cold cache), history
+# window, spending patterns, triggers, biases and nudge. Later steps reuse what earlier
+# ones cached (the loaded dataset, the analysis context), as they do in a real turn.
+# One JSON line per step is appended to --output, so runs can be compared:
+#
+#   python benchmarks/behavior_tools.py                          # 1k .. 1M rows
+#   python benchmarks/behavior_tools.py --rows 10000000          # 10M rows
+#   python benchmarks/behavior_tools.py --baseline old.jsonl     # show change vs an earlier run
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+AGENT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_ROWS = [1_000, 10_000, 100_000, 1_000_000]
+MAX_ROWS = 10_000_000
+DAYS = 730
+ROWS_PER_ACCOUNT = 4_000
+END_DATE = date(2025, 7, 9)
+HISTORY_DAYS = 60
+# Bump whenever the generator changes, so older cached datasets are not reused.
+GENERATOR_VERSION = 1
+
+DATA_DIR = Path(os.getenv("BENCHMARK_DATA_DIR", Path(tempfile.gettempdir()) / "aura_benchmarks"))
+RESULTS_FILE = AGENT_ROOT / "benchmarks" / "results" / "behavior_tools.jsonl"
+
+STEPS = ["load", "history_window", "spending_patterns", "emotional_triggers", "financial_biases", "nudge"]
+
+BANKS = ["HDFC Bank", "ICICI Bank", "State Bank of India", "Axis Bank", "Kotak Mahindra Bank"]
+
+SCHEMA_DESCRIPTION = (
+    "A list of bank transactions. Each 'txns' field is a list of data arrays with schema: [transactionAmount, "
+    "transactionNarration, transactionDate, transactionType (1 for CREDIT, 2 for DEBIT, 3 for OPENING, 4 for "
+    "INTEREST, 5 for TDS, 6 for INSTALLMENT, 7 for CLOSING and 8 for OTHERS), transactionMode, currentBalance]."
+)
+
+# Discretionary rows: (narration prefix, narration suffix, type code, mode, median amount, weight).
+# A 12-digit reference number goes between prefix and suffix, as in real UPI narrations.
+SPENDING = [
+    ("UPI-SWIGGY-SWIGGY8@YBL-YESB0YBLUPI-", "-PAYMENT FROM PHONE", 2, "UPI", 350, 10),
+    ("UPI-ZOMATO LTD-ZOMATO.PAYU@AXISBANK-UTIB0000100-", "-PAYMENT FROM PHONE", 2, "UPI", 420, 8),
+    ("UPI-UBER INDIA SYSTEMS P-UBERRIDES@HDFCBANK-HDFC0000499-", "-CHARGE", 2, "UPI", 260, 7),
+    ("UPI-OLA-OLAONLINE@YBL-YESB0YBLUPI-", "-PAYMENT FROM PHONE", 2, "UPI", 220, 5),
+    ("UPI-AISHWARYA MINI MART-Q36365093@YBL-YESB0YBLUPI-", "-PAYMENT FROM PHONE", 2, "UPI", 540, 8),
+    ("UPI-BIGBASKET-BIGBASKET@ICICI-ICIC0000001-", "-UPI", 2, "UPI", 1200, 5),
+    ("UPI-DUNZO DIGITAL PRIVAT-DUNZO1.PAYU@INDUS-INDB0002201-", "-PAYMENT FROM PHONE", 2, "UPI", 310, 4),
+    ("UPI-AMAZON PAY-AMAZON@APL-UTIB0000553-", "-PAYMENT FROM PHONE", 2, "UPI", 1500, 5),
+    ("UPI-FLIPKART INTERNET-FLIPKART.PAYU@AXISBANK-UTIB0000100-", "-UPI", 2, "UPI", 1800, 3),
+    ("UPI-GIRRAJ MEDICAL STORE-PAYTMQR28100505010111A10BLF7BGA@PAYTM-PYTM0123456-", "-UPI", 2, "UPI", 450, 3),
+    ("UPI-SUMAN  SWAROOP-SUMANSWAR12@OKSBI-SBIN0006652-", "-PETROL", 2, "UPI", 1500, 3),
+    ("UPI-MAHESH S-Q60573690@YBL-KKBK0008043-", "-PAYMENT FROM PHONE", 2, "UPI", 150, 6),
+    ("UPI-SANJAY AGRAWAL-SANJAY30AGRAWAL@OKICICI-ICIC0000274-", "-TRANSFER", 2, "UPI", 2500, 3),
+    ("UPI-DREAMPLUG TECHNOLOGI-CRED@AXISB-UTIB0000114-", "-CREDIT CARD BILL P", 2, "UPI", 9000, 2),
+    ("UPI-PHONEPE-BILLDESKPP@YBL-YESB0YBLUPI-", "-PAYMENT FOR CATEGO", 2, "UPI", 700, 2),
+    ("NWD-438624XXXXXX3427-", "-BANGALORE MET", 2, "ATM", 2000, 2),
+    ("INST-ALERT CHG INC GST-MIR", "", 5, "OTHERS", 18, 1),
+    ("UPI-RAVISHANKAR-Q78015288@YBL-YESB0YBLUPI-", "-PAYMENT FROM PHONE", 1, "UPI", 800, 3),
+    ("UPI-HARDIK  AGRAWAL-9971488189.NIYO@IDFCBANK-IDFB0040101-", "-UPI", 1, "UPI", 1500, 2),
+]
+
+# Scheduled rows: (narration prefix, narration suffix, type code, mode, amount, period in days).
+SCHEDULED = [
+    ("SALARY FROM MEDISYNC HEALTH MANAGEMENT SERVICES P L ", "", 1, "FT", 85000, 30.44),
+    ("UPI-NETFLIX COM-NETFLIXUPI@HDFCBANK-HDFC0000001-", "-MONTHLY AUTOPAY", 2, "UPI", 649, 30.44),
+    ("UPI-ACT BROADBAND-PAYTM-ACTBAN4@PAYTM-PYTM0123456-", "-PAYMENT FOR SUBSCR", 2, "UPI", 1180, 30.44),
+    ("IMPS-", "-ADITYA BIRLA SUN LIF-HDFC-XXXXXXXX3578-RD3192534", 2, "FT", 5000, 30.44),
+    ("EMI 0417 LOAN RECOVERY ", "", 6, "OTHERS", 12500, 30.44),
+    ("CREDIT INTEREST CAPITALISED ", "", 4, "OTHERS", 540, 91.31),
+    ("TDS ON INTEREST ", "", 5, "OTHERS", 54, 91.31),
+]
+
+GOALS = [
+    {"name": "Emergency Fund", "type": "savings", "target_amount": 300000, "saved": 45000},
+    {"name": "Vacation", "type": "savings", "target_amount": 120000, "saved": 110000},
+]
+
+
+def _templates():
+    """SCHEDULED then SPENDING as parallel arrays (prefix, suffix, type code, mode)."""
+    rows = [row[:4] for row in SCHEDULED + SPENDING]
+    return [list(column) for column in zip(*rows)]
+
+PREFIXES, SUFFIXES, TYPE_CODES, TEMPLATE_MODES = _templates()
+CREDIT_CODES = (1, 3, 4)
+WEEKEND_WEIGHT = 1.5
+SALARY = 0          # index in SCHEDULED
+SAVINGS_RATE = 1.1
+
+
+def _account_rows(rng: np.random.Generator, n: int, days: int, offsets: List[float]) -> List[List[Any]]:
+    """
+    n rows for one account over the last `days` days, newest first, with running balances.
+    offsets[i] is the first due day of SCHEDULED[i].
+    """
+    first_day = (END_DATE - timedelta(days=days - 1)).toordinal()
+    templates, amounts, day_numbers = [], [], []
+    for index, (_, _, _, _, amount, period) in enumerate(SCHEDULED):
+        due = np.arange(offsets[index], days, period).astype(np.int64)
+        templates.append(np.full(len(due), index))
+        amounts.append(np.full(len(due), float(amount)))
+        day_numbers.append(due)
+    template = np.concatenate(templates)[:n]
+    amount = np.concatenate(amounts)[:n]
+    day_number = np.concatenate(day_numbers)[:n]
+
+    extra = n - len(template)
+    if extra > 0:
+        weights = np.array([row[5] for row in SPENDING], dtype=float)
+        picks = rng.choice(len(SPENDING), extra, p=weights / weights.sum())
+        medians = np.array([row[4] for row in SPENDING], dtype=float)
+        # Discretionary spending is busier on weekends.
+        day_weights = np.where(np.isin((first_day + np.arange(days) + 6) % 7, (5, 6)), WEEKEND_WEIGHT, 1.0)
+        template = np.concatenate([template, len(SCHEDULED) + picks])
+        amount = np.concatenate([amount, np.round(medians[picks] * rng.lognormal(0.0, 0.5, extra), 2)])
+        day_number = np.concatenate([day_number, rng.choice(days, extra, p=day_weights / day_weights.sum())])
+
+    order = np.argsort(-day_number, kind="stable")
+    template, amount, day_number = template[order], amount[order], day_number[order]
+    credit = np.isin(np.array(TYPE_CODES)[template], CREDIT_CODES)
+    # Salary covers the account's spending with ~10% to spare, so balances stay plausible.
+    salary = template == SALARY
+    if salary.any():
+        shortfall = amount[~credit].sum() * SAVINGS_RATE - amount[credit & ~salary].sum()
+        amount[salary] = max(float(SCHEDULED[SALARY][4]), np.round(shortfall / salary.sum(), -2))
+    signed = np.where(credit, amount, -amount)
+    # Balances run forward in time while rows are listed newest first.
+    balance = 50000.0 + np.cumsum(signed[::-1])[::-1]
+    refs = rng.integers(10 ** 11, 10 ** 12, n)
+    dates = [date.fromordinal(first_day + day).isoformat() for day in range(days)]
+    return [
+        [f"{a:.2f}", PREFIXES[t] + str(r) + SUFFIXES[t], dates[d], TYPE_CODES[t], TEMPLATE_MODES[t], f"{b:.2f}"]
+        for t, a, d, r, b in zip(template.tolist(), amount.tolist(), day_number.tolist(), refs.tolist(), balance.tolist())
+    ]
+
+
+def generate_payload(rows: int, seed: int = 0, banks: Sequence[str] = BANKS[:1]) -> Dict[str, Any]:
+    """
+    In-memory payload ({"bankTransactions": [...]}) for (rows, seed), one account per
+    bank sharing one schedule; the tests build their frames from it.
+    """
+    rng = np.random.default_rng(seed)
+    offsets = [rng.uniform(0, row[5]) for row in SCHEDULED]
+    sizes = [rows // len(banks) + (1 if i < rows % len(banks) else 0) for i in range(len(banks))]
+    return {"bankTransactions": [{"bank": bank, "txns": _account_rows(rng, size, DAYS, offsets)}
+                                 for bank, size in zip(banks, sizes)]}
+
+
+def dataset_path(rows: int, seed: int) -> Path:
+    return DATA_DIR / f"bank_transactions_v{GENERATOR_VERSION}_{rows}_{seed}.json"
+
+
+def generate_dataset(rows: int, seed: int = 0, path: Optional[Path] = None) -> Path:
+    """Write (or reuse) the synthetic dataset for (rows, seed); the same inputs always give the same file."""
+    if not 0 < rows <= MAX_ROWS:
+        raise ValueError(f"rows must be between 1 and {MAX_ROWS:,}")
+    path = path or dataset_path(rows, seed)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    accounts = -(-rows // ROWS_PER_ACCOUNT)
+    sizes = [rows // accounts + (1 if i < rows % accounts else 0) for i in range(accounts)]
+    # One schedule for the whole dataset: it is one user's salary day, autopay date, etc.
+    offsets = [rng.uniform(0, row[5]) for row in SCHEDULED]
+    partial = path.with_suffix(".partial")
+    # Written one account at a time, so 10M rows never sit in memory as Python lists.
+    with open(partial, "w", encoding="utf-8") as f:
+        f.write(f'{{"schemaDescription": {json.dumps(SCHEMA_DESCRIPTION)}, "bankTransactions": [')
+        for index, size in enumerate(sizes):
+            account = {"bank": BANKS[index % len(BANKS)], "txns": _account_rows(rng, size, DAYS, offsets)}
+            f.write(("," if index else "") + json.dumps(account, separators=(",", ":")))
+        f.write(f'], "financial_goals": {json.dumps(GOALS)}}}')
+    partial.replace(path)
+    return path
+
+
+def _peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_steps(path: Path, trace: bool = False, snapshot: bool = False, history_days: int = HISTORY_DAYS) -> List[Dict[str, Any]]:
+    """Run the tool steps once over the dataset at path; one result dict per step."""
+    sys.path.insert(0, str(AGENT_ROOT))
+    from main_agent.sub_agents.financial_behavior_agent import fim_connector, tools
+    from main_agent.sub_agents.financial_behavior_agent.analytics_executor import analytics_executor
+
+    fim_connector.LOCAL_DATA_FILE = path
+    # Without --snapshot, point the snapshot at a file that never exists so JSON is read.
+    fim_connector.LOCAL_SNAPSHOT_FILE = path.with_suffix(".snap" if snapshot else ".nosnap")
+    if snapshot:
+        if not fim_connector._snapshot_is_current():
+            fim_connector.write_local_snapshot()
+        fim_connector.invalidate_local_data()
+    # Large histories legitimately take longer than the chat deadline.
+    analytics_executor.timeout = 0
+
+    state: Dict[str, Any] = {}
+
+    async def spending_patterns():
+        state["goals"] = await fim_connector.get_local_user_goals()
+        state["patterns"] = await tools.analyze_spending_patterns()
+        return state["patterns"]
+
+    async def financial_biases():
+        state["biases"] = await tools.identify_financial_biases(financial_goals=state["goals"])
+        return state["biases"]
+
+    steps = {
+        "load": lambda: fim_connector.load_local_dataset(),
+        "history_window": lambda: fim_connector.get_local_transaction_history(history_days),
+        "spending_patterns": spending_patterns,
+        "emotional_triggers": lambda: tools.identify_emotional_triggers(
+            user_text_input="I get stressed at the end of the month and order food to feel better."),
+        "financial_biases": financial_biases,
+        "nudge": lambda: tools.generate_financial_nudge(
+            state["biases"].get("biases", []), state["patterns"], state["goals"]),
+    }
+
+    loop = asyncio.new_event_loop()
+    results = []
+    if trace:
+        tracemalloc.start()
+    try:
+        for name in STEPS:
+            if trace:
+                tracemalloc.reset_peak()
+                held = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+            value = steps[name]()
+            if asyncio.iscoroutine(value):
+                value = loop.run_until_complete(value)
+            seconds = time.perf_counter() - start
+            # Peak above what was already allocated when the step started.
+            traced = (tracemalloc.get_traced_memory()[1] - held) / (1024 * 1024) if trace else None
+            results.append({
+                "step": name,
+                "seconds": round(seconds, 4),
+                "peak_rss_mb": _peak_rss_mb(),
+                "traced_peak_mb": round(traced, 1) if traced is not None else None,
+                "result_bytes": len(json.dumps(value, default=str)) if name != "load" else None,
+            })
+    finally:
+        if trace:
+            tracemalloc.stop()
+        analytics_executor.shutdown()
+        loop.close()
+    return results
+
+
+def _child(path: Path, trace: bool, snapshot: bool, history_days: int) -> List[Dict[str, Any]]:
+    """run_steps in a fresh interpreter, so every size starts with cold caches and its own peak RSS."""
+    command = [sys.executable, str(Path(__file__).resolve()), "--child", str(path), "--history-days", str(history_days)]
+    command += ["--trace"] if trace else []
+    command += ["--snapshot"] if snapshot else []
+    proc = subprocess.run(command, cwd=AGENT_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=AGENT_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    import pandas
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pandas.__version__,
+        "executor": os.getenv("ANALYTICS_EXECUTOR", "thread"),
+    }
+
+
+def load_baseline(path: Path) -> Dict[tuple, Dict[str, Any]]:
+    """The latest record per (rows, source, step) in an earlier results file."""
+    baseline: Dict[tuple, Dict[str, Any]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                baseline[(record["rows"], record.get("source", "json"), record["step"])] = record
+    return baseline
+
+
+def _change(value: Optional[float], before: Optional[float]) -> str:
+    if value is None or not before:
+        return ""
+    return f" ({(value - before) / before:+.0%})"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time and memory-profile the behavior tools on synthetic bank data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Dataset sizes (up to 10M rows)")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed")
+    parser.add_argument("--history-days", type=int, default=HISTORY_DAYS, help="Window for the history step")
+    parser.add_argument("--snapshot", action="store_true", help="Load from a binary snapshot instead of JSON")
+    parser.add_argument("--no-trace", action="store_true", help="Skip the tracemalloc run (timings and peak RSS only)")
+    parser.add_argument("--output", type=Path, default=RESULTS_FILE, help="JSON lines file to append results to")
+    parser.add_argument("--baseline", type=Path, help="Earlier results file to compare against")
+    parser.add_argument("--generate-only", action="store_true", help="Only write the datasets")
+    parser.add_argument("--child", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--trace", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_steps(args.child, args.trace, args.snapshot, args.history_days)))
+        return 0
+
+    baseline = load_baseline(args.baseline) if args.baseline else {}
+    environment = _environment()
+    source = "snapshot" if args.snapshot else "json"
+    timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    failed = 0
+    for rows in args.rows:
+        start = time.perf_counter()
+        path = generate_dataset(rows, args.seed)
+        print(f"[bench] {rows:,} rows: {path} ({path.stat().st_size / (1024 * 1024):.1f} MB, ready in {time.perf_counter() - start:.1f}s)")
+        if args.generate_only:
+            continue
+        try:
+            timings = _child(path, False, args.snapshot, args.history_days)
+            traced = _child(path, True, args.snapshot, args.history_days) if not args.no_trace else [{}] * len(timings)
+        except RuntimeError as e:
+            print(f"FAIL {rows:,} rows: {e}")
+            failed += 1
+            continue
+        with open(args.output, "a", encoding="utf-8") as out:
+            for timing, memory in zip(timings, traced):
+                record = {
+                    "timestamp": timestamp, "rows": rows, "seed": args.seed, "generator": GENERATOR_VERSION, "source": source,
+                    "history_days": args.history_days, **environment, **timing,
+                    "traced_peak_mb": memory.get("traced_peak_mb"),
+                }
+                out.write(json.dumps(record) + "\n")
+                before = baseline.get((rows, source, timing["step"]), {})
+                traced_text = f"  traced {record['traced_peak_mb']:.1f} MB" if record["traced_peak_mb"] is not None else ""
+                print(f"  {timing['step']:<20} {timing['seconds']:9.3f}s{_change(timing['seconds'], before.get('seconds'))}"
+                      f"  rss {timing['peak_rss_mb']} MB{traced_text}{_change(record['traced_peak_mb'], before.get('traced_peak_mb'))}")
+    if not args.generate_only:
+        print(f"[bench] Results appended to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
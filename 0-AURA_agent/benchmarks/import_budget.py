@@ -0,0 +1,90 @@
+# import_budget.py
+# Import-time budget for the agent packages.
+#
+# Each module is imported in a fresh interpreter (so nothing is already cached in
+# sys.modules) and timed; the import must fit its budget and must not leave threads
+# running or a Firebase app initialized behind it.
+#
+#   python benchmarks/import_budget.py            # check every module
+#   python benchmarks/import_budget.py --runs 5   # best of 5 per module
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+AGENT_ROOT = Path(__file__).resolve().parent.parent
+
+# module -> budget in seconds, for the module's own cost on top of a bare interpreter.
+BUDGETS = {
+    "mcp_client": 0.1,
+    "firebase_sync": 0.1,
+    "main_agent.tools.read_cache": 0.1,
+    "main_agent.tools.poller": 0.1,
+    "main_agent.tools.instrumentation": 0.1,
+    "main_agent.tools.portfolio_api": 1.0,
+    # fim_connector normalizes transactions with pandas, so it pays for importing it.
+    "main_agent.sub_agents.financial_behavior_agent.fim_connector": 0.5,
+    "main_agent.sub_agents.financial_behavior_agent.tools": 1.0,
+}
+
+_PROBE = """
+import json, sys, threading, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+firebase = sys.modules.get("firebase_admin")
+print(json.dumps({{
+    "seconds": elapsed,
+    "threads": sorted(t.name for t in threading.enumerate() if t is not threading.main_thread()),
+    "firebase_apps": len(getattr(firebase, "_apps", {{}})) if firebase else 0,
+    "loaded": sorted(m for m in ("firebase_admin", "mcp", "google.generativeai") if m in sys.modules),
+}}))
+"""
+
+
+def probe(module: str) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(AGENT_ROOT), os.getenv("PYTHONPATH")])))
+    proc = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)],
+                          cwd=AGENT_ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check import time and import side effects of the agent modules.")
+    parser.add_argument("modules", nargs="*", help="Modules to check (default: all with a budget)")
+    parser.add_argument("--runs", type=int, default=3, help="Imports per module; the fastest counts")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for module in args.modules or BUDGETS:
+        budget = BUDGETS.get(module, 1.0)
+        results = [probe(module) for _ in range(max(1, args.runs))]
+        errors = [r["error"] for r in results if "error" in r]
+        if errors:
+            print(f"FAIL {module}: import error: {errors[0]}")
+            failed += 1
+            continue
+        best = min(r["seconds"] for r in results)
+        last = results[-1]
+        problems = []
+        if best > budget:
+            problems.append(f"{best:.3f}s over budget {budget:.3f}s")
+        if last["threads"]:
+            problems.append(f"threads started: {', '.join(last['threads'])}")
+        if last["firebase_apps"]:
+            problems.append("Firebase app initialized")
+        status = "FAIL" if problems else "ok"
+        detail = "; ".join(problems) or f"{best:.3f}s (budget {budget:.3f}s)"
+        loaded = f" [loaded: {', '.join(last['loaded'])}]" if last["loaded"] else ""
+        print(f"{status:4} {module}: {detail}{loaded}")
+        failed += bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
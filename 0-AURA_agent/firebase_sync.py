@@ -0,0 +1,116 @@
+# firebase_sync.py
+# Change detection and writes for the per-user financial_data documents.
+#
+# Next to financial_data/{user_id} we keep financial_digests/{user_id}: one content
+# hash per section (net_worth, credit_report, ...). Deciding whether a freshly fetched
+# payload is new only needs that small node, not a download of the whole document.
+#
+# Writes are deltas: only sections whose digest changed are read back and diffed, and
+# the changed leaves (down to single transactions) go out in one multi-path update().
+# Sections whose fetch failed arrive as {} and are left as they are, digest included.
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+
+DATA_ROOT = "financial_data"
+DIGESTS_ROOT = "financial_digests"
+
+
+def section_digest(value: Any) -> str:
+    """Stable content hash of one section (key order does not matter)."""
+    encoded = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+def compute_digests(data: Dict[str, Any]) -> Dict[str, str]:
+    return {section: section_digest(value) for section, value in data.items()}
+
+def changed_sections(stored_digests: Optional[Dict[str, str]], new_digests: Dict[str, str]) -> List[str]:
+    """Sections of new_digests whose hash differs from (or is missing in) stored_digests."""
+    stored_digests = stored_digests or {}
+    return [section for section, digest in new_digests.items() if stored_digests.get(section) != digest]
+
+def load_digests(ref, user_id: str) -> Optional[Dict[str, str]]:
+    return ref.child(f"{DIGESTS_ROOT}/{user_id}").get()
+
+def _is_empty(value: Any) -> bool:
+    # Firebase does not store nulls or empty containers; all of them read back as absent.
+    return value is None or (isinstance(value, (dict, list)) and not value)
+
+def _children(value: Any) -> Dict[str, Any]:
+    # Firebase stores lists as objects keyed "0", "1", ... and may return either form.
+    if isinstance(value, list):
+        return {str(i): v for i, v in enumerate(value) if v is not None}
+    return {str(k): v for k, v in value.items()}
+
+def diff_paths(old: Any, new: Any, path: str, updates: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Collect {path: value} updates that turn old into new; a value of None deletes the path.
+    List elements are matched by index. When more than half of a list's elements changed
+    (e.g. new transactions were prepended and shifted every index), the list is replaced
+    as a single path instead of one or more paths per element.
+    """
+    if updates is None:
+        updates = {}
+    if _is_empty(new):
+        if not _is_empty(old):
+            updates[path] = None
+        return updates
+    if not isinstance(new, (dict, list)) or not isinstance(old, (dict, list)) or _is_empty(old):
+        if old != new:
+            updates[path] = new
+        return updates
+
+    old_children, new_children = _children(old), _children(new)
+    child_updates: Dict[str, Any] = {}
+    for key in old_children.keys() - new_children.keys():
+        child_updates[f"{path}/{key}"] = None
+    for key, value in new_children.items():
+        diff_paths(old_children.get(key), value, f"{path}/{key}", child_updates)
+
+    # Elements touched at any depth, not only those replaced whole.
+    changed = {child_path[len(path) + 1:].split('/', 1)[0] for child_path in child_updates}
+    if isinstance(new, list) and len(changed) > len(new_children) / 2:
+        updates[path] = new
+    else:
+        updates.update(child_updates)
+    return updates
+
+def build_delta(user_id: str, data: Dict[str, Any], old_sections: Dict[str, Any],
+                digests: Dict[str, str]) -> Dict[str, Any]:
+    """Multi-path update (relative to the root) for the sections in old_sections, plus their digests."""
+    updates: Dict[str, Any] = {}
+    for section, old in old_sections.items():
+        diff_paths(old, data.get(section), f"{DATA_ROOT}/{user_id}/{section}", updates)
+        updates[f"{DIGESTS_ROOT}/{user_id}/{section}"] = digests[section]
+    return updates
+
+def sync_user_data(ref, user_id: str, data: Dict[str, Any], failed: Iterable[str] = ()) -> List[str]:
+    """
+    Bring financial_data/{user_id} in line with data, writing only what changed.
+    Sections in failed (endpoints that errored or timed out) are skipped entirely.
+    Returns the changed section keys (empty if nothing changed).
+    """
+    failed = set(failed)
+    if failed:
+        data = {section: value for section, value in data.items() if section not in failed}
+    digests = compute_digests(data)
+    stored = load_digests(ref, user_id)
+    old_sections: Dict[str, Any] = {}
+    if stored is None:
+        # No digests yet (first sync or data written before digests existed):
+        # read the document once and diff against it.
+        old_doc = ref.child(f"{DATA_ROOT}/{user_id}").get() or {}
+        changed = changed_sections(compute_digests(old_doc), digests)
+        old_sections = {section: old_doc.get(section) for section in changed}
+    else:
+        changed = changed_sections(stored, digests)
+        for section in changed:
+            old_sections[section] = ref.child(f"{DATA_ROOT}/{user_id}/{section}").get()
+
+    updates = build_delta(user_id, data, old_sections, digests)
+    if stored is None:
+        updates.update({f"{DIGESTS_ROOT}/{user_id}/{section}": digest for section, digest in digests.items()})
+    if updates:
+        ref.update(updates)
+    return changed
@@ -1 +1,9 @@
-from . import agent
\ No newline at end of file
+import importlib
+
+
+def __getattr__(name):
+    # `agent` is imported on first access (ADK loads it as <package>.agent), so importing
+    # the package or one of its submodules does not build the agents.
+    if name == "agent":
+        return importlib.import_module(f"{__name__}.agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
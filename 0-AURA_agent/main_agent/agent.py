@@ -4,6 +4,7 @@ from google.adk.tools.agent_tool import AgentTool
 from .sub_agents.google_agent.agent import google_agent
 from .sub_agents.finance_agent.agent import finance_agent
 from .sub_agents.Scenario_simulater_agent.agent import Scenario_agent
+from .tools.portfolio_api import start_services
 
 
 root_agent = Agent(
@@ -75,5 +76,8 @@ root_agent = Agent(
         AgentTool(google_agent,Scenario_agent),
     ],
 
+    # Polling and alert delivery start with the app's first turn and stop at exit.
+    before_agent_callback=start_services,
+
 
 )
\ No newline at end of file
@@ -1,5 +1,5 @@
 from google.adk.agents import Agent
-from ...tools.portfolio_api import portfolio_flow_tool
+from ...tools.portfolio_api import portfolio_flow_tool, start_services
 
 finance_agent = Agent(
     name="FinanceAgent",
@@ -15,6 +15,7 @@ finance_agent = Agent(
         "Never expose raw JSON or code. Always keep responses friendly and supportive."
     ),
     tools=[portfolio_flow_tool],
+    before_agent_callback=start_services,
 )
 
 root_agent = finance_agent
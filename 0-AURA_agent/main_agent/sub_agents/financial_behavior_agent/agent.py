@@ -9,55 +9,68 @@ from datetime import datetime, timedelta
 
 
 script_dir = Path(__file__).parent.resolve()
-print(f"DEBUG: Script directory: {script_dir}")
-
-expected_env_path = script_dir.parent / '.env' 
-print(f"DEBUG: Expected .env path: {expected_env_path}")
-print(f"DEBUG: Does .env exist at expected path? {expected_env_path.exists()}")
-
-load_dotenv(dotenv_path=expected_env_path)
-
-print(f"DEBUG: Current working directory (where you run the command): {os.getcwd()}")
-print(f"DEBUG: GOOGLE_API_KEY loaded: {'YES' if os.getenv('GOOGLE_API_KEY') else 'NO'}")
-print(f"DEBUG: FIREBASE_SERVICE_ACCOUNT_KEY_PATH loaded: {os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY_PATH')}")
-print(f"DEBUG: GEMINI_MODEL loaded: {os.getenv('GEMINI_MODEL')}")
+# `adk run` / `adk web` load this .env themselves before importing the agent; other
+# entry points get it from check_environment() when the agent first runs.
+ENV_FILE = script_dir.parent / '.env'
 
 from .fim_connector import get_local_transaction_history, get_local_user_goals # NEW import
 from .tools import analyze_spending_patterns, identify_emotional_triggers, \
                             identify_financial_biases, generate_financial_nudge
 from google.adk import Agent
 from google.adk.tools import FunctionTool
-from google.generativeai import GenerativeModel
 
+from .analytics_executor import analytics_executor
+from .fim_connector import loader_cache
 
-print("Initializing Agent for local file deployment...")
+try:
+    from ...tools.instrumentation import instrument_tool, register_source
+except ImportError:
+    # Loaded as a standalone agent package: main_agent.tools is not importable, so the
+    # tools are registered without instrumentation.
+    def instrument_tool(func):
+        return func
 
+    def register_source(name, stats):
+        pass
 
-gemini_api_key = os.getenv("GOOGLE_API_KEY")
-gemini_model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
+register_source("behavior_loader_cache", loader_cache.stats)
+register_source("behavior_analytics_executor", analytics_executor.stats)
 
-if not gemini_api_key:
-    raise ValueError("GOOGLE_API_KEY environment variable not set.")
 
-llm = GenerativeModel(model_name=gemini_model_name)
-print(f"Using Generative Model '{gemini_model_name}' for ADK Agent.")
+gemini_model_name = os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest")
 
+_environment_checked = False
+
+def check_environment(callback_context=None):
+    """
+    Startup check, run before the agent's first turn (or called directly by scripts):
+    loads ENV_FILE without overriding variables already set and fails if GOOGLE_API_KEY
+    is missing. Importing the module never fails on configuration.
+    """
+    global _environment_checked
+    if not _environment_checked:
+        load_dotenv(dotenv_path=ENV_FILE)
+        if not os.getenv("GOOGLE_API_KEY"):
+            raise ValueError("GOOGLE_API_KEY environment variable not set.")
+        _environment_checked = True
+    return None
+
+# Each call is recorded as tool.<name> (latency, payload sizes, errors); see main_agent/tools/instrumentation.py.
 all_tools = [
-    FunctionTool(get_local_transaction_history), 
-    FunctionTool(get_local_user_goals),         
-    FunctionTool(analyze_spending_patterns),
-    FunctionTool(identify_emotional_triggers),
-    FunctionTool(identify_financial_biases),
-    FunctionTool(generate_financial_nudge)
+    FunctionTool(instrument_tool(get_local_transaction_history)), 
+    FunctionTool(instrument_tool(get_local_user_goals)),         
+    FunctionTool(instrument_tool(analyze_spending_patterns)),
+    FunctionTool(instrument_tool(identify_emotional_triggers)),
+    FunctionTool(instrument_tool(identify_financial_biases)),
+    FunctionTool(instrument_tool(generate_financial_nudge))
 ]
 
-print(f"ADK Tools registered: {[tool.name for tool in all_tools]}.")
-
 
 root_agent = Agent(
     model=gemini_model_name,
     name="FinancialBehavioralAgent", 
     tools=all_tools,
+    before_agent_callback=check_environment,
     description=(
         "You are an AI-powered financial behavior analyst and coach. "
         "Your primary goal is to help users understand their financial habits, "
@@ -84,5 +97,4 @@ root_agent = Agent(
     """
 
 )
-print("Global 'financial_behavior_agent' instance created and ready for ADK Web deployment with local data.")
 agent = root_agent
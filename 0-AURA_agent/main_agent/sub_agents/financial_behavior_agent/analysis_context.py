@@ -0,0 +1,108 @@
+# analysis_context.py
+# Shared, memoized inputs for the behavior tools in tools.py.
+#
+# A full behavioral report calls analyze_spending_patterns, identify_emotional_triggers
+# and identify_financial_biases on the same data. AnalysisContext computes what they
+# share once per typed frame: the fused aggregates in `metrics` (see metrics.py) and
+# the recurring series in `recurring` (see recurring.py). Contexts are memoized per
+# dataset fingerprint so every tool call after the first reuses them.
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from .fim_connector import load_local_dataset
+from .loader_cache import frame_nbytes, payload_fingerprint
+from .metrics import BehaviorMetrics
+from .recurring import detect_recurring
+from .transactions import frame_from_records
+
+
+CONTEXT_CACHE_SIZE = 8
+
+
+class AnalysisContext:
+    """
+    Derived results for one typed transaction frame. Each is computed on first access
+    and kept; the context is read-only, like the frame it wraps. `nbytes` is the memory
+    of the frames computed so far (the wrapped frame belongs to the caller); it is
+    updated as each result is stored, and on_resize is called after it grows.
+    """
+
+    def __init__(self, transactions: pd.DataFrame):
+        self.frame = transactions
+        self.nbytes = 0
+        self.on_resize: Optional[Callable[[], None]] = None
+        self._results: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    @property
+    def metrics(self) -> BehaviorMetrics:
+        return self._result('metrics', BehaviorMetrics.from_frame)
+
+    @property
+    def recurring(self) -> pd.DataFrame:
+        """Recurring expense series (see recurring.py)."""
+        return self._result('recurring', detect_recurring)
+
+    def _result(self, name: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+        value = self._results.get(name)
+        return self.store(name, build(self.frame)) if value is None else value
+
+    def cached(self, name: str) -> Any:
+        """A result (metrics, recurring, ...) if already computed or stored, else None."""
+        return self._results.get(name)
+
+    def store(self, name: str, value: Any) -> Any:
+        """Keep a result (e.g. one computed in a worker process); the first one stored wins."""
+        with self._lock:
+            if name in self._results:
+                return self._results[name]
+            self._results[name] = value
+            grew = isinstance(value, pd.DataFrame) and value is not self.frame
+            if grew:
+                self.nbytes += frame_nbytes(value)
+        if grew and self.on_resize is not None:
+            self.on_resize()
+        return value
+
+
+_contexts: "OrderedDict[tuple, AnalysisContext]" = OrderedDict()
+_contexts_lock = threading.Lock()
+
+def _memoized(key: tuple, build) -> AnalysisContext:
+    with _contexts_lock:
+        context = _contexts.get(key)
+        if context is not None:
+            _contexts.move_to_end(key)
+            return context
+    context = build()
+    with _contexts_lock:
+        _contexts[key] = context
+        while len(_contexts) > CONTEXT_CACHE_SIZE:
+            _contexts.popitem(last=False)
+    return context
+
+def get_analysis_context(transactions: Optional[List[Dict[str, Any]]] = None) -> AnalysisContext:
+    """
+    Context for the local dataset (transactions=None), a typed frame, or per-row dicts
+    as passed in by the model. The local dataset's context lives as long as its cached
+    Dataset; dict input is memoized by a content hash.
+    """
+    if transactions is None:
+        dataset = load_local_dataset()
+        context = dataset.memo.get("analysis_context")
+        if context is None:
+            context = dataset.remember("analysis_context", AnalysisContext(dataset.transactions))
+        return context
+    if isinstance(transactions, pd.DataFrame):
+        return AnalysisContext(transactions)
+    return _memoized(payload_fingerprint(transactions), lambda: AnalysisContext(frame_from_records(transactions)))
@@ -0,0 +1,170 @@
+# analytics_executor.py
+# Runs the behavior analytics off the event loop.
+#
+# The analysis tools are async, but computing BehaviorMetrics is CPU-bound pandas/numpy
+# work; run inline it stalls every other session served by the same event loop. The
+# tools await compute() / compute_metrics() instead, which run the work in a pool:
+#
+#   ANALYTICS_EXECUTOR=thread   (default) a thread pool; numpy releases the GIL for most
+#                               of the pass, and the memoized contexts are shared as is.
+#   ANALYTICS_EXECUTOR=process  a process pool; the frame is sent as a few typed columns
+#                               (categoricals for the text columns), never as row dicts,
+#                               and the results are cached on the parent's context.
+#   ANALYTICS_EXECUTOR=inline   no pool (scripts and debugging).
+#
+# Each call has a deadline (ANALYTICS_TIMEOUT_SECONDS, 0 for none) and can be cancelled.
+# Work that has not started is dropped. A running thread cannot be interrupted and
+# finishes in the background, but in process mode the pool is restarted so a huge
+# history does not keep a worker busy; calls caught in the restart are retried once.
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from .analysis_context import get_analysis_context
+from .metrics import BehaviorMetrics
+from .recurring import detect_recurring
+
+
+ANALYTICS_EXECUTOR = os.getenv("ANALYTICS_EXECUTOR", "thread")
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", "2"))
+ANALYTICS_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_TIMEOUT_SECONDS", "60"))
+
+# The only columns BehaviorMetrics and detect_recurring read.
+METRIC_COLUMNS = ['date', 'amount', 'type', 'category', 'description']
+
+# AnalysisContext properties that can be computed in a worker, by name.
+_ANALYSES = {
+    'metrics': BehaviorMetrics.from_frame,
+    'recurring': detect_recurring,
+}
+
+
+def columnar(frame: pd.DataFrame) -> pd.DataFrame:
+    """The metric columns with the text ones as categoricals, so they pickle as codes plus labels."""
+    df = frame[METRIC_COLUMNS].copy()
+    for column in ('type', 'category', 'description'):
+        df[column] = df[column].astype('category')
+    return df
+
+def _analyze_frame(frame: pd.DataFrame, names: Sequence[str]) -> List[Any]:
+    # Runs in the pool; top level so process workers can import it.
+    return [_ANALYSES[name](frame) for name in names]
+
+
+class AnalyticsExecutor:
+    """A lazily started thread or process pool with cancellation-aware submission."""
+
+    def __init__(self, mode: str = ANALYTICS_EXECUTOR, workers: int = ANALYTICS_WORKERS,
+                 timeout: float = ANALYTICS_TIMEOUT_SECONDS):
+        if mode not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown ANALYTICS_EXECUTOR mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._metrics = {"calls": 0, "timeouts": 0, "cancelled": 0, "pool_restarts": 0}
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.mode == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analytics")
+            return self._pool
+
+    def _restart(self, pool: Executor):
+        """Drop a process pool, killing whatever its workers are running."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self._metrics["pool_restarts"] += 1
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """Await func(*args) in the pool. Cancelling the caller cancels (or, in process mode, kills) the work."""
+        if self.mode == "inline":
+            return func(*args)
+        for attempt in (1, 2):
+            pool = self._get_pool()
+            future = pool.submit(func, *args)
+            try:
+                return await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                if attempt == 2:
+                    raise
+                print("[analytics] Process pool was restarted. Retrying.")
+                self._restart(pool)
+            except asyncio.CancelledError:
+                if not future.cancel() and self.mode == "process" and future.running():
+                    print("[analytics] Cancelled a running analysis. Restarting the process pool.")
+                    self._restart(pool)
+                raise
+
+    async def _compute(self, transactions, names: Sequence[str]) -> List[Any]:
+        def results(ctx):
+            return [getattr(ctx, name) for name in names]
+        if self.mode == "inline":
+            return results(get_analysis_context(transactions))
+        if self.mode == "thread":
+            return await self.run(lambda: results(get_analysis_context(transactions)))
+        # Loading and parsing stay in this process (next to the memoized contexts); only
+        # the vectorized passes that are not cached yet are shipped to a worker.
+        def prepare():
+            ctx = get_analysis_context(transactions)
+            missing = [name for name in names if ctx.cached(name) is None]
+            return ctx, missing, (columnar(ctx.frame) if missing else None)
+        ctx, missing, frame = await asyncio.to_thread(prepare)
+        if missing:
+            for name, value in zip(missing, await self.run(_analyze_frame, frame, missing)):
+                ctx.store(name, value)
+        return results(ctx)
+
+    async def compute(self, transactions: Optional[List[Dict[str, Any]]] = None,
+                      names: Sequence[str] = ('metrics',), timeout: Optional[float] = None) -> List[Any]:
+        """
+        The named AnalysisContext results (metrics, recurring) for the local dataset (None),
+        a typed frame or per-row dicts, computed in the pool as one call. Raises
+        asyncio.TimeoutError after timeout seconds (default self.timeout).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        self._metrics["calls"] += 1
+        try:
+            if timeout and self.mode != "inline":
+                return await asyncio.wait_for(self._compute(transactions, names), timeout)
+            return await self._compute(transactions, names)
+        except asyncio.TimeoutError:
+            self._metrics["timeouts"] += 1
+            print(f"[analytics] Analysis exceeded {timeout:g}s and was cancelled.")
+            raise
+        except asyncio.CancelledError:
+            self._metrics["cancelled"] += 1
+            raise
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._metrics, mode=self.mode, workers=self.workers, timeout=self.timeout)
+
+
+analytics_executor = AnalyticsExecutor()
+
+async def compute(transactions: Optional[List[Dict[str, Any]]] = None,
+                  names: Sequence[str] = ('metrics',), timeout: Optional[float] = None) -> List[Any]:
+    return await analytics_executor.compute(transactions, names, timeout)
+
+async def compute_metrics(transactions: Optional[List[Dict[str, Any]]] = None,
+                          timeout: Optional[float] = None) -> BehaviorMetrics:
+    return (await analytics_executor.compute(transactions, ('metrics',), timeout))[0]
@@ -0,0 +1,71 @@
+# batch_analytics.py
+# Behavior analytics for many users at once, e.g. the nightly "nudge every user" job.
+#
+# Calling the tools once per user builds a frame, a context and a set of aggregates per
+# user. Here every user's transactions go into one combined frame with a user_id column:
+# the rows are normalized together, BehaviorMetrics.by_key computes all users'
+# aggregates in the same vectorized pass (the user is folded into the bincount codes),
+# recurring payments are detected for all users in one sorted pass, and the
+# *_from_metrics functions from tools.py shape each user's results exactly like
+# analyze_spending_patterns, identify_emotional_triggers and identify_financial_biases.
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+from .metrics import BehaviorMetrics
+from .recurring import RECURRING_COLUMNS, detect_recurring
+from .tools import emotional_triggers_from_metrics, financial_biases_from_metrics, spending_patterns_from_metrics
+from .transactions import frame_from_records, normalize_rows
+
+
+def normalize_user_payloads(payloads: Dict[Any, Dict[str, Any]], key: str = 'user_id') -> pd.DataFrame:
+    """One typed frame (transactions.COLUMNS plus key) for {user_id: bankTransactions payload}."""
+    rows: List[List[Any]] = []
+    banks: List[str] = []
+    users: List[Any] = []
+    for user_id, payload in payloads.items():
+        for account in (payload or {}).get('bankTransactions') or []:
+            txns = account.get('txns') or []
+            rows.extend(txns)
+            banks.extend([account.get('bank', '')] * len(txns))
+            users.extend([user_id] * len(txns))
+    return normalize_rows(rows, banks, {key: users})
+
+
+def analyze_users(transactions: Union[pd.DataFrame, List[Dict[str, Any]]],
+                  user_text_inputs: Optional[Dict[Any, str]] = None,
+                  financial_goals: Optional[Dict[Any, List[Dict[str, Any]]]] = None,
+                  key: str = 'user_id') -> Dict[Any, Dict[str, Any]]:
+    """
+    Analyze every user in a combined transaction table (a typed frame or per-row dicts
+    with a key column). Returns {user_id: {...}} with:
+    - spending_patterns, emotional_triggers, financial_biases: the single-user tool results.
+    - nudge_inputs: keyword arguments for generate_financial_nudge.
+    user_text_inputs and financial_goals are optional per-user mappings.
+    """
+    df = transactions if isinstance(transactions, pd.DataFrame) else frame_from_records(transactions)
+    if df.empty:
+        return {}
+    user_text_inputs = user_text_inputs or {}
+    financial_goals = financial_goals or {}
+
+    recurring = {user_id: series[RECURRING_COLUMNS] for user_id, series in detect_recurring(df, key).groupby(key, sort=False)}
+    no_recurring = pd.DataFrame(columns=RECURRING_COLUMNS)
+
+    results: Dict[Any, Dict[str, Any]] = {}
+    for user_id, metrics in BehaviorMetrics.by_key(df, key).items():
+        goals = financial_goals.get(user_id) or []
+        user_recurring = recurring.get(user_id, no_recurring)
+        patterns = spending_patterns_from_metrics(metrics, user_recurring)
+        biases = financial_biases_from_metrics(metrics, goals, user_recurring)
+        results[user_id] = {
+            "spending_patterns": patterns,
+            "emotional_triggers": emotional_triggers_from_metrics(metrics, user_text_inputs.get(user_id)),
+            "financial_biases": biases,
+            "nudge_inputs": {
+                "identified_biases": biases.get("biases", []),
+                "spending_insights": patterns,
+                "financial_goals": goals,
+            },
+        }
+    return results
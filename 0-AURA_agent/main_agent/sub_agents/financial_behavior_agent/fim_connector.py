@@ -1,67 +1,102 @@
 
 import json
+import os
 from pathlib import Path
-from datetime import datetime, timedelta
 from typing import List, Dict, Any
 
+import pandas as pd
+
+from .loader_cache import Dataset, LoaderCache
+from .snapshot import Snapshot, write_snapshot
+from .streaming_loader import TransactionStream, load_transactions_streaming
+from .transactions import TRANSACTION_TYPE_MAP, frame_to_records
+
 
 script_dir = Path(__file__).parent.resolve()
 LOCAL_DATA_FILE = script_dir/"fetch_bank_transactions.json"
+# Binary snapshot of the same data (see snapshot.py); used instead of the JSON file
+# whenever it is at least as new.
+LOCAL_SNAPSHOT_FILE = Path(os.getenv("TRANSACTION_SNAPSHOT_PATH", str(LOCAL_DATA_FILE.with_suffix(".snap"))))
+# Files at least this large are read with the streaming loader instead of json.load.
+STREAMING_LOAD_MIN_BYTES = int(os.getenv("STREAMING_LOAD_MIN_BYTES", str(16 * 1024 * 1024)))
 
 
-TRANSACTION_TYPE_MAP = {
-    1: 'income',   
-    2: 'expense',  
-    3: 'income',   
-    4: 'income',   
-    5: 'expense',  
-    6: 'expense',  
-    7: 'expense',  
-    8: 'other'     
-}
+# Parsed and normalized data, reused until the file's mtime or size changes.
+loader_cache = LoaderCache()
 
-def _load_local_data() -> Dict:
+def _load_local_data(path: Path = LOCAL_DATA_FILE) -> Dict:
     """Loads data from the local_data.json file."""
-    if not LOCAL_DATA_FILE.exists():
-        print(f"Error: Local data file not found at {LOCAL_DATA_FILE}")
-        return {"transactions": [], "financial_goals": []}
+    if not path.exists():
+        print(f"Error: Local data file not found at {path}")
+        return {"bankTransactions": [], "financial_goals": []}
     try:
-        with open(LOCAL_DATA_FILE, 'r') as f:
+        with open(path, 'r') as f:
             data = json.load(f)
         return data
     except json.JSONDecodeError as e:
         print(f"Error decoding local data JSON: {e}")
-        return {"transactions": [], "financial_goals": []}
+        return {"bankTransactions": [], "financial_goals": []}
     except Exception as e:
         print(f"An unexpected error occurred while reading local data: {e}")
-        return {"transactions": [], "financial_goals": []}
+        return {"bankTransactions": [], "financial_goals": []}
 
-async def get_local_transaction_history(days: int = 60) -> List[Dict[str, Any]]:
-    """Fetches transaction history from local file for a given user, filtered by days."""
-    print(f"Tool: Reading transaction history from local file for user  for {days} days.")
-    data = _load_local_data()
-    all_transactions = data.get("transactions", [])
+def _read_dataset(path: Path) -> Dataset:
+    if path.stat().st_size < STREAMING_LOAD_MIN_BYTES:
+        return Dataset.from_payload(_load_local_data(path))
+    try:
+        stream = TransactionStream(path)
+        transactions = load_transactions_streaming(stream)
+        return Dataset(transactions, stream.extra.get("financial_goals") or [])
+    except ValueError as e:
+        print(f"Error decoding local data JSON: {e}")
+        return Dataset.from_payload({})
 
-    
-    cutoff_date = datetime.now() - timedelta(days=days)
-    recent_transactions = []
-    for t in all_transactions:
+def _snapshot_is_current() -> bool:
+    try:
+        snapshot_mtime = LOCAL_SNAPSHOT_FILE.stat().st_mtime_ns
+    except OSError:
+        return False
+    try:
+        return snapshot_mtime >= LOCAL_DATA_FILE.stat().st_mtime_ns
+    except OSError:
+        return True
+
+def load_local_dataset() -> Dataset:
+    """Normalized local data, parsed at most once per version of the file."""
+    if _snapshot_is_current():
         try:
-            
-            transaction_date = datetime.strptime(t['date'], '%Y-%m-%d')
-            if transaction_date >= cutoff_date:
-                recent_transactions.append(t)
-        except ValueError:
-            print(f"Warning: Invalid date format in transaction: {t.get('date')}. Skipping.")
-            continue 
+            return loader_cache.load_file(LOCAL_SNAPSHOT_FILE, lambda path: Dataset.from_snapshot(Snapshot(path)))
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not open snapshot {LOCAL_SNAPSHOT_FILE}, reading JSON instead: {e}")
+    dataset = loader_cache.load_file(LOCAL_DATA_FILE, _read_dataset)
+    if dataset is None:
+        return Dataset.from_payload(_load_local_data())
+    return dataset
+
+def invalidate_local_data():
+    """Forget the cached local data, e.g. after the file was rewritten within the same mtime tick."""
+    loader_cache.invalidate(LOCAL_DATA_FILE)
+    loader_cache.invalidate(LOCAL_SNAPSHOT_FILE)
+
+def write_local_snapshot() -> Path:
+    """(Re)build the binary snapshot from the JSON data file."""
+    dataset = loader_cache.load_file(LOCAL_DATA_FILE, _read_dataset) or Dataset.from_payload(_load_local_data())
+    # A cached Snapshot keeps the old file mapped, and a mapped file cannot be replaced on Windows.
+    loader_cache.invalidate(LOCAL_SNAPSHOT_FILE, close=True)
+    write_snapshot(LOCAL_SNAPSHOT_FILE, dataset.transactions, {"financial_goals": dataset.goals})
+    return LOCAL_SNAPSHOT_FILE
 
-   
-    recent_transactions.sort(key=lambda x: datetime.strptime(x['date'], '%Y-%m-%d'), reverse=True)
+def load_transaction_frame() -> pd.DataFrame:
+    """All local bank transactions as one typed frame (shared, treat as read-only)."""
+    return load_local_dataset().transactions
 
-    return recent_transactions
+async def get_local_transaction_history(days: int = 60) -> List[Dict[str, Any]]:
+    """Fetches transaction history from local file for a given user, filtered by days."""
+    print(f"Tool: Reading transaction history from local file for user  for {days} days.")
+    # Binary search on the date-sorted store, newest first.
+    return frame_to_records(load_local_dataset().store.last_days(days))
 
 async def get_local_user_goals() -> List[Dict[str, Any]]:
     """Fetches financial goals from local file for user."""
     print(f"Tool: Reading financial goals from local file for user ''.")
-    data = _load_local_data()
-    return data.get("financial_goals", [])
\ No newline at end of file
+    return list(load_local_dataset().goals)
\ No newline at end of file
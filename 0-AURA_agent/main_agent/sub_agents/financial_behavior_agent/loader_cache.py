@@ -0,0 +1,226 @@
+# loader_cache.py
+# Cache of parsed and normalized transaction data, keyed by a fingerprint of the source.
+#
+# A local file is fingerprinted by (path, mtime, size), so a repeat tool call costs one
+# stat() instead of a JSON parse; an edited file gets a new fingerprint and is parsed
+# again. Payloads that arrive in memory (e.g. MCP fetch_bank_transactions output) are
+# fingerprinted by a content hash. Entries are LRU-evicted past max_entries or max_bytes.
+# A dataset's size covers what it holds in memory right now: its frame (a snapshot-backed
+# dataset has none until the frame is first built), an in-memory store and whatever is
+# kept in its memo. The cache re-measures a dataset when it builds its frame or store,
+# when something is added to its memo, and when a memo entry reports that it grew (an
+# entry with an on_resize attribute gets a callback); a hit costs no measuring.
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .transaction_store import TransactionStore
+from .transactions import normalize_bank_transactions
+
+
+LOADER_CACHE_MAX_ENTRIES = int(os.getenv("LOADER_CACHE_MAX_ENTRIES", "16"))
+LOADER_CACHE_MAX_BYTES = int(os.getenv("LOADER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def frame_nbytes(frame: pd.DataFrame) -> int:
+    return int(frame.memory_usage(deep=True).sum())
+
+
+class Dataset:
+    """
+    Parsed source: the normalized transaction frame plus the financial goals list. A
+    dataset backed by a memory-mapped snapshot starts with only its store and builds
+    the full frame on first access to `transactions`. `memo` holds other objects derived
+    from the data (e.g. the tools' analysis context) so they are dropped with it; add
+    to it with remember() so the owning cache sees its size and later growth.
+    """
+    __slots__ = ("goals", "memo", "on_resize", "_transactions", "_store", "_frame_bytes", "_store_bytes")
+
+    def __init__(self, transactions: Optional[pd.DataFrame], goals: List[Dict[str, Any]],
+                 store: Optional[TransactionStore] = None):
+        self._transactions = transactions
+        self.goals = goals
+        self._store = store
+        self.memo: Dict[str, Any] = {}
+        # Called with the dataset whenever it grows (set by the cache holding it).
+        self.on_resize: Optional[Callable[["Dataset"], None]] = None
+        self._frame_bytes = frame_nbytes(transactions) if transactions is not None else 0
+        self._store_bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held now: frame, in-memory store, and memo entries that report an nbytes (kept up to date by them)."""
+        memo_bytes = sum(int(getattr(value, 'nbytes', 0) or 0) for value in list(self.memo.values()))
+        return self._frame_bytes + self._store_bytes + memo_bytes
+
+    def _resized(self):
+        if self.on_resize is not None:
+            self.on_resize(self)
+
+    @property
+    def transactions(self) -> pd.DataFrame:
+        if self._transactions is None:
+            self._transactions = self._store.frame
+            self._frame_bytes = frame_nbytes(self._transactions)
+            self._resized()
+        return self._transactions
+
+    @property
+    def store(self) -> TransactionStore:
+        """Date-sorted store over transactions, built on first use and cached with the dataset."""
+        if self._store is None:
+            self._store = TransactionStore(self.transactions)
+            self._store_bytes = frame_nbytes(self._store.frame) + self._store.days.nbytes
+            self._resized()
+        return self._store
+
+    def remember(self, name: str, value: Any) -> Any:
+        """Keep value in memo (returned for chaining) and report the new size, now and whenever value grows."""
+        self.memo[name] = value
+        if hasattr(value, 'on_resize'):
+            value.on_resize = self._resized
+        self._resized()
+        return value
+
+    def close(self):
+        """Release a snapshot store's file mapping; a frame already built stays usable."""
+        close = getattr(self._store, 'close', None)
+        if close is not None:
+            close()
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "Dataset":
+        return cls(normalize_bank_transactions(payload), (payload or {}).get("financial_goals") or [])
+
+    @classmethod
+    def from_snapshot(cls, snapshot: TransactionStore) -> "Dataset":
+        return cls(None, snapshot.extra.get("financial_goals") or [], store=snapshot)
+
+
+def file_fingerprint(path) -> Optional[Tuple[str, int, int]]:
+    """(path, mtime_ns, size), or None if the file does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.fspath(path), st.st_mtime_ns, st.st_size)
+
+def payload_fingerprint(payload: Any) -> Tuple[str, str]:
+    """Content hash of a raw JSON text/bytes payload, or of a parsed one (key order does not matter)."""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    if not isinstance(payload, bytes):
+        payload = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False,
+                             default=str).encode('utf-8')
+    return ("sha256", hashlib.sha256(payload).hexdigest())
+
+
+class LoaderCache:
+    """
+    Bounded LRU of Dataset objects keyed by fingerprint. Datasets are shared between
+    callers and must be treated as read-only (copy a frame before adding columns).
+    """
+
+    def __init__(self, max_entries: int = LOADER_CACHE_MAX_ENTRIES, max_bytes: int = LOADER_CACHE_MAX_BYTES):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, Dataset]" = OrderedDict()
+        self._sizes: Dict[tuple, int] = {}  # last measured nbytes per entry
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key: tuple, loader: Callable[[], Dataset]) -> Dataset:
+        with self._lock:
+            dataset = self._entries.get(key)
+            if dataset is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dataset
+            self.misses += 1
+        dataset = loader()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = dataset
+                self._sizes[key] = 0
+                dataset.on_resize = lambda resized, key=key: self._resized(key, resized)
+                self._measure(key, dataset)
+            self._evict()
+        return self._entries.get(key, dataset)
+
+    def _measure(self, key: tuple, dataset: Dataset):
+        size = dataset.nbytes
+        self._bytes += size - self._sizes[key]
+        self._sizes[key] = size
+
+    def _resized(self, key: tuple, dataset: Dataset):
+        with self._lock:
+            if self._entries.get(key) is dataset:
+                self._measure(key, dataset)
+                self._evict()
+
+    def _pop(self, key: tuple) -> Dataset:
+        dataset = self._entries.pop(key)
+        self._bytes -= self._sizes.pop(key)
+        dataset.on_resize = None
+        return dataset
+
+    def _evict(self):
+        # The newest entry is always kept, even if it alone is over max_bytes.
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def load_file(self, path, load: Callable[[Any], Dataset]) -> Optional[Dataset]:
+        """Dataset for the file at path, built by load(path) on a miss; None if the file does not exist."""
+        key = file_fingerprint(path)
+        if key is None:
+            return None
+        with self._lock:
+            # Older versions of this file can never be hit again.
+            for stale in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self._pop(stale)
+        return self.get_or_load(key, lambda: load(path))
+
+    def load_payload(self, payload: Any) -> Dataset:
+        """Dataset for an in-memory payload (JSON text, bytes, or the parsed dict)."""
+        key = payload_fingerprint(payload)
+
+        def load():
+            return Dataset.from_payload(json.loads(payload) if isinstance(payload, (str, bytes)) else payload)
+        return self.get_or_load(key, load)
+
+    def invalidate(self, path=None, close: bool = False):
+        """
+        Drop every cached version of the file at path, or everything if path is None.
+        close=True also closes the dropped datasets (unmapping snapshots), e.g. before the
+        file is replaced; only do that when no caller still queries them.
+        """
+        with self._lock:
+            if path is None:
+                keys = list(self._entries)
+            else:
+                keys = [key for key in self._entries if key[0] == os.fspath(path)]
+            dropped = [self._pop(key) for key in keys]
+        if close:
+            for dataset in dropped:
+                dataset.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
@@ -0,0 +1,208 @@
+# metrics.py
+# Fused behavioral metrics: every aggregate the behavior tools report, computed in one
+# vectorized pass over the transaction arrays.
+#
+# analyze_spending_patterns, identify_emotional_triggers and identify_financial_biases
+# used to group the same rows separately for category totals, daily and monthly sums,
+# weekday/hour means, weekend and late-night totals, impulse gaps and the bias checks.
+# BehaviorMetrics.from_frame computes all of them at once with np.bincount over integer
+# codes, and the tools only format the result. BehaviorMetrics.by_key does the same for
+# a combined frame of many users, with the user folded into the bincount codes.
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+ALL_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+ESSENTIAL_CATEGORIES = ['Rent', 'Utilities', 'Groceries', 'Health', 'Education', 'Salary', 'Savings']
+SUBSCRIPTION_CATEGORIES = ['Subscription', 'Streaming', 'Software', 'Membership', 'Service Fee']
+IMPULSE_GAP_MINUTES = 30
+IMPULSE_EXAMPLES = 3
+
+NS_PER_MINUTE = 60 * 10**9
+NS_PER_HOUR = 60 * NS_PER_MINUTE
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+
+def _grouped_sums(group: np.ndarray, keys: np.ndarray, weights: np.ndarray, n: int) -> List[tuple]:
+    """Per group 0..n-1: (distinct keys, sum of weights per key), via one unique + bincount over (group, key) pairs."""
+    lo = int(keys.min())
+    span = int(keys.max()) - lo + 1
+    pairs, inverse = np.unique(group * span + (keys - lo), return_inverse=True)
+    sums = np.bincount(inverse, weights=weights)
+    bounds = np.searchsorted(pairs // span, np.arange(n + 1))
+    return [(pairs[a:b] % span + lo, sums[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+class BehaviorMetrics:
+    """Behavioral aggregates for one set of transactions."""
+
+    def __init__(self):
+        self.rows = 0
+        self.has_time = False
+        # Expense-only aggregates
+        self.expense_count = 0
+        self.category_sum: Dict[str, float] = {}
+        self.category_count: Dict[str, int] = {}
+        self.daily_sum: Dict[int, float] = {}        # day number (days since 1970-01-01) -> sum
+        self.monthly_sum: Dict[str, float] = {}      # 'YYYY-MM' -> sum
+        self.weekday_sum = [0.0] * 7
+        self.weekday_count = [0] * 7
+        self.hour_sum = [0.0] * 24
+        self.hour_count = [0] * 24
+        self.subscription_total = 0.0
+        self.subscription_descriptions: set = set()
+        self.impulse_count = 0
+        self.impulse_total = 0.0
+        self.impulse_examples: List[Dict[str, Any]] = []
+        self.first_expense_ns: Optional[int] = None
+        self.last_expense_ns: Optional[int] = None
+        # All-row aggregates (the trigger and bias checks look at every transaction)
+        self.income_total = 0.0
+        self.discretionary_total = 0.0
+        self.round_count = 0
+        self.weekend_total = 0.0
+        self.weekend_count = 0
+        self.weekday_total = 0.0
+        self.weekday_rows = 0
+        self.late_night_total = 0.0
+        self.daytime_total = 0.0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "BehaviorMetrics":
+        """Single pass over a typed frame (date, amount, type, category, description columns)."""
+        return cls._compute(df, np.zeros(len(df), dtype=np.int64), 1)[0]
+
+    @classmethod
+    def by_key(cls, df: pd.DataFrame, key: str = 'user_id') -> Dict[Any, "BehaviorMetrics"]:
+        """Metrics for each distinct value of df[key] (e.g. user_id), all from the same single pass."""
+        codes, keys = pd.factorize(df[key], sort=True)
+        keep = codes >= 0  # rows without a key are left out
+        if not keep.all():
+            df, codes = df[keep], codes[keep]
+        return dict(zip(keys.tolist(), cls._compute(df, codes.astype(np.int64), len(keys))))
+
+    @classmethod
+    def _compute(cls, df: pd.DataFrame, group: np.ndarray, n: int) -> List["BehaviorMetrics"]:
+        """Metrics for groups 0..n-1 of a typed frame; group[i] is row i's group number."""
+        out = [cls() for _ in range(n)]
+        if not len(df) or not n:
+            return out
+        amount = df['amount'].to_numpy(dtype='float64')
+        ts = df['date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        day = ts // NS_PER_DAY
+        weekday = (day + 3) % 7  # 1970-01-01 was a Thursday
+        hour = (ts - day * NS_PER_DAY) // NS_PER_HOUR
+        kind = df['type'].to_numpy(dtype=object)
+        category = df['category'].to_numpy(dtype=object)
+        is_expense = kind == 'expense'
+
+        def per_group(mask: np.ndarray, weights: Optional[np.ndarray] = None) -> list:
+            return np.bincount(group[mask], weights=None if weights is None else weights[mask], minlength=n).tolist()
+
+        # All rows
+        everything = np.ones(len(df), dtype=bool)
+        weekend = weekday >= 5
+        late = (hour >= 22) | (hour < 6)
+        has_time = np.bincount(group[ts != day * NS_PER_DAY], minlength=n) > 0
+        columns = {
+            'rows': per_group(everything),
+            'income_total': per_group(kind == 'income', amount),
+            'discretionary_total': per_group(~pd.Series(category).isin(ESSENTIAL_CATEGORIES).to_numpy(), amount),
+            'round_count': per_group(amount % 10 == 0),
+            'weekend_total': per_group(weekend, amount),
+            'weekend_count': per_group(weekend),
+            'weekday_total': per_group(~weekend, amount),
+            'weekday_rows': per_group(~weekend),
+            'late_night_total': per_group(late, amount),
+            'daytime_total': per_group(~late, amount),
+            'expense_count': per_group(is_expense),
+        }
+        for name, values in columns.items():
+            for m, value in zip(out, values):
+                setattr(m, name, value)
+        for m, timed in zip(out, has_time.tolist()):
+            m.has_time = timed
+        if not is_expense.any():
+            return out
+
+        # Expenses
+        e_group, e_amount, e_ts, e_day = group[is_expense], amount[is_expense], ts[is_expense], day[is_expense]
+        codes, labels = pd.factorize(category[is_expense])
+        labels = labels.tolist()
+        k = len(labels)
+        category_sum = np.bincount(e_group * k + codes, weights=e_amount, minlength=n * k).reshape(n, k)
+        category_count = np.bincount(e_group * k + codes, minlength=n * k).reshape(n, k)
+        weekday_sum = np.bincount(e_group * 7 + weekday[is_expense], weights=e_amount, minlength=n * 7).reshape(n, 7)
+        weekday_count = np.bincount(e_group * 7 + weekday[is_expense], minlength=n * 7).reshape(n, 7)
+        hour_sum = np.bincount(e_group * 24 + hour[is_expense], weights=e_amount, minlength=n * 24).reshape(n, 24)
+        hour_count = np.bincount(e_group * 24 + hour[is_expense], minlength=n * 24).reshape(n, 24)
+        daily = _grouped_sums(e_group, e_day, e_amount, n)
+        months = e_ts.astype('datetime64[ns]').astype('datetime64[M]').astype(np.int64)
+        monthly = _grouped_sums(e_group, months, e_amount, n)
+        for g, m in enumerate(out):
+            present = np.flatnonzero(category_count[g])
+            m.category_sum = {labels[c]: total for c, total in zip(present.tolist(), category_sum[g, present].tolist())}
+            m.category_count = {labels[c]: count for c, count in zip(present.tolist(), category_count[g, present].tolist())}
+            m.weekday_sum, m.weekday_count = weekday_sum[g].tolist(), weekday_count[g].tolist()
+            m.hour_sum, m.hour_count = hour_sum[g].tolist(), hour_count[g].tolist()
+            m.daily_sum = dict(zip(daily[g][0].tolist(), daily[g][1].tolist()))
+            m.monthly_sum = {str(np.datetime64(month, 'M')): total for month, total in zip(monthly[g][0].tolist(), monthly[g][1].tolist())}
+
+        subscriptions = pd.Series(category[is_expense]).isin(SUBSCRIPTION_CATEGORIES).to_numpy()
+        for m, total in zip(out, np.bincount(e_group[subscriptions], weights=e_amount[subscriptions], minlength=n).tolist()):
+            m.subscription_total = total
+        descriptions = df['description'].to_numpy(dtype=object)[is_expense][subscriptions]
+        for g, description in pd.DataFrame({'g': e_group[subscriptions], 'd': descriptions}).drop_duplicates().itertuples(index=False):
+            out[g].subscription_descriptions.add(description)
+
+        # Impulse gaps: expenses ordered by (group, time); a gap only counts within a group
+        order = np.lexsort((e_ts, e_group))
+        sorted_group, sorted_ts = e_group[order], e_ts[order]
+        starts = np.flatnonzero(np.r_[True, sorted_group[1:] != sorted_group[:-1]])
+        ends = np.r_[starts[1:], len(order)] - 1
+        for g, first, last in zip(sorted_group[starts].tolist(), sorted_ts[starts].tolist(), sorted_ts[ends].tolist()):
+            out[g].first_expense_ns, out[g].last_expense_ns = first, last
+        quick = np.zeros(len(order), dtype=bool)
+        quick[1:] = (np.diff(sorted_ts) < IMPULSE_GAP_MINUTES * NS_PER_MINUTE) & (sorted_group[1:] == sorted_group[:-1])
+        quick &= has_time[sorted_group]
+        if quick.any():
+            quick_amount = e_amount[order][quick]
+            for name, values in (('impulse_count', np.bincount(sorted_group[quick], minlength=n)),
+                                 ('impulse_total', np.bincount(sorted_group[quick], weights=quick_amount, minlength=n))):
+                for m, value in zip(out, values.tolist()):
+                    setattr(m, name, value)
+            # The first IMPULSE_EXAMPLES quick expenses of each group
+            positions = np.flatnonzero(quick)
+            quick_group = sorted_group[positions]
+            rank = np.arange(len(positions)) - np.searchsorted(quick_group, quick_group, side='left')
+            picked = positions[rank < IMPULSE_EXAMPLES]
+            examples = df[is_expense].iloc[order[picked]][['date', 'amount', 'category', 'description']]
+            for g, row in zip(sorted_group[picked].tolist(), examples.itertuples()):
+                out[g].impulse_examples.append(
+                    {"date": row.date, "amount": row.amount, "category": row.category, "description": row.description})
+        return out
+
+    # Views used by the tools
+
+    def spending_by_category(self) -> Dict[str, float]:
+        return dict(sorted(self.category_sum.items(), key=lambda item: item[1], reverse=True))
+
+    def average_daily_spending(self) -> float:
+        return sum(self.daily_sum.values()) / len(self.daily_sum) if self.daily_sum else 0.0
+
+    def high_frequency_categories(self, share: float = 0.05) -> List[str]:
+        ranked = sorted(self.category_count.items(), key=lambda item: (-item[1], item[0]))
+        return [category for category, count in ranked if count > self.expense_count * share]
+
+    def day_of_week_means(self) -> Dict[str, float]:
+        return {day: (s / c if c else 0.0) for day, s, c in zip(ALL_DAYS, self.weekday_sum, self.weekday_count)}
+
+    def hourly_means(self) -> Dict[int, float]:
+        if not self.has_time:
+            return {}
+        return {hour: (s / c if c else 0.0) for hour, (s, c) in enumerate(zip(self.hour_sum, self.hour_count))}
+
+    def monthly_trends(self) -> Dict[str, float]:
+        return dict(sorted(self.monthly_sum.items()))
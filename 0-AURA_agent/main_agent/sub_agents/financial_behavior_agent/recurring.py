@@ -0,0 +1,161 @@
+# recurring.py
+# Recurring-payment detection over raw bank narrations.
+#
+# Bank data has no merchant or subscription field, only narrations such as
+#
+#   UPI-NETFLIX COM-NETFLIXUPI@HDFCBANK-HDFC0000001-512345678901-MONTHLY AUTOPAY
+#   IMPS-018422244664-ADITYA BIRLA SUN LIF-HDFC-XXXXXXXX3578-RD3192534-1038644104
+#
+# merchant_keys() turns each narration into a merchant key (the UPI handle, else the
+# payee name, else the narration's first words without digits). detect_recurring()
+# collapses expenses to one payment per merchant per day, sorts them by (group,
+# merchant, day) and reads the gap statistics off the sorted order: a merchant is
+# recurring when its median gap is close to a known cadence and the gaps are regular,
+# and a subscription when the amount is stable too and it is not a loan, tax, savings,
+# rent or utility payment (NON_SUBSCRIPTION_CATEGORIES, LOAN_OR_TAX). Everything is a sort plus grouped
+# reductions, so it is O(n log n) in the number of transactions.
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# (name, period in days)
+CADENCES = [('weekly', 7.0), ('fortnightly', 14.0), ('monthly', 30.44), ('quarterly', 91.31), ('yearly', 365.25)]
+CADENCE_TOLERANCE = 0.25   # median gap within 25% of the period
+MAX_GAP_CV = 0.35          # std/mean of the gaps
+MAX_AMOUNT_CV = 0.2        # std/mean of the amounts, for subscriptions
+MIN_OCCURRENCES = 3        # payment days (2 for yearly)
+DAYS_PER_MONTH = 30.44
+# A digit run that is a whole '-' or space separated field, e.g. a UPI/IMPS reference.
+REFERENCE_NUMBER = r'(?<=[-\s])\d{6,}(?=[-\s]|$)'
+
+# Fixed-amount recurring payments that are obligations or transfers to savings, not subscriptions.
+NON_SUBSCRIPTION_CATEGORIES = {'Salary', 'Interest', 'Savings', 'Rent', 'Credit Card', 'Utilities', 'Service Fee', 'Cash'}
+LOAN_OR_TAX = r'\bEMI\b|\bLOANS?\b|\bTDS\b|\bTAX\b|\bGST\b'
+
+RECURRING_COLUMNS = ['merchant', 'category', 'cadence', 'period_days', 'occurrences', 'typical_amount',
+                     'amount_cv', 'gap_cv', 'total', 'monthly_cost', 'first_date', 'last_date',
+                     'next_expected', 'is_subscription']
+
+
+def merchant_keys(narrations: pd.Series) -> np.ndarray:
+    """Merchant key per narration ('' when nothing usable is left)."""
+    texts = pd.Series(narrations.to_numpy(dtype=object), dtype='object').fillna('').astype(str).str.upper()
+    # Reference numbers make almost every narration unique; with standalone digit runs
+    # collapsed (handles such as 9876543210@YBL are kept) the patterns below run once
+    # per payee and note instead of once per row.
+    codes, uniques = pd.factorize(texts.str.replace(REFERENCE_NUMBER, '0', regex=True))
+    uniques = pd.Series(uniques, dtype='object')
+    handle = uniques.str.extract(r'^UPI-[^-]*-([^-\s]+@[A-Z]+)', expand=False)
+    upi_payee = uniques.str.extract(r'^UPI-([^-]+)-', expand=False)
+    bank_payee = uniques.str.extract(r'^(?:IMPS|NEFT|RTGS)-[^-]*-([^-]+)', expand=False)
+    words = uniques.str.replace(r'[^A-Z ]+', ' ', regex=True).str.split().str[:3].str.join(' ')
+    keys = handle.to_numpy(dtype=object)
+    for fallback in (bank_payee, upi_payee, words):
+        missing = pd.isna(keys)
+        keys[missing] = fallback.to_numpy(dtype=object)[missing]
+    keys = pd.Series(keys, dtype='object').fillna('').astype(str).str.strip().to_numpy(dtype=object)
+    return keys[codes] if len(codes) else np.array([], dtype=object)
+
+
+def _empty(key: Optional[str]) -> pd.DataFrame:
+    return pd.DataFrame(columns=([key] if key else []) + RECURRING_COLUMNS)
+
+
+def detect_recurring(frame: pd.DataFrame, key: Optional[str] = None) -> pd.DataFrame:
+    """
+    Recurring expense series in a typed frame (date, amount, type, category, description),
+    one row per merchant (per key value, e.g. user_id, if key is given), largest
+    monthly_cost first. Columns: RECURRING_COLUMNS, preceded by key.
+    """
+    expenses = frame[(frame['type'] == 'expense').to_numpy()]
+    if expenses.empty:
+        return _empty(key)
+    payments = pd.DataFrame({
+        'group': expenses[key].to_numpy() if key else 0,
+        'merchant': merchant_keys(expenses['description']),
+        'day': expenses['date'].to_numpy(dtype='datetime64[D]').astype(np.int64),
+        'amount': expenses['amount'].to_numpy(dtype='float64'),
+        'category': expenses['category'].to_numpy(dtype=object),
+    })
+    payments = payments[payments['merchant'] != '']
+    if payments.empty:
+        return _empty(key)
+
+    # The most frequent category of each merchant
+    categories = payments.groupby(['group', 'merchant', 'category'], sort=False).size().reset_index(name='n') \
+        .sort_values('n', ascending=False, kind='stable').drop_duplicates(['group', 'merchant']) \
+        .set_index(['group', 'merchant'])['category']
+
+    # One payment per merchant per day, in (group, merchant, day) order
+    daily = payments.groupby(['group', 'merchant', 'day'], sort=True)['amount'].sum().reset_index()
+    same_series = (daily['group'].to_numpy() == np.roll(daily['group'].to_numpy(), 1)) & \
+                  (daily['merchant'].to_numpy() == np.roll(daily['merchant'].to_numpy(), 1))
+    same_series[0] = False
+    gaps = np.diff(daily['day'].to_numpy(), prepend=0).astype('float64')
+    daily['gap'] = np.where(same_series, gaps, np.nan)
+
+    series = daily.groupby(['group', 'merchant'], sort=False).agg(
+        occurrences=('day', 'size'), first_day=('day', 'min'), last_day=('day', 'max'),
+        typical_amount=('amount', 'median'), amount_mean=('amount', 'mean'), amount_std=('amount', 'std'),
+        total=('amount', 'sum'), gap_median=('gap', 'median'), gap_mean=('gap', 'mean'), gap_std=('gap', 'std'),
+    )
+    series = series[series['occurrences'] >= 2]
+    if series.empty:
+        return _empty(key)
+
+    periods = np.array([period for _, period in CADENCES])
+    error = np.abs(series['gap_median'].to_numpy()[:, None] - periods) / periods
+    best = error.argmin(axis=1)
+    series['cadence'] = np.array([name for name, _ in CADENCES], dtype=object)[best]
+    series['period_days'] = periods[best]
+    series['gap_cv'] = (series['gap_std'].fillna(0) / series['gap_mean']).fillna(0)
+    series['amount_cv'] = (series['amount_std'].fillna(0) / series['amount_mean'].abs()).fillna(0)
+    min_occurrences = np.where(series['cadence'] == 'yearly', 2, MIN_OCCURRENCES)
+    recurring = (error[np.arange(len(best)), best] <= CADENCE_TOLERANCE) & \
+                (series['gap_cv'] <= MAX_GAP_CV) & (series['occurrences'] >= min_occurrences)
+    series = series[recurring.to_numpy()]
+    if series.empty:
+        return _empty(key)
+
+    series['monthly_cost'] = series['typical_amount'] * DAYS_PER_MONTH / series['period_days']
+    series['category'] = categories.reindex(series.index).to_numpy()
+    merchants = series.index.get_level_values('merchant').to_series()
+    series['is_subscription'] = (series['amount_cv'] <= MAX_AMOUNT_CV).to_numpy() & \
+        ~series['category'].isin(NON_SUBSCRIPTION_CATEGORIES).to_numpy() & \
+        ~merchants.str.contains(LOAN_OR_TAX, regex=True).to_numpy()
+    series['first_date'] = series['first_day'].to_numpy().astype('datetime64[D]')
+    series['last_date'] = series['last_day'].to_numpy().astype('datetime64[D]')
+    series['next_expected'] = (series['last_day'] + series['period_days'].round()).to_numpy().astype(np.int64).astype('datetime64[D]')
+    result = series.reset_index().sort_values(['group', 'monthly_cost'], ascending=[True, False], kind='stable')
+    if key:
+        result = result.rename(columns={'group': key})
+    return result[([key] if key else []) + RECURRING_COLUMNS].reset_index(drop=True)
+
+
+def active_recurring(recurring: pd.DataFrame, as_of) -> pd.DataFrame:
+    """Series still running at as_of: the next payment is not overdue by more than CADENCE_TOLERANCE of a period."""
+    if recurring.empty:
+        return recurring
+    grace = pd.to_timedelta((recurring['period_days'].astype('float64') * CADENCE_TOLERANCE).round(), unit='D')
+    return recurring[(pd.to_datetime(recurring['next_expected']) + grace >= pd.Timestamp(as_of)).to_numpy()]
+
+
+def recurring_to_records(recurring: pd.DataFrame, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """JSON-friendly rows (dates as YYYY-MM-DD strings, amounts rounded) for tool results."""
+    rows = recurring[RECURRING_COLUMNS].head(limit) if limit else recurring[RECURRING_COLUMNS]
+    out = []
+    for row in rows.itertuples(index=False):
+        out.append({
+            "merchant": row.merchant,
+            "category": row.category,
+            "cadence": row.cadence,
+            "occurrences": int(row.occurrences),
+            "typical_amount": round(float(row.typical_amount), 2),
+            "monthly_cost": round(float(row.monthly_cost), 2),
+            "last_date": str(row.last_date)[:10],
+            "next_expected": str(row.next_expected)[:10],
+            "is_subscription": bool(row.is_subscription),
+        })
+    return out
@@ -0,0 +1,204 @@
+# snapshot.py
+# Compact binary snapshot of a normalized transaction history, read through mmap.
+#
+# Layout (little-endian):
+#
+#   b"AURATXN1" | u64 header length | JSON header | column blocks, each 8-byte aligned
+#
+# The JSON header records the row count, each column's dtype/offset/length, the label
+# lists behind the coded columns (type, category, mode, bank) and any extra payload
+# keys (e.g. financial_goals). Rows are stored sorted by date: `day` holds int64 day
+# numbers, amount/balance are float64, the coded columns are small ints (a missing value
+# has a null label and reads back as NaN), and narrations live in one UTF-8 pool indexed
+# by a (rows + 1) offsets array (a missing narration reads back as '').
+#
+# Opening a snapshot maps the file and wraps each column with np.frombuffer, so nothing
+# is read until a slice is touched, and slices of the numeric columns are views into
+# the mapping. Files are written to a temporary name and renamed into place; on Windows
+# that needs every Snapshot of the old file closed first.
+#
+#   python -m main_agent.sub_agents.financial_behavior_agent.snapshot build <input.json> <output.snap>
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .transaction_store import TransactionStore
+from .transactions import COLUMNS, empty_frame
+
+
+MAGIC = b"AURATXN1"
+VERSION = 1
+_ALIGN = 8
+_CODED = {'type': '<u1', 'category': '<u2', 'mode': '<u2', 'bank': '<u2'}
+
+
+def _pad(n: int) -> int:
+    return (-n) % _ALIGN
+
+
+def write_snapshot(path: Union[str, Path], transactions: pd.DataFrame, extra: Optional[Dict[str, Any]] = None):
+    """Write a normalized frame (see transactions.COLUMNS) to path atomically."""
+    path = Path(path)
+    order = np.argsort(transactions['date'].to_numpy(dtype='datetime64[D]'), kind='stable')
+    df = transactions.iloc[order]
+
+    arrays: Dict[str, np.ndarray] = {
+        'day': df['date'].to_numpy(dtype='datetime64[D]').astype('<i8'),
+        'amount': df['amount'].to_numpy(dtype='<f8'),
+        'balance': df['balance'].to_numpy(dtype='<f8'),
+        'txn_type': df['txn_type'].to_numpy(dtype='<i8').astype('<i1'),
+    }
+    labels: Dict[str, List[str]] = {}
+    for column, dtype in _CODED.items():
+        codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+        arrays[column] = codes.astype(dtype)
+        labels[column] = [None if pd.isna(u) else str(u) for u in uniques]
+    encoded = [str(text).encode('utf-8') for text in df['description'].fillna('')]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    arrays['text_offsets'] = offsets
+    arrays['text'] = np.frombuffer(b''.join(encoded), dtype='u1')
+
+    header = {"version": VERSION, "rows": len(df), "labels": labels, "extra": extra or {}, "columns": {}}
+    # Offsets depend on the header length, which depends on the offsets: lay out with
+    # a generous fixed-width guess, then pad the header to exactly that size.
+    header_size = 0
+    while True:
+        position = len(MAGIC) + 8 + header_size
+        position += _pad(position)
+        for name, array in arrays.items():
+            header["columns"][name] = {"dtype": array.dtype.str, "offset": position, "count": int(array.size)}
+            position += array.nbytes + _pad(array.nbytes)
+        raw = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        if len(raw) <= header_size:
+            raw = raw.ljust(header_size)
+            break
+        header_size = len(raw) + 64
+
+    fd, tmp = tempfile.mkstemp(prefix=path.name + '.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(raw)))
+            f.write(raw)
+            f.write(b'\0' * _pad(f.tell()))
+            for name, array in arrays.items():
+                assert f.tell() == header["columns"][name]["offset"]
+                f.write(array.tobytes())
+                f.write(b'\0' * _pad(array.nbytes))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Snapshot(TransactionStore):
+    """
+    Read-only, memory-mapped snapshot with the TransactionStore query interface.
+    Only the rows a query returns are turned into a DataFrame.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            # An empty mapping is not allowed, but a valid snapshot is never empty.
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._mm[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{self.path} is not a transaction snapshot")
+            (header_len,) = struct.unpack_from('<Q', self._mm, len(MAGIC))
+            start = len(MAGIC) + 8
+            header = json.loads(bytes(self._mm[start:start + header_len]))
+            if header.get("version") != VERSION:
+                raise ValueError(f"Unsupported snapshot version {header.get('version')} in {self.path}")
+        except Exception:
+            self._mm.close()
+            raise
+        self.labels = {column: np.array([np.nan if v is None else v for v in values], dtype=object)
+                       for column, values in header["labels"].items()}
+        self.extra = header.get("extra") or {}
+        self.columns = {
+            name: np.frombuffer(self._mm, dtype=np.dtype(spec["dtype"]), count=spec["count"], offset=spec["offset"])
+            for name, spec in header["columns"].items()
+        }
+        self.days = self.columns['day']
+        self._frame: Optional[pd.DataFrame] = None
+
+    def close(self):
+        self._frame = None
+        self.columns = {}
+        self.days = np.empty(0, dtype='<i8')
+        try:
+            self._mm.close()
+        except BufferError:
+            # Arrays handed out by arrays() still point into the mapping; it is
+            # released when the last of them is garbage collected.
+            pass
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def arrays(self, lo: int = 0, hi: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Zero-copy views of the fixed-width columns for rows lo:hi."""
+        return {name: array[lo:hi] for name, array in self.columns.items() if not name.startswith('text')}
+
+    def narrations(self, lo: int = 0, hi: Optional[int] = None) -> List[str]:
+        hi = len(self) if hi is None else hi
+        offsets = self.columns['text_offsets'][lo:hi + 1].tolist()
+        pool = self.columns['text']
+        return [bytes(pool[a:b]).decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+
+    def rows(self, lo: int = 0, hi: Optional[int] = None) -> pd.DataFrame:
+        hi = len(self) if hi is None else min(hi, len(self))
+        if hi <= lo:
+            return empty_frame()
+        cols = self.columns
+        df = pd.DataFrame({
+            'date': cols['day'][lo:hi].astype('datetime64[D]').astype('datetime64[ns]'),
+            'amount': cols['amount'][lo:hi],
+            'type': self.labels['type'][cols['type'][lo:hi]],
+            'category': self.labels['category'][cols['category'][lo:hi]],
+            'description': self.narrations(lo, hi),
+            'mode': self.labels['mode'][cols['mode'][lo:hi]],
+            'bank': self.labels['bank'][cols['bank'][lo:hi]],
+            'balance': cols['balance'][lo:hi],
+            'txn_type': cols['txn_type'][lo:hi].astype('int64'),
+        })
+        return df[COLUMNS]
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """All rows, built on first access and kept (a copy, so it outlives close())."""
+        if self._frame is None:
+            self._frame = self.rows()
+        return self._frame
+
+
+def build_from_json(source: Union[str, Path], target: Union[str, Path]) -> int:
+    """Normalize a bankTransactions JSON file (streamed) into a snapshot; returns the row count."""
+    from .streaming_loader import TransactionStream, load_transactions_streaming
+
+    stream = TransactionStream(source)
+    transactions = load_transactions_streaming(stream)
+    write_snapshot(target, transactions, {"financial_goals": stream.extra.get("financial_goals") or []})
+    return len(transactions)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        sys.exit("usage: snapshot.py build <input.json> <output.snap>")
+    print(f"Wrote {build_from_json(sys.argv[2], sys.argv[3])} transactions to {sys.argv[3]}")
@@ -0,0 +1,239 @@
+# streaming_loader.py
+# Incremental reader for large fetch_bank_transactions files.
+#
+# json.load materializes the whole object tree (a list per row, a str per field) before
+# anything can be normalized, so peak memory is several times the file size. This
+# reader walks the file in fixed-size blocks and decodes one txns row at a time with
+# json.JSONDecoder.raw_decode, handing out typed DataFrame chunks of chunk_rows rows.
+# Memory stays bounded by the block size and chunk size, whatever the file size.
+#
+# A query bounded by `since` drops older rows as they are read. The MCP export usually
+# lists each account newest first, but nothing guarantees or checks that order; a caller
+# who knows the file is sorted can pass assume_sorted=True, and the reader then stops
+# collecting an account at its first older row and steps over the rest of that txns
+# array without keeping or normalizing it.
+import json
+import os
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .transaction_store import DateLike
+from .transactions import empty_frame, normalize_rows
+
+
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "50000"))
+STREAM_READ_SIZE = 1 << 20
+
+_WS = ' \t\n\r'
+
+
+class _Reader:
+    """Buffered cursor over a text stream with just enough JSON to walk bankTransactions."""
+
+    def __init__(self, stream: IO[str], read_size: int = STREAM_READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        block = self.stream.read(self.read_size)
+        if not block:
+            self.eof = True
+            return False
+        # Drop the consumed prefix so the buffer never grows past one value plus a block.
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {self.buf[self.pos]!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number or literal ending exactly at the buffer end may continue in the next block.
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def skip_array_rest(self):
+        """Skip the remaining items of the array whose last item was just read."""
+        # raw_decode runs in C and beats any Python-level bracket scan; the decoded
+        # items are dropped right away, so memory stays flat.
+        while self.separator(']'):
+            self.value()
+
+    def separator(self, close: str) -> bool:
+        """Consume ',' (True: another item follows) or the closing bracket (False)."""
+        char = self.peek()
+        self.pos += 1
+        if char == ',':
+            return True
+        if char == close:
+            return False
+        raise ValueError(f"Expected ',' or {close!r} at offset {self.pos - 1}, found {char!r}")
+
+
+class TransactionStream:
+    """
+    Iterate typed DataFrame chunks (the columns of transactions.normalize_bank_transactions)
+    from a bankTransactions file or text stream. Top-level keys other than
+    bankTransactions (e.g. financial_goals) are decoded into `extra` as they are passed.
+    """
+
+    def __init__(self, source: Union[str, Path, IO[str]], chunk_rows: int = STREAM_CHUNK_ROWS,
+                 since: Optional[DateLike] = None, assume_sorted: bool = False,
+                 read_size: int = STREAM_READ_SIZE):
+        self.source = source
+        self.chunk_rows = max(1, chunk_rows)
+        self.since = None if since is None else pd.Timestamp(since).strftime('%Y-%m-%d')
+        self.assume_sorted = assume_sorted
+        self.read_size = read_size
+        self.extra: Dict[str, Any] = {}
+        self.rows_read = 0
+        self.rows_skipped = 0
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        if isinstance(self.source, (str, Path)):
+            with open(self.source, 'r', encoding='utf-8') as f:
+                yield from self._chunks(_Reader(f, self.read_size))
+        else:
+            yield from self._chunks(_Reader(self.source, self.read_size))
+
+    def _chunks(self, reader: _Reader) -> Iterator[pd.DataFrame]:
+        rows: List[list] = []
+        banks: List[str] = []
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            reader.expect(':')
+            if key == 'bankTransactions':
+                for row, bank in self._accounts(reader):
+                    rows.append(row)
+                    banks.append(bank)
+                    if len(rows) >= self.chunk_rows:
+                        yield normalize_rows(rows, banks)
+                        rows, banks = [], []
+            else:
+                self.extra[key] = reader.value()
+            if not reader.separator('}'):
+                break
+        if rows:
+            yield normalize_rows(rows, banks)
+
+    def _accounts(self, reader: _Reader):
+        reader.expect('[')
+        if reader.peek() == ']':
+            reader.pos += 1
+            return
+        while True:
+            reader.expect('{')
+            bank = ''
+            pending: List[list] = []  # rows seen before the account's "bank" key, if any
+            if reader.peek() != '}':
+                while True:
+                    key = reader.value()
+                    reader.expect(':')
+                    if key == 'bank':
+                        bank = reader.value()
+                        for row in pending:
+                            yield row, bank
+                        pending = []
+                    elif key == 'txns':
+                        for row in self._rows(reader):
+                            if bank:
+                                yield row, bank
+                            else:
+                                pending.append(row)
+                    else:
+                        reader.value()
+                    if not reader.separator('}'):
+                        break
+            else:
+                reader.pos += 1
+            for row in pending:
+                yield row, bank
+            if not reader.separator(']'):
+                return
+
+    def _rows(self, reader: _Reader):
+        reader.expect('[')
+        if reader.peek() == ']':
+            reader.pos += 1
+            return
+        while True:
+            row = reader.value()
+            self.rows_read += 1
+            if self.since is not None and isinstance(row, list) and len(row) > 2 and str(row[2]) < self.since:
+                if self.assume_sorted:
+                    # The caller vouched for newest-first order: the rest of the account is older still.
+                    reader.skip_array_rest()
+                    return
+                self.rows_skipped += 1
+            else:
+                yield row
+            if not reader.separator(']'):
+                return
+
+
+def iter_transaction_chunks(source: Union[str, Path, IO[str]], chunk_rows: int = STREAM_CHUNK_ROWS,
+                            since: Optional[DateLike] = None, assume_sorted: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Typed chunks of at most chunk_rows transactions, optionally only those dated on or after
+    since. assume_sorted=True trusts that every account lists its rows newest first.
+    """
+    return iter(TransactionStream(source, chunk_rows, since, assume_sorted))
+
+
+def load_transactions_streaming(source: Union[str, Path, IO[str], TransactionStream], since: Optional[DateLike] = None,
+                                chunk_rows: int = STREAM_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Whole typed frame without building the JSON tree first. Pass a TransactionStream to
+    read its `extra` keys afterwards.
+
+    Chunks are kept as separate column arrays, and the frame is assembled one column at a
+    time, releasing each column's pieces as soon as they are joined; peak memory is about
+    the frame plus one column, not the two full copies a concat of chunk frames needs.
+    """
+    stream = source if isinstance(source, TransactionStream) else TransactionStream(source, chunk_rows, since)
+    pieces: Dict[str, List[np.ndarray]] = {}
+    for chunk in stream:
+        for column in chunk.columns:
+            # A copy, so the chunk's consolidated blocks are freed with the chunk.
+            pieces.setdefault(column, []).append(chunk[column].to_numpy().copy())
+    if not pieces:
+        return empty_frame()
+    columns: Dict[str, np.ndarray] = {}
+    for column in list(pieces):
+        parts = pieces.pop(column)
+        columns[column] = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        del parts
+    # copy=False keeps the joined arrays as the frame's columns instead of consolidating them.
+    return pd.DataFrame(columns, copy=False)
@@ -2,59 +2,53 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-from google.generativeai import GenerativeModel # Assuming you pass the model here or it's globally available
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import os
 
+from .analytics_executor import compute, compute_metrics
+from .metrics import NS_PER_DAY, SUBSCRIPTION_CATEGORIES, BehaviorMetrics
+from .recurring import DAYS_PER_MONTH, active_recurring, merchant_keys, recurring_to_records
+
 # Define a mock model for local testing if you don't want to hit the API constantly during development of analysis functions
 # This is just for the _generate_behavioral_recommendations, which needs an LLM.
 # In the actual ADK agent, the `model` would be the Gemini model configured for the agent.
-# For this tool, it's better to make the LLM call within the tool itself or pass a callable model.
-# For simplicity, we'll instantiate it here, assuming GOOGLE_API_KEY is set in .env
-try:
-    _mock_model = GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest"))
-except Exception as e:
-    print(f"Warning: Could not initialize GenerativeModel in tools.py. Ensure GOOGLE_API_KEY and GEMINI_MODEL are set. Error: {e}")
-    _mock_model = None # Fallback for local testing without API key
+# It is built on first use: google.generativeai is slow to import and the model needs GOOGLE_API_KEY.
+_mock_model = None
+
+def _get_mock_model():
+    global _mock_model
+    if _mock_model is None:
+        try:
+            from google.generativeai import GenerativeModel
+            _mock_model = GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-1.5-flash-latest"))
+        except Exception as e:
+            print(f"Warning: Could not initialize GenerativeModel in tools.py. Ensure GOOGLE_API_KEY and GEMINI_MODEL are set. Error: {e}")
+    return _mock_model
 
 # Helper functions (can be private methods within a class or just standalone)
-def _analyze_temporal_patterns(df: pd.DataFrame) -> Dict:
+# Both read the fused aggregates from metrics.py instead of regrouping the frame.
+def _analyze_temporal_patterns(metrics: BehaviorMetrics) -> Dict:
     """Analyze spending patterns across different time periods."""
-    # Ensure 'date' is datetime type
-    if not pd.api.types.is_datetime64_any_dtype(df['date']):
-        df['date'] = pd.to_datetime(df['date'])
-
     # Filter for expenses only for temporal patterns
-    expenses_df = df[df['type'] == 'expense']
-    if expenses_df.empty:
+    if not metrics.expense_count:
         return {
             "day_of_week_spending": {},
             "hourly_patterns": {},
             "monthly_trends": {}
         }
 
-    # Ensure all days/hours are represented, even with 0 spending, for complete patterns
-    all_days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    day_of_week_avg = expenses_df.groupby(expenses_df['date'].dt.day_name())['amount'].mean().reindex(all_days).fillna(0)
-
-    all_hours = range(24)
-    hourly_avg = expenses_df.groupby(expenses_df['date'].dt.hour)['amount'].mean().reindex(all_hours).fillna(0)
-
-    monthly_sum = expenses_df.set_index('date').resample('M')['amount'].sum()
-    # Convert Timestamp to string for JSON serialization
-    monthly_trends_dict = {str(k.to_period('M')): v for k, v in monthly_sum.items()}
-
+    # All days/hours are represented, even with 0 spending, for complete patterns;
+    # hours are left out when the data has no time of day.
     return {
-        "day_of_week_spending": day_of_week_avg.to_dict(),
-        "hourly_patterns": hourly_avg.to_dict(),
-        "monthly_trends": monthly_trends_dict
+        "day_of_week_spending": metrics.day_of_week_means(),
+        "hourly_patterns": metrics.hourly_means(),
+        "monthly_trends": metrics.monthly_trends()
     }
 
-def _detect_impulse_spending(df: pd.DataFrame) -> Dict:
+def _detect_impulse_spending(metrics: BehaviorMetrics) -> Dict:
     """Detect potential impulse spending patterns."""
-    # Filter for expenses only
-    expenses_df = df[df['type'] == 'expense']
-    if expenses_df.empty:
+    if not metrics.expense_count or not metrics.has_time:
         return {
             "impulse_score": 0,
             "quick_transaction_count": 0,
@@ -63,23 +57,48 @@ def _detect_impulse_spending(df: pd.DataFrame) -> Dict:
             "example_transactions": []
         }
 
-    df_sorted = expenses_df.sort_values('date')
-    df_sorted['time_diff'] = df_sorted['date'].diff().dt.total_seconds() / 60  # Minutes
-
-    quick_transactions = df_sorted[df_sorted['time_diff'].notna() & (df_sorted['time_diff'] < 30)]  # Within 30 minutes, exclude first transaction
-
-    impulse_score = len(quick_transactions) / len(expenses_df) * 100 if len(expenses_df) > 0 else 0
+    # Expenses within 30 minutes of the previous one
+    impulse_score = metrics.impulse_count / metrics.expense_count * 100
 
     return {
         "impulse_score": round(impulse_score, 2),
-        "quick_transaction_count": len(quick_transactions),
-        "total_impulse_amount": round(quick_transactions['amount'].sum(), 2),
+        "quick_transaction_count": metrics.impulse_count,
+        "total_impulse_amount": round(metrics.impulse_total, 2),
         "risk_level": "high" if impulse_score > 20 else "medium" if impulse_score > 10 else "low",
-        "example_transactions": quick_transactions.head(3).to_dict(orient='records') # Show first 3 examples
+        "example_transactions": metrics.impulse_examples # Show first 3 examples
+    }
+
+
+# The tools below are thin wrappers: the *_from_metrics functions turn BehaviorMetrics
+# into the tool results, so batch_analytics.py can produce the same shapes for many users.
+# The metrics themselves are computed off the event loop (see analytics_executor.py).
+ANALYSIS_TIMEOUT_SUMMARY = "The transaction history took too long to analyze. Try again with a shorter period."
+RECURRING_SUMMARY_LIMIT = 10
+
+def spending_patterns_from_metrics(metrics: BehaviorMetrics, recurring: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """analyze_spending_patterns result for precomputed metrics (and recurring series, see recurring.py)."""
+    if not metrics.rows:
+        return {"summary": "No transactions provided for analysis."}
+
+    if not metrics.expense_count:
+        return {"summary": "No expenses found for detailed analysis."}
+
+    insights = {
+        "summary": "Detailed spending patterns analyzed.",
+        "total_spending_by_category": {k: round(v, 2) for k, v in metrics.spending_by_category().items()},
+        "average_daily_spending": round(metrics.average_daily_spending(), 2),
+        # Categories with more than 5% of all expense transactions (potential frequent small purchases)
+        "high_frequency_categories": metrics.high_frequency_categories(),
+        "temporal_patterns": _analyze_temporal_patterns(metrics), # Use the helper
+        "impulse_indicators": _detect_impulse_spending(metrics) # Use the helper
     }
+    if recurring is not None:
+        insights["recurring_expenses"] = recurring_to_records(recurring, RECURRING_SUMMARY_LIMIT)
+        insights["estimated_monthly_recurring"] = round(float(recurring['monthly_cost'].sum()), 2)
+    return insights
 
 
-async def analyze_spending_patterns(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+async def analyze_spending_patterns(transactions: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
     """
     Analyzes user transaction data to identify spending patterns,
     categories of overspending/underspending, and recurring habits.
@@ -88,6 +107,7 @@ async def analyze_spending_patterns(transactions: List[Dict[str, Any]]) -> Dict[
     Args:
         transactions: A list of dictionaries, where each dictionary represents a transaction
                       with keys like 'date', 'amount', 'category', 'description', 'type' (e.g., 'income', 'expense').
+                      Optional; defaults to the user's bank transactions from the local data source.
 
     Returns:
         A dictionary containing various spending insights:
@@ -97,69 +117,29 @@ async def analyze_spending_patterns(transactions: List[Dict[str, Any]]) -> Dict[
         - high_frequency_categories: Categories with many small transactions.
         - temporal_patterns: Spending trends by day of week, hour, and month.
         - impulse_indicators: Data related to quick successive purchases.
+        - recurring_expenses: Recurring payments (subscriptions, bills) found in the narrations,
+          largest monthly cost first, with their cadence and next expected date.
+        - estimated_monthly_recurring: Monthly cost of all recurring payments.
     """
-    if not transactions:
-        return {"summary": "No transactions provided for analysis."}
-
-    df = pd.DataFrame(transactions)
-    df['date'] = pd.to_datetime(df['date'])
-    df['amount'] = pd.to_numeric(df['amount'])
-
-    expenses_df = df[df['type'] == 'expense']
-    if expenses_df.empty:
-        return {"summary": "No expenses found for detailed analysis."}
-
-    # Total spending by category
-    spending_by_category = expenses_df.groupby('category')['amount'].sum().sort_values(ascending=False).to_dict()
-
-    # Average daily spending
-    daily_spending = expenses_df.groupby(expenses_df['date'].dt.date)['amount'].sum().mean()
-
-    # Identify categories with many transactions (potential frequent small purchases)
-    transaction_counts_by_category = expenses_df.groupby('category')['amount'].count().sort_values(ascending=False)
-    high_frequency_categories = transaction_counts_by_category[transaction_counts_by_category > (len(expenses_df) * 0.05)].index.tolist() # More than 5% of total transactions
-
-    insights = {
-        "summary": "Detailed spending patterns analyzed.",
-        "total_spending_by_category": {k: round(v, 2) for k, v in spending_by_category.items()},
-        "average_daily_spending": round(daily_spending, 2),
-        "high_frequency_categories": high_frequency_categories,
-        "temporal_patterns": _analyze_temporal_patterns(df), # Use the helper
-        "impulse_indicators": _detect_impulse_spending(df) # Use the helper
-    }
-    return insights
+    try:
+        metrics, recurring = await compute(transactions, ('metrics', 'recurring'))
+    except asyncio.TimeoutError:
+        return {"summary": ANALYSIS_TIMEOUT_SUMMARY}
+    return spending_patterns_from_metrics(metrics, recurring)
 
 
-async def identify_emotional_triggers(transactions: List[Dict[str, Any]], user_text_input: Optional[str] = None) -> Dict[str, Any]:
-    """
-    Identifies potential emotional spending triggers by analyzing spending patterns
-    around specific times (e.g., weekends, late nights) and correlating with user text input.
-
-    Args:
-        transactions: A list of dictionaries representing transactions.
-        user_text_input: Optional. A string from the user, e.g., from a journaling feature,
-                         to detect explicit emotional mentions.
-
-    Returns:
-        A dictionary indicating potential emotional triggers and associated behaviors.
-    """
-    if not transactions:
+def emotional_triggers_from_metrics(metrics: BehaviorMetrics, user_text_input: Optional[str] = None) -> Dict[str, Any]:
+    """identify_emotional_triggers result for precomputed metrics."""
+    if not metrics.rows:
         return {"summary": "No transactions provided for emotional trigger analysis."}
 
-    df = pd.DataFrame(transactions)
-    df['date'] = pd.to_datetime(df['date'])
-    df['amount'] = pd.to_numeric(df['amount'])
-    df['day_of_week'] = df['date'].dt.day_name()
-    df['hour'] = df['date'].dt.hour
-    df['is_weekend'] = df['date'].dt.weekday >= 5
-
     triggers = []
 
     
-    weekend_spending = df[df['is_weekend']]['amount'].sum()
-    weekday_spending = df[~df['is_weekend']]['amount'].sum()
-    weekend_days_count = df['is_weekend'].sum()
-    weekday_days_count = len(df) - weekend_days_count
+    weekend_spending = metrics.weekend_total
+    weekday_spending = metrics.weekday_total
+    weekend_days_count = metrics.weekend_count
+    weekday_days_count = metrics.weekday_rows
 
     avg_weekend_daily = weekend_spending / max(1, weekend_days_count) if weekend_days_count > 0 else 0
     avg_weekday_daily = weekday_spending / max(1, weekday_days_count) if weekday_days_count > 0 else 0
@@ -173,13 +153,10 @@ async def identify_emotional_triggers(transactions: List[Dict[str, Any]], user_t
         })
 
     # Late night spending analysis (after 10 PM, before 6 AM)
-    late_night_spending_df = df[(df['hour'] >= 22) | (df['hour'] < 6)]
-    daytime_spending_df = df[(df['hour'] >= 6) & (df['hour'] < 22)]
-
-    late_night_total = late_night_spending_df['amount'].sum()
-    daytime_total = daytime_spending_df['amount'].sum()
+    late_night_total = metrics.late_night_total
+    daytime_total = metrics.daytime_total
 
-    if late_night_total > daytime_total * 0.1 and late_night_total > 500: # Significant late night spending
+    if metrics.has_time and late_night_total > daytime_total * 0.1 and late_night_total > 500: # Significant late night spending
         triggers.append({
             "trigger": "late_night_impulse_spending",
             "description": "Noticeable spending late at night often indicates potential impulse purchases or boredom-driven spending.",
@@ -208,29 +185,62 @@ async def identify_emotional_triggers(transactions: List[Dict[str, Any]], user_t
     return {"summary": "Potential emotional triggers identified.", "triggers": triggers}
 
 
-async def identify_financial_biases(transactions: List[Dict[str, Any]], financial_goals: List[Dict[str, Any]]) -> Dict[str, Any]:
+async def identify_emotional_triggers(transactions: Optional[List[Dict[str, Any]]] = None, user_text_input: Optional[str] = None) -> Dict[str, Any]:
     """
-    Detects common cognitive biases in user's financial behavior based on
-    spending patterns and stated goals.
+    Identifies potential emotional spending triggers by analyzing spending patterns
+    around specific times (e.g., weekends, late nights) and correlating with user text input.
 
     Args:
-        transactions: List of transaction dictionaries.
-        financial_goals: List of financial goals, e.g., [{'name': 'Retirement', 'target_amount': 500000, 'saved': 10000, 'type': 'savings'}].
+        transactions: A list of dictionaries representing transactions. Optional; defaults to
+                      the user's bank transactions from the local data source.
+        user_text_input: Optional. A string from the user, e.g., from a journaling feature,
+                         to detect explicit emotional mentions.
 
     Returns:
-        A dictionary detailing identified biases and examples.
+        A dictionary indicating potential emotional triggers and associated behaviors.
     """
-    if not transactions:
-        return {"summary": "No transactions provided for bias identification."}
+    try:
+        metrics = await compute_metrics(transactions)
+    except asyncio.TimeoutError:
+        return {"summary": ANALYSIS_TIMEOUT_SUMMARY}
+    return emotional_triggers_from_metrics(metrics, user_text_input)
+
 
-    df = pd.DataFrame(transactions)
-    df['amount'] = pd.to_numeric(df['amount'])
-    df['date'] = pd.to_datetime(df['date'])
+SUBSCRIPTION_WINDOW_MONTHS = 3
+
+def _active_subscriptions(metrics: BehaviorMetrics, recurring: Optional[pd.DataFrame] = None) -> Tuple[set, float]:
+    """
+    (merchant keys of active subscriptions, their estimated monthly cost). Both sides are
+    keyed by merchant_keys(), so one merchant billed many times counts once: expenses in
+    SUBSCRIPTION_CATEGORIES, plus the fixed-amount recurring payments detected in the
+    narrations that are still running (bank data has no subscription categories of its own).
+    """
+    categorized = set(merchant_keys(pd.Series(sorted(metrics.subscription_descriptions), dtype='object'))) - {''}
+    months = 1.0
+    if metrics.first_expense_ns is not None and metrics.last_expense_ns is not None:
+        months = max(1.0, (metrics.last_expense_ns - metrics.first_expense_ns) / NS_PER_DAY / DAYS_PER_MONTH)
+    if recurring is None or recurring.empty:
+        return categorized, metrics.subscription_total / months
+
+    active = active_recurring(recurring, pd.Timestamp(metrics.last_expense_ns))
+    detected = active[active['is_subscription'].astype(bool)]
+    stopped = set(recurring['merchant']) - set(active['merchant'])
+    # Spending in SUBSCRIPTION_CATEGORIES that no recurring series accounts for, averaged per month
+    covered = float(recurring.loc[recurring['category'].isin(SUBSCRIPTION_CATEGORIES), 'total'].sum())
+    uncovered = max(0.0, metrics.subscription_total - covered) / months
+    return set(detected['merchant']) | (categorized - stopped), float(detected['monthly_cost'].sum()) + uncovered
+
+def financial_biases_from_metrics(metrics: BehaviorMetrics, financial_goals: Optional[List[Dict[str, Any]]] = None,
+                                  recurring: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """identify_financial_biases result for precomputed metrics (and recurring series, see recurring.py)."""
+    if not metrics.rows:
+        return {"summary": "No transactions provided for bias identification."}
+    financial_goals = financial_goals or []
     biases = []
 
     
-    total_income = df[df['type'] == 'income']['amount'].sum()
-    total_discretionary_expense = df[~df['category'].isin(['Rent', 'Utilities', 'Groceries', 'Health', 'Education', 'Salary', 'Savings'])]['amount'].sum()
+    total_income = metrics.income_total
+    total_discretionary_expense = metrics.discretionary_total # Everything outside ESSENTIAL_CATEGORIES
 
     if total_income > 0 and (total_discretionary_expense / total_income) > 0.4: # More than 40% of income on discretionary items
         # Check savings progress
@@ -244,25 +254,23 @@ async def identify_financial_biases(transactions: List[Dict[str, Any]], financia
             })
 
     
-    round_number_transactions = df[df['amount'].apply(lambda x: x % 100 == 0 or x % 10 == 0)]
-    if len(round_number_transactions) > len(df) * 0.20 and len(df) > 10: # More than 20% are round numbers
+    round_share = metrics.round_count / metrics.rows
+    if round_share > 0.20 and metrics.rows > 10: # More than 20% are round numbers
         biases.append({
             "bias": "anchoring_bias_round_numbers",
             "description": "Spending frequently in round numbers may indicate an unconscious 'anchoring' to specific price points rather than evaluating true value.",
-            "impact": f"{len(round_number_transactions)/len(df)*100:.1f}% of your transactions are at round numbers.",
+            "impact": f"{round_share*100:.1f}% of your transactions are at round numbers.",
             "recommendation": "Before making a purchase, pause and evaluate if the item's value truly matches its price, rather than being influenced by a simple, round figure. Try setting budgets with non-round numbers."
         })
 
     
-    subscription_categories = ['Subscription', 'Streaming', 'Software', 'Membership', 'Service Fee']
-    recent_subscriptions = df[df['category'].isin(subscription_categories) & (df['type'] == 'expense')]
-
-    if len(recent_subscriptions.drop_duplicates(subset='description')) > 3: # More than 3 distinct active subscriptions
-        total_sub_cost = recent_subscriptions['amount'].sum()
+    subscriptions, monthly_sub_cost = _active_subscriptions(metrics, recurring)
+    if len(subscriptions) > 3: # More than 3 distinct active subscriptions
+        total_sub_cost = monthly_sub_cost * SUBSCRIPTION_WINDOW_MONTHS
         biases.append({
             "bias": "loss_aversion_subscriptions",
             "description": "You seem to have multiple recurring subscriptions. People often hold onto subscriptions even when unused due to the 'pain' of losing access, a form of loss aversion.",
-            "impact": f"Estimated total subscription spending over 3 months: ₹{total_sub_cost:.2f}. Reviewing them could save money.",
+            "impact": f"Estimated total subscription spending over {SUBSCRIPTION_WINDOW_MONTHS} months: ₹{total_sub_cost:.2f}. Reviewing them could save money.",
             "recommendation": "Conduct a 'subscription audit'. For each subscription, ask if you truly use and value it enough to justify the cost. Cancel anything you don't actively use."
         })
 
@@ -271,6 +279,26 @@ async def identify_financial_biases(transactions: List[Dict[str, Any]], financia
     return {"summary": "Financial biases identified.", "biases": biases}
 
 
+async def identify_financial_biases(transactions: Optional[List[Dict[str, Any]]] = None, financial_goals: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Detects common cognitive biases in user's financial behavior based on
+    spending patterns and stated goals.
+
+    Args:
+        transactions: List of transaction dictionaries. Optional; defaults to the user's bank
+                      transactions from the local data source.
+        financial_goals: List of financial goals, e.g., [{'name': 'Retirement', 'target_amount': 500000, 'saved': 10000, 'type': 'savings'}].
+
+    Returns:
+        A dictionary detailing identified biases and examples.
+    """
+    try:
+        metrics, recurring = await compute(transactions, ('metrics', 'recurring'))
+    except asyncio.TimeoutError:
+        return {"summary": ANALYSIS_TIMEOUT_SUMMARY}
+    return financial_biases_from_metrics(metrics, financial_goals, recurring)
+
+
 
 async def generate_financial_nudge(
     identified_biases: Optional[List[Dict[str, Any]]] = None,
@@ -0,0 +1,69 @@
+# transaction_store.py
+# Transactions kept sorted by date, with dates as int64 day numbers (days since
+# 1970-01-01), so "last N days" and date-range queries are two binary searches and
+# a slice instead of a parse-and-filter pass over every row.
+from datetime import date, datetime, timedelta
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+DateLike = Union[date, datetime, str, pd.Timestamp, np.datetime64]
+
+
+def day_number(value: DateLike) -> int:
+    """Days since 1970-01-01 for a date, datetime, 'YYYY-MM-DD' string or datetime64."""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+
+class TransactionStore:
+    """
+    Read-only, date-sorted view over a normalized transaction frame (see
+    transactions.normalize_bank_transactions). Rows of the same day keep their
+    original relative order.
+    """
+
+    def __init__(self, transactions: pd.DataFrame):
+        order = np.argsort(transactions['date'].to_numpy(dtype='datetime64[D]'), kind='stable')
+        self.frame = transactions.iloc[order].reset_index(drop=True)
+        self.days = self.frame['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def rows(self, lo: int = 0, hi: Optional[int] = None) -> pd.DataFrame:
+        """Rows lo:hi in date order."""
+        return self.frame.iloc[lo:hi]
+
+    def first_day(self) -> Optional[int]:
+        return int(self.days[0]) if len(self.days) else None
+
+    def last_day(self) -> Optional[int]:
+        return int(self.days[-1]) if len(self.days) else None
+
+    def _bounds(self, start: Optional[int], end: Optional[int]):
+        lo = 0 if start is None else int(np.searchsorted(self.days, start, side='left'))
+        hi = len(self.days) if end is None else int(np.searchsorted(self.days, end, side='right'))
+        return lo, max(lo, hi)
+
+    def count(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> int:
+        lo, hi = self._bounds(None if start is None else day_number(start), None if end is None else day_number(end))
+        return hi - lo
+
+    def window(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+               newest_first: bool = False) -> pd.DataFrame:
+        """Transactions dated start..end, both inclusive; either bound may be None for open-ended."""
+        lo, hi = self._bounds(None if start is None else day_number(start), None if end is None else day_number(end))
+        rows = self.rows(lo, hi)
+        return rows.iloc[::-1] if newest_first else rows
+
+    def last_days(self, days: int, now: Optional[datetime] = None, newest_first: bool = True) -> pd.DataFrame:
+        """Transactions dated on or after now - days (dates are whole days, so a partial first day is excluded)."""
+        cutoff = (now or datetime.now()) - timedelta(days=days)
+        start = day_number(cutoff)
+        if cutoff.time() != datetime.min.time():
+            start += 1
+        lo, hi = self._bounds(start, None)
+        rows = self.rows(lo, hi)
+        return rows.iloc[::-1] if newest_first else rows
@@ -0,0 +1,144 @@
+# transactions.py
+# Normalizer for the compact bankTransactions schema used by fetch_bank_transactions.json
+# and the MCP fetch_bank_transactions tool:
+#
+#   {"bankTransactions": [{"bank": "...", "txns": [[amount, narration, date, type, mode, balance], ...]}]}
+#
+# All rows are turned into one typed DataFrame in a single pass (no per-row dicts), and
+# that frame is what the analytics tools in tools.py consume.
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# transactionType codes from the schemaDescription: 1 CREDIT, 2 DEBIT, 3 OPENING, 4 INTEREST,
+# 5 TDS, 6 INSTALLMENT, 7 CLOSING, 8 OTHERS.
+TRANSACTION_TYPE_MAP = {
+    1: 'income',
+    2: 'expense',
+    3: 'income',
+    4: 'income',
+    5: 'expense',
+    6: 'expense',
+    7: 'expense',
+    8: 'other'
+}
+
+RAW_COLUMNS = ['amount', 'description', 'date', 'txn_type', 'mode', 'balance']
+COLUMNS = ['date', 'amount', 'type', 'category', 'description', 'mode', 'bank', 'balance', 'txn_type']
+
+# (category, regex on the upper-cased narration); the first match wins. Category names
+# line up with the ones the bias and nudge tools look for (Rent, Utilities, Dining, ...).
+CATEGORY_RULES = [
+    ('Salary', r'SALARY|\bSAL[A-Z]{3}\s?\d'),
+    ('Interest', r'INTEREST|INTDIV|DIVIDEND'),
+    ('Credit Card', r'CREDIT CARD|CRED@AXISB|CREDCC@|PAYMENT ON CRED'),
+    ('Savings', r'MUTUAL|\bMF\b|\bSIP\b|SAFE ?GOLD|SAVINGS|ZERODHA|GROWW|SUN LIF|\bRD\d'),
+    ('Dining', r'SWIGGY|ZOMATO|RESTAURANT|CAFE'),
+    ('Groceries', r'MART\b|MINI MART|BIGBASKET|BLINKIT|ZEPTO|GROFERS|DUNZO|KIRANA'),
+    ('Transport', r'UBER|\bOLA\b|OLAONLINE|RAPIDO|PETROL|FUEL|AUTOMOBILES'),
+    ('Utilities', r'BROADBAND|ELECTRICITY|BESCOM|AIRTEL|\bJIO\b|BILLDESK|RECHARGE|GAS'),
+    ('Streaming', r'NETFLIX|SPOTIFY|HOTSTAR|PRIME VIDEO|FANCODE|YOUTUBE'),
+    ('Subscription', r'SUBSCR'),
+    ('Health', r'MEDICAL|PHARMA|HOSPITAL|CLINIC|APOLLO'),
+    ('Rent', r'\bRENT\b'),
+    ('Shopping', r'AMAZON|FLIPKART|MYNTRA|AJIO'),
+    ('Service Fee', r'CHG|CHARGES|\bGST\b'),
+    ('Cash', r'^NWD-|^ATW-|\bATM\b|CHQ PAID'),
+    ('Transfer', r'^UPI-|^IMPS|^NEFT|^RTGS|TRANSFER'),
+]
+
+
+def derive_categories(narrations: pd.Series) -> np.ndarray:
+    """Category per narration from CATEGORY_RULES ('Other' if nothing matches)."""
+    # Narrations differ mostly in reference numbers; with digit runs collapsed the same
+    # merchant and note repeat, so the rules only run once per distinct pattern.
+    keys = narrations.fillna('').str.upper().str.replace(r'\d+', '0', regex=True)
+    codes, uniques = pd.factorize(keys)
+    uniques = pd.Series(uniques, dtype='object')
+    masks = [uniques.str.contains(pattern, regex=True).to_numpy() for _, pattern in CATEGORY_RULES]
+    categories = np.select(masks, [category for category, _ in CATEGORY_RULES], default='Other')
+    return categories[codes] if len(codes) else categories[:0]
+
+
+def empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'date': pd.Series([], dtype='datetime64[ns]'),
+        'amount': pd.Series([], dtype='float64'),
+        'type': pd.Series([], dtype='object'),
+        'category': pd.Series([], dtype='object'),
+        'description': pd.Series([], dtype='object'),
+        'mode': pd.Series([], dtype='object'),
+        'bank': pd.Series([], dtype='object'),
+        'balance': pd.Series([], dtype='float64'),
+        'txn_type': pd.Series([], dtype='int64'),
+    })[COLUMNS]
+
+
+def normalize_rows(rows: List[List[Any]], banks: List[str], extra: Optional[Dict[str, List[Any]]] = None) -> pd.DataFrame:
+    """
+    Typed frame from raw txns arrays; banks[i] is the bank of rows[i]. Rows with an
+    unparseable date are dropped. extra adds columns aligned with rows (e.g. user_id),
+    kept after COLUMNS.
+    """
+    extra = extra or {}
+    if not rows:
+        df = empty_frame()
+        for column in extra:
+            df[column] = pd.Series([], dtype='object')
+        return df
+    df = pd.DataFrame(rows, columns=RAW_COLUMNS)
+    df['bank'] = banks
+    for column, values in extra.items():
+        df[column] = values
+    df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce')
+    df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0).astype('float64')
+    df['balance'] = pd.to_numeric(df['balance'], errors='coerce').astype('float64')
+    df['txn_type'] = pd.to_numeric(df['txn_type'], errors='coerce').fillna(8).astype('int64')
+    df['type'] = df['txn_type'].map(TRANSACTION_TYPE_MAP).fillna('other')
+    df['category'] = derive_categories(df['description'])
+    bad_dates = df['date'].isna()
+    if bad_dates.any():
+        print(f"Warning: Skipping {int(bad_dates.sum())} transactions with an invalid date.")
+        df = df[~bad_dates].reset_index(drop=True)
+    return df[COLUMNS + list(extra)]
+
+
+def normalize_bank_transactions(payload: Dict[str, Any]) -> pd.DataFrame:
+    """
+    One typed frame for every account in payload['bankTransactions']:
+    date (datetime64), amount and balance (float64), type ('income'/'expense'/'other'
+    from TRANSACTION_TYPE_MAP), txn_type (raw code), category, description, mode and bank.
+    """
+    accounts = (payload or {}).get('bankTransactions') or []
+    rows: List[List[Any]] = []
+    banks: List[str] = []
+    for account in accounts:
+        txns = account.get('txns') or []
+        rows.extend(txns)
+        banks.extend([account.get('bank', '')] * len(txns))
+    return normalize_rows(rows, banks)
+
+
+def frame_from_records(transactions: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Typed frame from per-row dicts (e.g. passed back in by the model) with the same columns where present."""
+    df = pd.DataFrame(transactions)
+    if df.empty:
+        return empty_frame()
+    df['date'] = pd.to_datetime(df['date'])
+    df['amount'] = pd.to_numeric(df['amount'])
+    if 'type' not in df:
+        df['type'] = 'expense'
+    if 'description' not in df:
+        df['description'] = ''
+    if 'category' not in df:
+        df['category'] = derive_categories(df['description'].astype(str))
+    return df
+
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """JSON-friendly rows (dates as YYYY-MM-DD strings) for tool results."""
+    out = df.copy()
+    out['date'] = out['date'].dt.strftime('%Y-%m-%d')
+    return out.to_dict(orient='records')
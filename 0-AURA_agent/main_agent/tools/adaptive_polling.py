@@ -0,0 +1,107 @@
+# adaptive_polling.py
+# Per-user, per-section polling intervals that follow how often the data actually changes.
+#
+# Every poll outcome from compare_and_update is fed back: a section that changed has its
+# interval halved, a section that did not is stretched by BACKOFF_FACTOR, always within
+# [min_interval, max_interval]. A chat-triggered refresh puts the user in the fast tier
+# (min_interval for every section) for fast_tier_seconds.
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+ADAPTIVE_MIN_INTERVAL_SECONDS = float(os.getenv("ADAPTIVE_MIN_INTERVAL_SECONDS", "120"))
+ADAPTIVE_MAX_INTERVAL_SECONDS = float(os.getenv("ADAPTIVE_MAX_INTERVAL_SECONDS", str(6 * 3600)))
+ADAPTIVE_FAST_TIER_SECONDS = float(os.getenv("ADAPTIVE_FAST_TIER_SECONDS", "900"))
+BACKOFF_FACTOR = 1.5
+# Weight of the latest outcome in the per-section change-rate estimate.
+CHANGE_RATE_ALPHA = 0.2
+
+
+class _SectionState:
+    __slots__ = ("interval", "next_due", "change_rate")
+
+    def __init__(self, interval: float, next_due: float):
+        self.interval = interval
+        self.next_due = next_due
+        self.change_rate = 0.0
+
+
+class AdaptivePollingPolicy:
+    def __init__(self, sections: Iterable[str], min_interval: float = ADAPTIVE_MIN_INTERVAL_SECONDS,
+                 max_interval: float = ADAPTIVE_MAX_INTERVAL_SECONDS,
+                 fast_tier_seconds: float = ADAPTIVE_FAST_TIER_SECONDS):
+        self.sections = list(sections)
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.fast_tier_seconds = fast_tier_seconds
+        self._users: Dict[str, Dict[str, _SectionState]] = {}
+        self._fast_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, user_id: str) -> Dict[str, _SectionState]:
+        state = self._users.get(user_id)
+        if state is None:
+            # Unknown users start in the fast tier and are due right away.
+            state = self._users[user_id] = {
+                section: _SectionState(self.min_interval, 0.0) for section in self.sections
+            }
+        return state
+
+    def due_sections(self, user_id: str, now: Optional[float] = None, slack: float = 0.0) -> List[str]:
+        """Sections of user_id due within slack seconds of now."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return [section for section, s in self._state(user_id).items() if s.next_due <= now + slack]
+
+    def is_due(self, user_id: str, now: Optional[float] = None, slack: float = 0.0) -> bool:
+        return bool(self.due_sections(user_id, now, slack))
+
+    def record_outcome(self, user_id: str, polled: Iterable[str], changed: Iterable[str],
+                       now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        changed = set(changed)
+        with self._lock:
+            state = self._state(user_id)
+            fast = self._fast_until.get(user_id, 0) > now
+            for section in polled:
+                s = state.get(section)
+                if s is None:
+                    continue
+                did_change = section in changed
+                s.change_rate += CHANGE_RATE_ALPHA * ((1.0 if did_change else 0.0) - s.change_rate)
+                if did_change:
+                    s.interval = max(self.min_interval, s.interval / 2)
+                else:
+                    s.interval = min(self.max_interval, s.interval * BACKOFF_FACTOR)
+                s.next_due = now + (self.min_interval if fast else s.interval)
+
+    def mark_active(self, user_id: str, now: Optional[float] = None):
+        """Chat activity: poll every section at min_interval for the next fast_tier_seconds."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._fast_until[user_id] = now + self.fast_tier_seconds
+            for s in self._state(user_id).values():
+                s.interval = self.min_interval
+                s.next_due = min(s.next_due, now + self.min_interval)
+
+    def forget(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._fast_until.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        """Mean interval per section and how many users are in the fast tier."""
+        now = time.monotonic()
+        with self._lock:
+            users = len(self._users)
+            mean_interval = {
+                section: round(sum(state[section].interval for state in self._users.values()) / users, 1)
+                for section in self.sections
+            } if users else {}
+            return {
+                "users": users,
+                "fast_tier_users": sum(1 for until in self._fast_until.values() if until > now),
+                "mean_interval_seconds": mean_interval,
+            }
@@ -0,0 +1,357 @@
+# instrumentation.py
+# Latency, payload and error metrics for the agent tools and the polling pipeline.
+#
+# instrument(func, name) wraps a tool function (sync or async, signature and docstring
+# kept, so FunctionTool sees the original) or a pipeline stage; each call records its
+# latency in a fixed-bucket histogram, the size of its arguments and result as JSON,
+# and whether it raised. TimedBackend does the same for every Firebase read and write
+# that gets past the read-through cache. Sizing serializes the payload, so the bulk
+# paths (Firebase reads/writes, whole MCP fetch results) record latency and errors
+# only, unless METRICS_BULK_PAYLOAD_SIZES=1. Stats from other components (cache hit rates,
+# poller and outbox counters, ...) are added with register_source().
+#
+# Metrics are exported when METRICS_EXPORT is set (comma separated):
+#
+#   METRICS_EXPORT=http   GET http://METRICS_HTTP_HOST:METRICS_HTTP_PORT/metrics returns a JSON snapshot
+#   METRICS_EXPORT=file   a JSON snapshot is appended to METRICS_FILE every METRICS_EXPORT_INTERVAL_SECONDS
+#
+# Importing this module starts nothing; the exporter starts on the first recorded call
+# (or start_exporter()) and stops with stop_exporter().
+import asyncio
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+METRICS_EXPORT = os.getenv("METRICS_EXPORT", "")
+METRICS_FILE = os.getenv("METRICS_FILE", "aura_metrics.jsonl")
+METRICS_EXPORT_INTERVAL_SECONDS = float(os.getenv("METRICS_EXPORT_INTERVAL_SECONDS", "60"))
+METRICS_HTTP_HOST = os.getenv("METRICS_HTTP_HOST", "127.0.0.1")
+METRICS_HTTP_PORT = int(os.getenv("METRICS_HTTP_PORT", "9464"))
+# Sizing a payload serializes it. Tool calls are sized unless METRICS_PAYLOAD_SIZES=0;
+# the bulk paths, whose payloads are whole user documents, only with METRICS_BULK_PAYLOAD_SIZES=1.
+METRICS_PAYLOAD_SIZES = os.getenv("METRICS_PAYLOAD_SIZES", "1") != "0"
+METRICS_BULK_PAYLOAD_SIZES = os.getenv("METRICS_BULK_PAYLOAD_SIZES", "0") == "1"
+
+# Upper bounds of the latency buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+
+def payload_size(value: Any) -> Optional[int]:
+    """Size of value as compact JSON (strings and bytes by length); None if it cannot be serialized."""
+    if value is None:
+        return 0
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    try:
+        return len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyHistogram:
+    """Call count, total, max and bucket counts of latencies (not thread-safe; the registry locks)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th latency (the max for the last bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 4),
+            "buckets": {("inf" if math.isinf(bound) else f"{bound:g}"): count
+                        for bound, count in zip(self.buckets, self.counts) if count},
+        }
+
+
+class _Operation:
+    __slots__ = ("latency", "errors", "bytes_in", "bytes_out", "max_bytes_out", "last_error")
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.max_bytes_out = 0
+        self.last_error: Optional[str] = None
+
+
+class MetricsRegistry:
+    """Per-operation metrics plus named stats sources, exported as one JSON snapshot."""
+
+    def __init__(self, export: str = METRICS_EXPORT):
+        self.export = [mode.strip() for mode in export.split(",") if mode.strip()]
+        self.started_at = time.time()
+        self._operations: Dict[str, _Operation] = {}
+        self._sources: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+        self._exporter: Optional[_Exporter] = None
+
+    def record(self, name: str, seconds: float, error: Optional[BaseException] = None,
+               bytes_in: Optional[int] = None, bytes_out: Optional[int] = None):
+        with self._lock:
+            operation = self._operations.get(name)
+            if operation is None:
+                operation = self._operations[name] = _Operation()
+            operation.latency.observe(seconds)
+            if error is not None:
+                operation.errors += 1
+                operation.last_error = f"{type(error).__name__}: {error}"[:200]
+            operation.bytes_in += bytes_in or 0
+            operation.bytes_out += bytes_out or 0
+            operation.max_bytes_out = max(operation.max_bytes_out, bytes_out or 0)
+            exporter_missing = self.export and self._exporter is None
+        if exporter_missing:
+            self.start_exporter()
+
+    @contextmanager
+    def timed(self, name: str):
+        """Record the latency (and any exception) of the with-block as operation name."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(name, time.perf_counter() - start, error=e)
+            raise
+        self.record(name, time.perf_counter() - start)
+
+    def instrument(self, func: Callable, name: Optional[str] = None, sizes: bool = True) -> Callable:
+        """
+        func wrapped to record every call as operation name (default: the function's name).
+        sizes=False skips payload sizing, e.g. for a stage whose payload is already sized upstream.
+        """
+        name = name or func.__name__
+        measure = sizes and METRICS_PAYLOAD_SIZES
+
+        def payload_sizes(args, kwargs, result):
+            if not measure:
+                return None, None
+            # The ADK ToolContext is not part of the payload.
+            inputs = [arg for arg in args if not _is_tool_context(arg)]
+            inputs += [value for key, value in kwargs.items() if key != "tool_context"]
+            return payload_size(inputs) if inputs else 0, payload_size(result)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException as e:
+                    self.record(name, time.perf_counter() - start, error=e)
+                    raise
+                seconds = time.perf_counter() - start
+                self.record(name, seconds, None, *payload_sizes(args, kwargs, result))
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                self.record(name, time.perf_counter() - start, error=e)
+                raise
+            seconds = time.perf_counter() - start
+            self.record(name, seconds, None, *payload_sizes(args, kwargs, result))
+            return result
+        return wrapper
+
+    def register_source(self, name: str, stats: Callable[[], Any]):
+        """Include stats() (e.g. a cache's hit rate) under sources[name] in every snapshot."""
+        with self._lock:
+            self._sources[name] = stats
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = {
+                name: {
+                    "latency": operation.latency.snapshot(),
+                    "errors": operation.errors,
+                    "error_rate": round(operation.errors / operation.latency.count, 4) if operation.latency.count else None,
+                    "last_error": operation.last_error,
+                    "bytes_in": operation.bytes_in,
+                    "bytes_out": operation.bytes_out,
+                    "max_bytes_out": operation.max_bytes_out,
+                }
+                for name, operation in sorted(self._operations.items())
+            }
+            sources = dict(self._sources)
+        snapshot_sources = {}
+        for name, stats in sources.items():
+            try:
+                snapshot_sources[name] = stats()
+            except Exception as e:
+                snapshot_sources[name] = {"error": str(e)}
+        return {
+            "timestamp": round(time.time(), 3),
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "operations": operations,
+            "sources": snapshot_sources,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+    def start_exporter(self):
+        """Start the METRICS_EXPORT exporters (no-op if none are configured or they already run)."""
+        with self._lock:
+            if not self.export or self._exporter is not None:
+                return
+            self._exporter = _Exporter(self, self.export)
+        self._exporter.start()
+
+    def stop_exporter(self):
+        """Stop the exporters; the file exporter writes a last snapshot."""
+        with self._lock:
+            exporter, self._exporter = self._exporter, None
+        if exporter is not None:
+            exporter.stop()
+
+
+def _is_tool_context(value: Any) -> bool:
+    return type(value).__name__ in ("ToolContext", "CallbackContext")
+
+
+class _Exporter:
+    def __init__(self, registry: MetricsRegistry, modes: List[str]):
+        self.registry = registry
+        self.modes = modes
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._server = None
+
+    def start(self):
+        if "http" in self.modes:
+            # Imported here: http.server is most of this module's import time otherwise.
+            from http.server import ThreadingHTTPServer
+            try:
+                self._server = ThreadingHTTPServer((METRICS_HTTP_HOST, METRICS_HTTP_PORT), _handler(self.registry))
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+                print(f"[metrics] Serving metrics on http://{METRICS_HTTP_HOST}:{self._server.server_port}/metrics")
+            except OSError as e:
+                print(f"[metrics] Could not serve metrics on {METRICS_HTTP_HOST}:{METRICS_HTTP_PORT}: {e}")
+                self._server = None
+        if "file" in self.modes:
+            self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+            self._thread.start()
+
+    def _write(self):
+        try:
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.registry.snapshot(), default=str) + "\n")
+        except OSError as e:
+            print(f"[metrics] Could not write {METRICS_FILE}: {e}")
+
+    def _run(self):
+        while not self._stop.wait(METRICS_EXPORT_INTERVAL_SECONDS):
+            self._write()
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+            self._write()
+
+
+def _handler(registry: MetricsRegistry):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = json.dumps(registry.snapshot(), default=str).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    return MetricsHandler
+
+
+class TimedBackend:
+    """
+    read_cache backend wrapper recording get() as firebase.read and set()/update() as
+    firebase.write; payloads are sized only if sizes is set (METRICS_BULK_PAYLOAD_SIZES).
+    """
+
+    def __init__(self, backend, registry: "MetricsRegistry", prefix: str = "firebase",
+                 sizes: bool = METRICS_BULK_PAYLOAD_SIZES):
+        self.backend = backend
+        self.get = registry.instrument(backend.get, f"{prefix}.read", sizes)
+        self.set = registry.instrument(backend.set, f"{prefix}.write", sizes)
+        self.update = registry.instrument(backend.update, f"{prefix}.write", sizes)
+
+    def listen(self, path: str, callback: Callable[[str], None]):
+        return self.backend.listen(path, callback)
+
+
+# Process-wide registry used by the agents and the poller.
+registry = MetricsRegistry()
+
+def instrument(func: Callable, name: Optional[str] = None, sizes: bool = True) -> Callable:
+    return registry.instrument(func, name, sizes)
+
+def instrumented(name: str, sizes: bool = True) -> Callable[[Callable], Callable]:
+    """Decorator form of instrument()."""
+    return lambda func: registry.instrument(func, name, sizes)
+
+def instrument_tool(func: Callable) -> Callable:
+    """func recorded as tool.<name>, for FunctionTool(instrument_tool(func))."""
+    return registry.instrument(func, f"tool.{func.__name__}")
+
+def timed(name: str):
+    return registry.timed(name)
+
+def register_source(name: str, stats: Callable[[], Any]):
+    registry.register_source(name, stats)
+
+def snapshot() -> Dict[str, Any]:
+    return registry.snapshot()
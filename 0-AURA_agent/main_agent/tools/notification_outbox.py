@@ -0,0 +1,208 @@
+# notification_outbox.py
+# Asynchronous delivery of "your data changed" alerts.
+#
+# The poller only enqueues; a background thread delivers. Alerts for the same user
+# within coalesce_window seconds are merged into one message, due messages go out in
+# batches, and failed deliveries are retried with exponential backoff, so slow or
+# failing messaging never stalls polling.
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from messaging import send_message_user
+
+
+OUTBOX_COALESCE_SECONDS = float(os.getenv("OUTBOX_COALESCE_SECONDS", "60"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "5"))
+
+ALERT_HEADER = "Your finance data was updated from the server with the latest information."
+
+SECTION_LABELS = {
+    'net_worth': "Net worth",
+    'credit_report': "Credit report",
+    'epf_details': "EPF",
+    'mutual_fund_transactions': "Mutual fund transactions",
+    'stock_transactions': "Stock transactions",
+    'bank_transactions': "Bank transactions",
+}
+
+
+def _count_rows(section: Any) -> Optional[Tuple[int, int]]:
+    """(rows, accounts) for the compact transaction schemas, e.g. bankTransactions[].txns."""
+    if not isinstance(section, dict):
+        return None
+    for value in section.values():
+        if isinstance(value, list) and value and all(isinstance(v, dict) and 'txns' in v for v in value):
+            return sum(len(v.get('txns') or []) for v in value), len(value)
+    return None
+
+def summarize_changes(data: Dict[str, Any], changed: List[str]) -> Dict[str, str]:
+    """One short line per changed section instead of a dump of the whole document."""
+    summary = {}
+    for section in changed:
+        label = SECTION_LABELS.get(section, section)
+        value = data.get(section)
+        line = f"{label} updated"
+        try:
+            if section == 'net_worth':
+                total = value['netWorthResponse']['totalNetWorthValue']
+                line = f"{label}: {total.get('currencyCode', 'INR')} {float(total['units']):,.0f}"
+            elif section == 'credit_report':
+                score = value['creditReports'][0]['creditReportData']['score']['bureauScore']
+                line = f"{label}: score {score}"
+            else:
+                counts = _count_rows(value)
+                if counts:
+                    line = f"{label}: {counts[0]} transactions across {counts[1]} accounts"
+        except (KeyError, IndexError, TypeError, ValueError):
+            pass
+        summary[section] = line
+    return summary
+
+
+class _Pending:
+    __slots__ = ("summary", "due_at", "attempts")
+
+    def __init__(self, due_at: float):
+        self.summary: Dict[str, str] = {}
+        self.due_at = due_at
+        self.attempts = 0
+
+
+class NotificationOutbox:
+    """
+    deliver(user_id, message) sends one message; deliver_batch(messages), if given, sends
+    a batch and returns one success flag per message. clock (monotonic seconds) can be
+    replaced, e.g. by tests.
+    """
+
+    def __init__(self, deliver: Callable[[str, str], None] = send_message_user,
+                 deliver_batch: Optional[Callable[[List[Tuple[str, str]]], List[bool]]] = None,
+                 coalesce_window: float = OUTBOX_COALESCE_SECONDS, batch_size: int = OUTBOX_BATCH_SIZE,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS, retry_base: float = OUTBOX_RETRY_BASE_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.deliver = deliver
+        self.deliver_batch = deliver_batch
+        self.coalesce_window = coalesce_window
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.clock = clock
+        self._pending: Dict[str, _Pending] = {}
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"enqueued": 0, "coalesced": 0, "delivered": 0, "retried": 0, "dropped": 0}
+
+    def notify(self, user_id: str, summary: Dict[str, str]):
+        """Queue a change alert; merged with any alert for user_id that has not gone out yet."""
+        with self._cond:
+            pending = self._pending.get(user_id)
+            if pending is None:
+                pending = self._pending[user_id] = _Pending(self.clock() + self.coalesce_window)
+            else:
+                self._stats["coalesced"] += 1
+            pending.summary.update(summary)
+            self._stats["enqueued"] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def format_message(summary: Dict[str, str]) -> str:
+        return "\n".join([ALERT_HEADER] + [f"- {line}" for line in summary.values()])
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True, timeout: float = 10):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if flush:
+            self.flush(force=True)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return dict(self._stats, pending=len(self._pending))
+
+    def _take_due(self, force: bool, exclude: set) -> List[Tuple[str, _Pending]]:
+        now = self.clock()
+        with self._cond:
+            due = sorted(((user_id, p) for user_id, p in self._pending.items()
+                          if (force or p.due_at <= now) and user_id not in exclude),
+                         key=lambda item: item[1].due_at)[:self.batch_size]
+            for user_id, _ in due:
+                del self._pending[user_id]
+        return due
+
+    def _send(self, batch: List[Tuple[str, _Pending]]) -> List[bool]:
+        messages = [(user_id, self.format_message(p.summary)) for user_id, p in batch]
+        if self.deliver_batch is not None:
+            try:
+                return list(self.deliver_batch(messages))
+            except Exception as e:
+                print(f"[outbox] Batch delivery failed: {e}")
+                return [False] * len(messages)
+        results = []
+        for user_id, message in messages:
+            try:
+                self.deliver(user_id, message)
+                results.append(True)
+            except Exception as e:
+                print(f"[outbox] Delivery to {user_id} failed: {e}")
+                results.append(False)
+        return results
+
+    def flush(self, force: bool = False) -> int:
+        """Deliver everything that is due (or everything, if force); returns messages delivered."""
+        delivered = 0
+        attempted = set()  # each user is tried at most once per flush
+        while True:
+            batch = self._take_due(force, attempted)
+            if not batch:
+                return delivered
+            sent = 0
+            for (user_id, pending), ok in zip(batch, self._send(batch)):
+                attempted.add(user_id)
+                if ok:
+                    sent += 1
+                else:
+                    self._retry(user_id, pending)
+            delivered += sent
+            with self._cond:
+                self._stats["delivered"] += sent
+
+    def _retry(self, user_id: str, pending: _Pending):
+        pending.attempts += 1
+        with self._cond:
+            if pending.attempts >= self.max_attempts:
+                self._stats["dropped"] += 1
+                print(f"[outbox] Giving up on alert for {user_id} after {pending.attempts} attempts.")
+                return
+            self._stats["retried"] += 1
+            pending.due_at = self.clock() + self.retry_base * (2 ** (pending.attempts - 1))
+            newer = self._pending.get(user_id)
+            if newer is not None:
+                # A fresh alert arrived meanwhile; fold the failed one into it, newer lines win.
+                pending.summary.update(newer.summary)
+                pending.due_at = min(pending.due_at, newer.due_at)
+            self._pending[user_id] = pending
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                wait = min((p.due_at for p in self._pending.values()), default=None)
+                timeout = None if wait is None else max(0.0, wait - self.clock())
+                if timeout is None or timeout > 0:
+                    self._cond.wait(timeout)
+            if not self._stop.is_set():
+                self.flush()
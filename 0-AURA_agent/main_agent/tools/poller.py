@@ -0,0 +1,202 @@
+# poller.py
+# Background polling scheduler: a work queue drained by a pool of worker threads,
+# with per-user jitter, exponential backoff for failing users and cycles that are
+# skipped rather than stacked when the previous one overruns.
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+POLL_INTERVAL_SECONDS = float(os.getenv("POLL_INTERVAL_SECONDS", "120"))
+POLL_WORKERS = int(os.getenv("POLL_WORKERS", "4"))
+POLL_JITTER_SECONDS = float(os.getenv("POLL_JITTER_SECONDS", "15"))
+POLL_BACKOFF_BASE_SECONDS = float(os.getenv("POLL_BACKOFF_BASE_SECONDS", "120"))
+POLL_BACKOFF_MAX_SECONDS = float(os.getenv("POLL_BACKOFF_MAX_SECONDS", "3600"))
+
+
+class PollingScheduler:
+    """
+    Runs poll_user(user_id) for every user returned by list_users() once per interval.
+
+    poll_user returns a falsy value (or raises) on failure; the user is then held back
+    for backoff_base * 2**(failures-1) seconds, capped at backoff_max. Each queued poll
+    carries the deadline of its cycle and is dropped if a worker only reaches it after
+    that. A cycle is skipped while the previous one still has unstarted polls, and a
+    user whose previous poll is still running is left out of the new cycle, so slow
+    users and overrunning cycles never pile up.
+
+    clock (monotonic seconds) and rng (for the jitter) can be replaced, e.g. by tests.
+    """
+
+    def __init__(self, poll_user: Callable[[str], bool], list_users: Callable[[], List[str]],
+                 interval: float = POLL_INTERVAL_SECONDS, workers: int = POLL_WORKERS,
+                 jitter: float = POLL_JITTER_SECONDS, backoff_base: float = POLL_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = POLL_BACKOFF_MAX_SECONDS, clock: Callable[[], float] = time.monotonic,
+                 rng: Optional[random.Random] = None):
+        self.poll_user = poll_user
+        self.list_users = list_users
+        self.interval = interval
+        self.workers = max(1, workers)
+        self.jitter = max(0.0, min(jitter, interval / 2))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self._rng = rng or random.Random()
+
+        self._queue = []  # heap of (not_before, seq, user_id, deadline, cycle)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._scheduled = set()  # users queued or in flight
+        self._in_flight = 0
+        self._failures: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._cycles = itertools.count(1)
+        self._cycle_remaining: Dict[int, int] = {}
+        self._cycle_started: Dict[int, float] = {}
+        self._metrics = {
+            "cycles_run": 0,
+            "cycles_skipped": 0,
+            "last_cycle_lag": 0.0,
+            "max_cycle_lag": 0.0,
+            "last_cycle_duration": None,
+            "polls_ok": 0,
+            "polls_failed": 0,
+            "polls_expired": 0,
+            "users_backed_off": 0,
+        }
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._run_cycles, name="poller-cycles", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._run_worker, name=f"poller-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def metrics(self) -> Dict:
+        """Snapshot of queue depth, cycle lag and poll outcome counters."""
+        with self._cond:
+            snapshot = dict(self._metrics)
+            snapshot["queue_depth"] = len(self._queue)
+            snapshot["in_flight"] = self._in_flight
+            snapshot["users_in_backoff"] = sum(1 for t in self._retry_at.values() if t > self.clock())
+        return snapshot
+
+    def _backoff_delay(self, failures: int) -> float:
+        return min(self.backoff_max, self.backoff_base * (2 ** (failures - 1)))
+
+    def _run_cycles(self):
+        next_tick = self.clock() + self.interval
+        while not self._stop.wait(max(0.0, next_tick - self.clock())):
+            lag = self.clock() - next_tick
+            # Keep the cadence anchored; if we fell more than a whole interval behind, skip ahead.
+            missed = int(lag // self.interval)
+            next_tick += self.interval * (missed + 1)
+            try:
+                self._start_cycle(lag, missed)
+            except Exception as e:
+                print(f"[poller] Could not start polling cycle: {e}")
+
+    def _start_cycle(self, lag: float, missed: int):
+        user_ids = self.list_users()
+        start = self.clock()
+        deadline = start + self.interval
+        with self._cond:
+            self._metrics["cycles_skipped"] += missed
+            if self._queue:
+                # The previous cycle has not even started all its polls; don't stack another on top.
+                self._metrics["cycles_skipped"] += 1
+                print(f"[poller] {len(self._queue)} polls from the previous cycle still queued; skipping this cycle.")
+                return
+            self._metrics["cycles_run"] += 1
+            self._metrics["last_cycle_lag"] = round(lag, 3)
+            self._metrics["max_cycle_lag"] = round(max(self._metrics["max_cycle_lag"], lag), 3)
+            cycle = next(self._cycles)
+            queued = 0
+            for user_id in user_ids:
+                if user_id in self._scheduled:
+                    continue
+                if self._retry_at.get(user_id, 0) > start:
+                    self._metrics["users_backed_off"] += 1
+                    continue
+                not_before = start + self._rng.uniform(0, self.jitter)
+                heapq.heappush(self._queue, (not_before, next(self._seq), user_id, deadline, cycle))
+                self._scheduled.add(user_id)
+                queued += 1
+            if queued:
+                self._cycle_remaining[cycle] = queued
+                self._cycle_started[cycle] = start
+            self._cond.notify_all()
+        print(f"Background Polling: queued {queued} of {len(user_ids)} active users (lag {lag:.1f}s).")
+
+    def _next_item(self, block: bool = True) -> Optional[tuple]:
+        """The next due poll; None once stopped, or (block=False) if none is due yet."""
+        with self._cond:
+            while not self._stop.is_set():
+                wait = self._queue[0][0] - self.clock() if self._queue else None
+                if wait is not None and wait <= 0:
+                    item = heapq.heappop(self._queue)
+                    self._in_flight += 1
+                    return item
+                if not block:
+                    return None
+                self._cond.wait(wait)
+        return None
+
+    def _run_worker(self):
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            self._poll(item)
+
+    def _poll(self, item: tuple):
+        _, _, user_id, deadline, cycle = item
+        if self.clock() > deadline:
+            self._finish(user_id, cycle, None)
+            return
+        try:
+            ok = bool(self.poll_user(user_id))
+        except Exception as e:
+            print(f"[poller] Error polling user {user_id}: {e}")
+            ok = False
+        self._finish(user_id, cycle, ok)
+
+    def _finish(self, user_id: str, cycle: int, ok: Optional[bool]):
+        with self._cond:
+            self._in_flight -= 1
+            if ok is None:
+                self._metrics["polls_expired"] += 1
+            elif ok:
+                self._metrics["polls_ok"] += 1
+                self._failures.pop(user_id, None)
+                self._retry_at.pop(user_id, None)
+            else:
+                self._metrics["polls_failed"] += 1
+                failures = self._failures.get(user_id, 0) + 1
+                self._failures[user_id] = failures
+                self._retry_at[user_id] = self.clock() + self._backoff_delay(failures)
+            self._scheduled.discard(user_id)
+            self._cycle_remaining[cycle] -= 1
+            if self._cycle_remaining[cycle] == 0:
+                del self._cycle_remaining[cycle]
+                started = self._cycle_started.pop(cycle)
+                self._metrics["last_cycle_duration"] = round(self.clock() - started, 3)
@@ -1,23 +1,58 @@
 from google.adk.tools import FunctionTool, ToolContext
+import atexit
+import signal
 import subprocess
 import sys
+import os
 import json
-import firebase_admin
-from firebase_admin import credentials, db
 import threading
-import time
-import schedule
 
 
+from mcp_client import ENDPOINTS, close_mcp_client, collect_user_data, get_mcp_client, read_records
+from firebase_sync import sync_user_data
 from messaging import send_message_user
+from .instrumentation import (METRICS_BULK_PAYLOAD_SIZES, TimedBackend, instrument, instrument_tool, instrumented,
+                              register_source, registry)
+from .poller import POLL_INTERVAL_SECONDS, PollingScheduler
+from .adaptive_polling import AdaptivePollingPolicy
+from .notification_outbox import NotificationOutbox, summarize_changes
+from .read_cache import CachedReference, FirebaseBackend, ReadThroughCache
+from .user_registry import ActiveUserRegistry, FirebaseMembership
 
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(r"C:\Abhishek\0-AURA_agent\main_agent\aura-fb80a-firebase-adminsdk-fbsvc-9f19078156.json")
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': 'https://aura-fb80a-default-rtdb.firebaseio.com/'
-    })
-ref = db.reference("/")
+# Importing this module has no side effects: the Firebase app is initialized on the first
+# read or write, and background services only run between start() and stop().
+FIREBASE_SERVICE_ACCOUNT_KEY_PATH = os.getenv(
+    "FIREBASE_SERVICE_ACCOUNT_KEY_PATH",
+    r"C:\Abhishek\0-AURA_agent\main_agent\aura-fb80a-firebase-adminsdk-fbsvc-9f19078156.json"
+)
+FIREBASE_DATABASE_URL = os.getenv("FIREBASE_DATABASE_URL", 'https://aura-fb80a-default-rtdb.firebaseio.com/')
+
+_firebase_lock = threading.Lock()
+
+def _firebase_root():
+    import firebase_admin
+    from firebase_admin import credentials, db
+
+    with _firebase_lock:
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(FIREBASE_SERVICE_ACCOUNT_KEY_PATH)
+            firebase_admin.initialize_app(cred, {
+                'databaseURL': FIREBASE_DATABASE_URL
+            })
+    return db.reference("/")
+
+# All reads and writes go through a process-local read-through cache; writes made here
+# invalidate it, and FIREBASE_CACHE_LISTEN_PATHS (comma separated, e.g. "users,financial_digests")
+# adds listeners (from start()) so writes from other processes invalidate it too.
+# Reads that miss the cache and all writes are timed as firebase.read / firebase.write.
+firebase_cache = ReadThroughCache(
+    TimedBackend(FirebaseBackend(_firebase_root), registry),
+    ttl=float(os.getenv("FIREBASE_CACHE_TTL_SECONDS", "30")),
+    max_entries=int(os.getenv("FIREBASE_CACHE_MAX_ENTRIES", "1024")),
+)
+ref = CachedReference(firebase_cache)
+register_source("firebase_cache", firebase_cache.stats)
 
 def get_persistent_user_id(session_unique_key):
     user_ref = ref.child(f"users/{session_unique_key}/user_id")
@@ -27,88 +62,191 @@ def set_persistent_user_id(session_unique_key, user_id):
     user_ref = ref.child(f"users/{session_unique_key}")
     user_ref.update({"user_id": user_id})
 
-def fetch_latest_server_data(user_id: str):
+# "inprocess" uses the pooled MCP client; "subprocess" runs mcp_script.py in a fresh interpreter.
+MCP_FETCH_MODE = os.getenv("MCP_FETCH_MODE", "inprocess")
+MCP_SCRIPT_PATH = r"C:\Abhishek\0-AURA_agent\mcp_script.py"
+
+def _fetch_via_subprocess(user_id: str, failures=None):
+    # The script streams one JSON record per line on stdout (logs go to stderr), so the
+    # result is parsed as it arrives instead of scanning buffered output for braces.
+    # --no-save leaves the Firebase write to compare_and_update, which needs the old state.
+    # The child writes UTF-8 whatever the console code page (e.g. cp1252 on Windows).
     try:
-        result = subprocess.run(
-            [sys.executable, r"C:\Abhishek\0-AURA_agent\mcp_script.py", user_id],
-            capture_output=True, text=True, check=True, timeout=300
+        proc = subprocess.Popen(
+            [sys.executable, MCP_SCRIPT_PATH, "--format", "ndjson", "--no-save", user_id],
+            stdout=subprocess.PIPE, text=True, encoding="utf-8",
+            env={**os.environ, "PYTHONIOENCODING": "utf-8"}
         )
-        stdout = result.stdout
-        first_brace = stdout.find('{')
-        last_brace = stdout.rfind('}')
-        if first_brace == -1 or last_brace == -1:
-            print(f"[fetch] Failed to parse MCP output for user {user_id}")
+        watchdog = threading.Timer(300, proc.kill)
+        watchdog.start()
+        failed = {}
+        try:
+            results = dict(collect_user_data(read_records(proc.stdout), failed))
+        finally:
+            watchdog.cancel()
+            proc.stdout.close()
+            proc.wait()
+        if results.get(user_id) is None:
+            print(f"[fetch] MCP script returned no data for user {user_id} (exit code {proc.returncode})")
             return None
-        return json.loads(stdout[first_brace:last_brace + 1])
+        if failures is not None:
+            failures.extend(failed.get(user_id, []))
+        return results[user_id]
     except Exception as e:
         print(f"[fetch] MCP error for user {user_id}: {e}")
         return None
 
+# Used by the poller and by chat refreshes alike, so the stages are named after the
+# work (mcp.fetch, firebase.sync), not after the poller.
+@instrumented("mcp.fetch", sizes=METRICS_BULK_PAYLOAD_SIZES)
+def fetch_latest_server_data(user_id: str, sections=None, failures=None):
+    """
+    Fetch all sections, or only the given section keys (the subprocess mode always fetches all).
+    Sections that failed or timed out come back as {} and their keys are appended to failures.
+    """
+    if MCP_FETCH_MODE == "subprocess":
+        return _fetch_via_subprocess(user_id, failures)
+    endpoints = {key: ENDPOINTS[key] for key in sections} if sections else None
+    return get_mcp_client().fetch_user_data_blocking(user_id, endpoints, failures=failures)
+
 def get_current_firebase_data(user_id: str):
     user_ref = ref.child(f"financial_data/{user_id}")
     return user_ref.get()
 
-def save_new_data_to_firebase(user_id: str, data: dict):
-    user_ref = ref.child(f"financial_data/{user_id}")
-    user_ref.set(data)
+# The payload is sized (if at all) by mcp.fetch; this stage is the digest compare plus the delta write.
+@instrumented("firebase.sync", sizes=False)
+def save_new_data_to_firebase(user_id: str, data: dict, failed=()):
+    """Write only the sections and transactions that changed, skipping failed ones; returns the changed section keys."""
+    return sync_user_data(ref, user_id, data, failed)
+
+# Change alerts are queued here and delivered (coalesced, batched, retried) off the poller threads.
+notification_outbox = NotificationOutbox(deliver=instrument(send_message_user, "poll.notify"))
+register_source("notification_outbox", notification_outbox.stats)
 
-def compare_and_update(user_id):
+# Per-user, per-section polling intervals learned from compare_and_update outcomes.
+adaptive_polling = AdaptivePollingPolicy(ENDPOINTS)
+register_source("adaptive_polling", adaptive_polling.stats)
+
+@instrumented("poll.user", sizes=False)
+def compare_and_update(user_id, sections=None):
     """
     Fetch latest server data and compare with Firebase.
     If different, alert user and update Firebase.
+    sections limits the fetch to those section keys.
+    Returns False if the server data could not be fetched, True otherwise.
     """
-    server_data = fetch_latest_server_data(user_id)
+    failed = []
+    server_data = fetch_latest_server_data(user_id, sections, failed)
     if server_data is None:
         print(f"[compare] Could not fetch server data for user {user_id}")
-        return
-
-    firebase_data = get_current_firebase_data(user_id)
+        return False
+    if failed:
+        print(f"[compare] Keeping the stored {', '.join(failed)} for user {user_id}: fetch failed")
 
-    if json.dumps(server_data, sort_keys=True) == json.dumps(firebase_data, sort_keys=True):
+    # Section digests decide what changed; only those sections are diffed and written.
+    # Failed sections are neither written nor counted as polled.
+    changed = save_new_data_to_firebase(user_id, server_data, failed)
+    adaptive_polling.record_outcome(user_id, [section for section in server_data if section not in failed], changed)
+    if not changed:
         print(f"[compare] No new data for user {user_id}. Skipping update.")
-        return
-
-    print(f"[compare] Data changed for user {user_id}. Updating Firebase and alerting user.")
-    alert_message = "Your finance data was updated from the server with the latest information."
-    send_message_user(user_id, alert_message)
+        return True
 
-    formatted_data = json.dumps(server_data, indent=2)
-    send_message_user(user_id, f"Latest financial data:\n{formatted_data}")
+    print(f"[compare] Data changed for user {user_id} ({', '.join(changed)}). Firebase updated, alert queued.")
+    notification_outbox.notify(user_id, summarize_changes(server_data, changed))
+    return True
 
-    save_new_data_to_firebase(user_id, server_data)
-    print(f"[compare] Firebase updated and alert sent for user {user_id}.")
+def persisted_user_ids():
+    """Every user id stored under users/ (the registry reloads this list on each refresh)."""
+    users_snapshot = ref.child("users").get()
+    if not users_snapshot:
+        return []
+    return [val.get('user_id') for _, val in users_snapshot.items() if isinstance(val, dict) and val.get('user_id')]
 
-# Maintain a live list of active users for polling.
-active_user_ids = []
+# Active users, sharded so that each poller replica only polls the shards it owns.
+# Set POLLER_MEMBERSHIP=0 to skip heartbeats and have this process own every shard.
+active_users = ActiveUserRegistry(
+    membership=FirebaseMembership(ref.child("pollers")) if os.getenv("POLLER_MEMBERSHIP", "1") != "0" else None,
+    user_source=persisted_user_ids,
+    # Intervals of users this replica no longer polls would otherwise be kept forever.
+    on_release=adaptive_polling.forget,
+)
 
 def add_active_user(user_id: str):
-    if user_id not in active_user_ids:
-        active_user_ids.append(user_id)
+    active_users.add(user_id)
 
 def load_active_users_from_firebase():
-    users_snapshot = ref.child("users").get()
-    if users_snapshot:
-        for _, val in users_snapshot.items():
-            user_id = val.get('user_id')
-            if user_id:
-                add_active_user(user_id)
-load_active_users_from_firebase()
-
-def poll_all_users():
-    print("Background Polling: Checking updates for active users...")
-    for user_id in active_user_ids:
-        compare_and_update(user_id)
-
-def run_scheduler():
-    schedule.every(2).minutes.do(poll_all_users)
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
-
-def start_background_polling():
-    thread = threading.Thread(target=run_scheduler, daemon=True)
-    thread.start()
-start_background_polling()
+    active_users.reload_users()
+
+# Polls due within half a cycle are taken now rather than pushed to the next cycle.
+_DUE_SLACK_SECONDS = POLL_INTERVAL_SECONDS / 2
+
+def due_users():
+    """Owned users with at least one section due under the adaptive policy."""
+    return [user_id for user_id in active_users.owned_users()
+            if adaptive_polling.is_due(user_id, slack=_DUE_SLACK_SECONDS)]
+
+def poll_due_sections(user_id):
+    sections = adaptive_polling.due_sections(user_id, slack=_DUE_SLACK_SECONDS)
+    if not sections:
+        return True
+    return compare_and_update(user_id, sections=sections)
+
+# Background polling runs through a worker pool; see poller.py for jitter, backoff and metrics.
+poll_scheduler = PollingScheduler(poll_user=poll_due_sections, list_users=due_users)
+register_source("poller", poll_scheduler.metrics)
+
+# The services run from the agent's first turn (start_services is the agents'
+# before_agent_callback) or from the standalone poller below, and are stopped at exit:
+# queued alerts are delivered and the heartbeat and poller threads shut down.
+_lifecycle_lock = threading.Lock()
+_started = False
+_exit_hook = False
+
+def start():
+    """
+    Start the background services: join the poller membership, keep the active users in
+    sync with users/, attach cache listeners, and run the notification outbox, the
+    polling scheduler and the metrics exporter (if METRICS_EXPORT is set). Safe to call
+    more than once.
+    """
+    global _started, _exit_hook
+    with _lifecycle_lock:
+        if _started:
+            return
+        if not _exit_hook:
+            atexit.register(stop)
+            _exit_hook = True
+        # Joins the poller membership and loads users/ first: it refuses heartbeat settings
+        # that would let live pollers expire, before anything else is running.
+        active_users.start()
+        registry.start_exporter()
+        for path in filter(None, os.getenv("FIREBASE_CACHE_LISTEN_PATHS", "").split(",")):
+            firebase_cache.listen(path.strip())
+        notification_outbox.start()
+        poll_scheduler.start()
+        _started = True
+
+def stop():
+    """Stop polling, deliver queued alerts, leave the poller membership, close clients and stop the exporter."""
+    global _started
+    with _lifecycle_lock:
+        if not _started:
+            return
+        poll_scheduler.stop()
+        notification_outbox.stop(flush=True)
+        active_users.leave()
+        firebase_cache.close()
+        close_mcp_client()
+        registry.stop_exporter()
+        _started = False
+
+# Kept for callers of the old name.
+start_background_polling = start
+
+def start_services(callback_context=None):
+    """before_agent_callback for the agents: start the background services with the first turn."""
+    start()
+    return None
 
 # On-demand portfolio flow (user-triggered)
 def refresh_user_data(user_id: str):
@@ -116,21 +254,16 @@ def refresh_user_data(user_id: str):
     Fetch latest data from server and update Firebase.
     Used in interactive chat flow.
     """
+    # A user who is chatting gets the fast polling tier.
+    adaptive_polling.mark_active(user_id)
+    failed = []
+    parsed = fetch_latest_server_data(user_id, failures=failed)
+    if parsed is None:
+        print(f"Failed to fetch MCP data for user {user_id}.")
+        return False
     try:
-        result = subprocess.run(
-            [sys.executable, r"C:\Abhishek\0-AURA_agent\mcp_script.py", user_id],
-            capture_output=True, text=True, check=True, timeout=300
-        )
-        stdout = result.stdout
-        first_brace = stdout.find('{')
-        last_brace = stdout.rfind('}')
-        if first_brace == -1 or last_brace == -1:
-            print(f"Failed to parse MCP output for user {user_id}. Output:\n{stdout}")
-            return False
-
-        json_raw = stdout[first_brace:last_brace + 1]
-        parsed = json.loads(json_raw)
-        save_new_data_to_firebase(user_id, parsed)
+        changed = save_new_data_to_firebase(user_id, parsed, failed)
+        adaptive_polling.record_outcome(user_id, [section for section in parsed if section not in failed], changed)
         print(f"Data refreshed successfully for user {user_id}")
         return True
     except Exception as e:
@@ -172,5 +305,18 @@ def run_portfolio_flow(tool_context: ToolContext, force_refresh: bool = False) -
         return "No financial data found for your user."
 
 portfolio_flow_tool = FunctionTool(
-    func=run_portfolio_flow
+    func=instrument_tool(run_portfolio_flow)
 )
+
+if __name__ == "__main__":
+    # Standalone poller (python -m main_agent.tools.portfolio_api): polling resumes as soon
+    # as the process starts, without waiting for a user to talk to the agent.
+    _shutdown = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: _shutdown.set())
+    start()
+    try:
+        while not _shutdown.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    stop()
@@ -0,0 +1,264 @@
+# read_cache.py
+# Process-local read-through cache in front of the Firebase Realtime Database.
+#
+# CachedReference mimics the small part of firebase_admin's db.Reference that this
+# package uses (child/get/set/update), so existing `ref.child(path).get()` code keeps
+# working while reads are answered from memory. Entries expire after a TTL, the cache
+# is bounded with LRU eviction, every write through it invalidates the touched paths,
+# and optional listeners invalidate entries when other processes write.
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _norm(path: str) -> str:
+    return '/'.join(part for part in path.split('/') if part)
+
+def _join(base: str, path: str) -> str:
+    return _norm(f"{base}/{path}")
+
+def _overlaps(a: str, b: str) -> bool:
+    """True if one path is the other, or an ancestor of it (the root overlaps everything)."""
+    return not a or not b or a == b or a.startswith(b + '/') or b.startswith(a + '/')
+
+
+class FirebaseBackend:
+    """
+    Backend over a firebase_admin db.Reference pointing at the database root. root_ref
+    may also be a zero-argument callable returning that reference, so the Firebase app
+    is only initialized on the first read or write.
+    """
+
+    def __init__(self, root_ref):
+        self._root = root_ref
+
+    @property
+    def root(self):
+        if callable(self._root):
+            self._root = self._root()
+        return self._root
+
+    def _ref(self, path: str):
+        return self.root.child(path) if path else self.root
+
+    def get(self, path: str) -> Any:
+        return self._ref(path).get()
+
+    def set(self, path: str, value: Any):
+        self._ref(path).set(value)
+
+    def update(self, path: str, values: Dict[str, Any]):
+        self._ref(path).update(values)
+
+    def listen(self, path: str, callback: Callable[[str], None]):
+        """Call callback(changed_path) for every remote change under path; returns a registration with close()."""
+        return self._ref(path).listen(lambda event: callback(_join(path, event.path)))
+
+
+def _to_stored(value: Any) -> Any:
+    """Firebase's stored form: lists become objects keyed "0", "1", ...; nulls and empty containers vanish."""
+    if isinstance(value, list):
+        value = dict(enumerate(value))
+    if isinstance(value, dict):
+        value = {str(key): _to_stored(child) for key, child in value.items()}
+        return {key: child for key, child in value.items() if child is not None} or None
+    return value
+
+def _from_stored(value: Any) -> Any:
+    """What Firebase returns for a stored node: objects keyed by small integers read back as lists."""
+    if not isinstance(value, dict):
+        return copy.deepcopy(value)
+    children = {key: _from_stored(child) for key, child in value.items()}
+    if children and all(key.isdigit() for key in children):
+        # Same rule as the Realtime Database: an array if more than half of 0..max are present.
+        indices = [int(key) for key in children]
+        if max(indices) < 2 * len(indices):
+            items = [None] * (max(indices) + 1)
+            for index, child in zip(indices, children.values()):
+                items[index] = child
+            return items
+    return children
+
+
+class InMemoryBackend:
+    """
+    Dict-backed stand-in for Firebase with the same semantics for nulls, empty
+    containers and lists (stored as integer-keyed objects, so a write to "a/0" under a
+    stored list changes one element, and read back as lists when keys are dense).
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None):
+        self.data: Dict[str, Any] = _to_stored(data) or {}
+        self.reads = 0
+        self._listeners: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Any:
+        with self._lock:
+            self.reads += 1
+            node = self.data
+            for part in _norm(path).split('/') if _norm(path) else []:
+                if not isinstance(node, dict) or part not in node:
+                    return None
+                node = node[part]
+            return _from_stored(node)
+
+    def _put(self, path: str, value: Any):
+        parts = _norm(path).split('/')
+        node, trail = self.data, []
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            trail.append((node, part))
+            node = child
+        value = _to_stored(value)
+        if value is None:
+            node.pop(parts[-1], None)
+            # Parents left empty disappear as well.
+            for parent, part in reversed(trail):
+                if parent[part]:
+                    break
+                del parent[part]
+        else:
+            node[parts[-1]] = value
+
+    def set(self, path: str, value: Any):
+        with self._lock:
+            if _norm(path):
+                self._put(path, value)
+            else:
+                self.data = _to_stored(value) or {}
+        self._notify(path)
+
+    def update(self, path: str, values: Dict[str, Any]):
+        with self._lock:
+            for key, value in values.items():
+                self._put(_join(path, key), value)
+        for key in values:
+            self._notify(_join(path, key))
+
+    def listen(self, path: str, callback: Callable[[str], None]):
+        entry = (_norm(path), callback)
+        self._listeners.append(entry)
+        backend = self
+
+        class _Registration:
+            def close(self):
+                if entry in backend._listeners:
+                    backend._listeners.remove(entry)
+        return _Registration()
+
+    def _notify(self, path: str):
+        path = _norm(path)
+        for base, callback in list(self._listeners):
+            if _overlaps(base, path):
+                callback(path)
+
+
+class ReadThroughCache:
+    """
+    TTL + LRU cache of backend reads keyed by normalized path.
+
+    Cached values are shared, not copied: callers must treat what get() returns as
+    read-only. A write at a path invalidates that path, its ancestors and its
+    descendants, since any of them may now read differently.
+    """
+
+    def __init__(self, backend, ttl: float = 30, max_entries: int = 1024):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._registrations = []
+        # Bumped on every invalidation so a read that raced with a write is not cached.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path: str) -> Any:
+        path = _norm(path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        value = self.backend.get(path)
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._entries[path] = (now + self.ttl, value)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def set(self, path: str, value: Any):
+        self.backend.set(_norm(path), value)
+        self.invalidate(path)
+
+    def update(self, path: str, values: Dict[str, Any]):
+        self.backend.update(_norm(path), values)
+        for key in values:
+            self.invalidate(_join(path, key))
+
+    def invalidate(self, path: str):
+        path = _norm(path)
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if _overlaps(key, path)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def listen(self, path: str):
+        """Invalidate entries on remote changes under path (e.g. writes by mcp_script or other replicas)."""
+        self._registrations.append(self.backend.listen(_norm(path), self.invalidate))
+
+    def close(self):
+        for registration in self._registrations:
+            registration.close()
+        self._registrations = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+class CachedReference:
+    """db.Reference look-alike whose reads go through a ReadThroughCache."""
+
+    def __init__(self, cache: ReadThroughCache, path: str = ''):
+        self.cache = cache
+        self.path = _norm(path)
+
+    def child(self, path: str) -> "CachedReference":
+        return CachedReference(self.cache, _join(self.path, path))
+
+    def get(self) -> Any:
+        return self.cache.get(self.path)
+
+    def set(self, value: Any):
+        self.cache.set(self.path, value)
+
+    def update(self, values: Dict[str, Any]):
+        self.cache.update(self.path, values)
@@ -0,0 +1,218 @@
+# user_registry.py
+# Sharded registry of users to poll, for running several poller replicas side by side.
+#
+# Each user hashes to one of a fixed number of shards; shards are spread over the live
+# workers with a consistent-hash ring, so every shard has exactly one owner and a worker
+# joining or leaving only moves the shards next to it on the ring. Workers announce
+# themselves with heartbeats under pollers/ in Firebase, sent from their own thread
+# every POLLER_HEARTBEAT_SECONDS so that a long polling cycle cannot make a live worker
+# look dead to the others (POLLER_DEAD_AFTER_SECONDS must allow a few missed beats).
+#
+# Users are registered on whichever replica the user happens to talk to, but polled by
+# the owner of their shard. The persisted user list (users/ in Firebase) is therefore
+# the source of truth: every replica reloads it on each refresh, so a user added on one
+# replica reaches the shard owner within a heartbeat interval.
+import bisect
+import hashlib
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+
+POLL_SHARDS = int(os.getenv("POLL_SHARDS", "64"))
+POLLER_WORKER_ID = os.getenv("POLLER_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+POLLER_HEARTBEAT_SECONDS = float(os.getenv("POLLER_HEARTBEAT_SECONDS", "30"))
+POLLER_DEAD_AFTER_SECONDS = float(os.getenv("POLLER_DEAD_AFTER_SECONDS", "90"))
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def shard_of(user_id: str, num_shards: int = POLL_SHARDS) -> int:
+    return _hash(user_id) % num_shards
+
+
+class HashRing:
+    """Consistent-hash ring of worker ids with virtual nodes for an even spread."""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64):
+        self.vnodes = vnodes
+        self.nodes = sorted(set(nodes))
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self._keys = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[index]
+
+
+class FirebaseMembership:
+    """Worker heartbeats stored as pollers/{worker_id}: {"heartbeat": unix_time}."""
+
+    def __init__(self, pollers_ref, dead_after: float = POLLER_DEAD_AFTER_SECONDS):
+        self.pollers_ref = pollers_ref
+        self.dead_after = dead_after
+
+    def heartbeat(self, worker_id: str):
+        self.pollers_ref.child(worker_id).set({"heartbeat": time.time()})
+
+    def leave(self, worker_id: str):
+        self.pollers_ref.child(worker_id).set(None)
+
+    def live_workers(self) -> List[str]:
+        snapshot = self.pollers_ref.get() or {}
+        cutoff = time.time() - self.dead_after
+        return [worker for worker, info in snapshot.items()
+                if isinstance(info, dict) and info.get("heartbeat", 0) >= cutoff]
+
+
+class ActiveUserRegistry:
+    """
+    Set of active user ids bucketed by shard. owned_users() returns only the users in
+    shards this worker owns; without a membership backend the worker owns every shard.
+    user_source returns every persisted user id; when set, the registry is synced to it
+    on start() and on every refresh. on_release(user_id) is called for every user this
+    worker stops polling (removed, or in a shard that moved to another worker), so
+    per-user state kept elsewhere can be dropped.
+    """
+
+    def __init__(self, num_shards: int = POLL_SHARDS, worker_id: str = POLLER_WORKER_ID,
+                 membership: Optional[FirebaseMembership] = None,
+                 heartbeat_interval: float = POLLER_HEARTBEAT_SECONDS,
+                 user_source: Optional[Callable[[], Iterable[str]]] = None,
+                 on_release: Optional[Callable[[str], None]] = None):
+        self.num_shards = num_shards
+        self.worker_id = worker_id
+        self.membership = membership
+        self.heartbeat_interval = heartbeat_interval
+        self.user_source = user_source
+        self.on_release = on_release
+        self._shards: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._ring = HashRing([worker_id])
+        self._owned: Set[int] = set(range(num_shards))
+        self._last_heartbeat = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, user_id: str):
+        with self._lock:
+            self._shards.setdefault(shard_of(user_id, self.num_shards), set()).add(user_id)
+
+    def discard(self, user_id: str):
+        with self._lock:
+            self._shards.get(shard_of(user_id, self.num_shards), set()).discard(user_id)
+        self._release([user_id])
+
+    def _release(self, user_ids: Iterable[str]):
+        if self.on_release is None:
+            return
+        for user_id in user_ids:
+            try:
+                self.on_release(user_id)
+            except Exception as e:
+                print(f"[registry] Error releasing user {user_id}: {e}")
+
+    def reload_users(self):
+        """Sync the registry to user_source: add new users, drop users no longer persisted."""
+        if self.user_source is None:
+            return
+        try:
+            persisted = set(self.user_source())
+        except Exception as e:
+            print(f"[registry] Could not reload users, keeping the current list: {e}")
+            return
+        with self._lock:
+            current = {user for shard in self._shards.values() for user in shard}
+            self._shards = {}
+            for user_id in persisted:
+                self._shards.setdefault(shard_of(user_id, self.num_shards), set()).add(user_id)
+        added, removed = persisted - current, current - persisted
+        if added or removed:
+            print(f"[registry] Reloaded users: {len(persisted)} active (+{len(added)} -{len(removed)}).")
+        self._release(removed)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._shards.get(shard_of(user_id, self.num_shards), ())
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self._shards.values())
+
+    def __iter__(self):
+        with self._lock:
+            users = [user for shard in self._shards.values() for user in shard]
+        return iter(users)
+
+    def owned_shards(self) -> Set[int]:
+        return set(self._owned)
+
+    def rebalance(self, live_workers: Iterable[str]):
+        """Recompute shard ownership for the given worker set (this worker is always included)."""
+        workers = set(live_workers) | {self.worker_id}
+        if workers == set(self._ring.nodes):
+            return
+        ring = HashRing(workers)
+        owned = {shard for shard in range(self.num_shards) if ring.owner(f"shard-{shard}") == self.worker_id}
+        gained, lost = owned - self._owned, self._owned - owned
+        with self._lock:
+            self._ring, self._owned = ring, owned
+            moved = [user for shard in lost for user in self._shards.get(shard, ())]
+        print(f"[registry] {len(workers)} pollers live; worker {self.worker_id} owns {len(owned)}/{self.num_shards} "
+              f"shards (+{len(gained)} -{len(lost)}).")
+        self._release(moved)
+
+    def refresh_membership(self, force: bool = False):
+        """Heartbeat, rebalance and reload the users if the heartbeat interval has passed."""
+        if self.membership is None and self.user_source is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_heartbeat < self.heartbeat_interval:
+            return
+        self._last_heartbeat = now
+        if self.membership is not None:
+            try:
+                self.membership.heartbeat(self.worker_id)
+                self.rebalance(self.membership.live_workers())
+            except Exception as e:
+                print(f"[registry] Membership refresh failed, keeping current shards: {e}")
+        self.reload_users()
+
+    def owned_users(self) -> List[str]:
+        """Users this worker should poll, after refreshing membership if due."""
+        self.refresh_membership()
+        with self._lock:
+            return [user for shard in self._owned for user in self._shards.get(shard, ())]
+
+    def start(self):
+        """Join the membership and load the users now, and keep refreshing both from a background thread."""
+        if (self.membership is None and self.user_source is None) or self._thread is not None:
+            return
+        if self.membership is not None and self.membership.dead_after < 2 * self.heartbeat_interval:
+            raise ValueError(
+                f"POLLER_DEAD_AFTER_SECONDS ({self.membership.dead_after:g}) must be at least twice "
+                f"POLLER_HEARTBEAT_SECONDS ({self.heartbeat_interval:g}), or live pollers will be seen as dead.")
+        self.refresh_membership(force=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_heartbeats, name="poller-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _run_heartbeats(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            self.refresh_membership(force=True)
+
+    def leave(self):
+        """Stop heartbeating and drop out of the membership so other workers pick up our shards on their next refresh."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        if self.membership is not None:
+            try:
+                self.membership.leave(self.worker_id)
+            except Exception as e:
+                print(f"[registry] Could not remove worker {self.worker_id}: {e}")
@@ -0,0 +1,436 @@
+# mcp_client.py
+# Long-lived in-process MCP client. Keeps initialized sessions to the MCP server
+# pooled and reuses them across users and calls, so a refresh no longer pays for
+# an interpreter start and a fresh streamable-HTTP handshake.
+import asyncio
+import json
+import os
+import queue
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# The mcp package is imported where sessions are opened and results parsed, so importing
+# this module (e.g. for ENDPOINTS) stays cheap.
+if TYPE_CHECKING:
+    from mcp.client.session import ClientSession
+
+
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8080/mcp/stream")
+
+ENDPOINTS = {
+    'net_worth': 'fetch_net_worth',
+    'credit_report': 'fetch_credit_report',
+    'epf_details': 'fetch_epf_details',
+    'mutual_fund_transactions': 'fetch_mf_transactions',
+    'stock_transactions': 'fetch_stock_transactions',
+    'bank_transactions': 'fetch_bank_transactions'
+}
+
+# Concurrent fetch settings. MCP_MAX_CONCURRENCY=1 restores the old one-by-one behaviour.
+MAX_CONCURRENCY = int(os.getenv("MCP_MAX_CONCURRENCY", len(ENDPOINTS)))
+ENDPOINT_TIMEOUT = float(os.getenv("MCP_ENDPOINT_TIMEOUT", "60"))
+POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "4"))
+USER_FETCH_TIMEOUT = float(os.getenv("MCP_USER_FETCH_TIMEOUT", "300"))
+# Batch mode: number of shared sessions and users in flight on each of them. In the
+# client service batches get their own pool, so they never hold the sessions that
+# interactive fetches (chat refreshes, per-user polls) borrow.
+BATCH_SESSIONS = int(os.getenv("MCP_BATCH_SESSIONS", POOL_SIZE))
+BATCH_USERS_PER_SESSION = int(os.getenv("MCP_BATCH_USERS_PER_SESSION", "4"))
+
+
+async def fetch_endpoint(session, user_id, key, tool_name, semaphore, timeout, failures=None):
+    """Call one MCP tool. Failures and timeouts are isolated to this endpoint and yield {}."""
+    from mcp.types import TextContent
+
+    async with semaphore:
+        try:
+            # Pass user_id in tool call
+            tool_response = await asyncio.wait_for(
+                session.call_tool(tool_name, {"user_id": user_id}), timeout
+            )
+            if tool_response.content and isinstance(tool_response.content[0], TextContent):
+                return key, json.loads(tool_response.content[0].text)
+            return key, {}
+        except asyncio.TimeoutError:
+            print(f"--- SCRIPT: Timed out fetching {tool_name} after {timeout}s. Skipping... ---")
+        except Exception as e:
+            print(f"--- SCRIPT: Error fetching {tool_name}: {e}. Skipping... ---")
+        if failures is not None:
+            failures.append(key)
+        return key, {}
+
+async def fetch_all_endpoints(session, user_id, endpoints=None, max_concurrency=None, timeout=None, failures=None,
+                              on_result=None):
+    """
+    Issue all endpoint calls at once on an initialized session, at most
+    max_concurrency in flight, and return {section_key: parsed_data}.
+    Keys of endpoints that failed or timed out are appended to failures.
+    on_result(section_key, parsed_data) is called as each endpoint completes.
+    """
+    endpoints = endpoints or ENDPOINTS
+    semaphore = asyncio.Semaphore(max(1, max_concurrency or MAX_CONCURRENCY))
+    timeout = timeout or ENDPOINT_TIMEOUT
+
+    async def run(key, tool_name):
+        result = await fetch_endpoint(session, user_id, key, tool_name, semaphore, timeout, failures)
+        if on_result is not None:
+            on_result(*result)
+        return result
+
+    results = await asyncio.gather(*(run(key, tool_name) for key, tool_name in endpoints.items()))
+    # Keep the section order of the endpoint table regardless of completion order.
+    return dict(results)
+
+
+class _PooledSession:
+    """An initialized ClientSession plus the task that owns its transport."""
+
+    def __init__(self, session: "ClientSession", closing: asyncio.Event, holder: asyncio.Task):
+        self.session = session
+        self.closing = closing
+        self.holder = holder
+
+    async def close(self):
+        self.closing.set()
+        try:
+            await self.holder
+        except Exception as e:
+            print(f"[mcp] Error while closing session: {e}")
+
+
+class MCPSessionPool:
+    """
+    Bounded pool of initialized MCP sessions. Must be used from a single event loop.
+
+    The streamable-HTTP transport runs inside an anyio task group, which has to be
+    entered and exited by the same task, so every session lives in its own holder
+    task that keeps the transport open until the session is closed.
+    """
+
+    def __init__(self, url: str = MCP_SERVER_URL, size: int = POOL_SIZE):
+        self.url = url
+        self.size = max(1, size)
+        self._idle: List[_PooledSession] = []
+        self._open_count = 0
+        self._available: Optional[asyncio.Condition] = None
+
+    async def _hold_session(self, ready: asyncio.Future, closing: asyncio.Event):
+        from mcp.client.session import ClientSession
+        from mcp.client.streamable_http import streamablehttp_client
+
+        try:
+            async with streamablehttp_client(self.url) as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    ready.set_result(session)
+                    await closing.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                print(f"[mcp] Pooled session terminated: {e}")
+
+    async def _open_session(self) -> _PooledSession:
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        closing = asyncio.Event()
+        holder = loop.create_task(self._hold_session(ready, closing))
+        session = await ready
+        return _PooledSession(session, closing, holder)
+
+    @asynccontextmanager
+    async def session(self):
+        """Borrow an initialized session; it is discarded instead of returned if the body raises."""
+        if self._available is None:
+            self._available = asyncio.Condition()
+        async with self._available:
+            while not self._idle and self._open_count >= self.size:
+                await self._available.wait()
+            pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                self._open_count += 1
+        if pooled is None:
+            try:
+                pooled = await self._open_session()
+            except BaseException:
+                await self._release(None)
+                raise
+        try:
+            yield pooled.session
+        except BaseException:
+            await self._release(None)
+            await pooled.close()
+            raise
+        await self._release(pooled)
+
+    async def _release(self, pooled: Optional[_PooledSession]):
+        async with self._available:
+            if pooled is None:
+                self._open_count -= 1
+            else:
+                self._idle.append(pooled)
+            self._available.notify()
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        self._open_count -= len(idle)
+        for pooled in idle:
+            await pooled.close()
+
+
+class _BrokenSession(Exception):
+    """Every endpoint failed on a session; assume the transport is dead and drop it."""
+
+
+async def fetch_batch(pool: MCPSessionPool, user_ids: Iterable[str],
+                      emit: Callable[[str, Optional[Dict[str, Any]]], None],
+                      sessions: int = BATCH_SESSIONS, per_session: int = BATCH_USERS_PER_SESSION,
+                      on_section: Optional[Callable[[str, str, Any], None]] = None,
+                      failures: Optional[Dict[str, List[str]]] = None):
+    """
+    Fetch many users over a few shared sessions. Each borrowed session serves up to
+    per_session users at a time; emit(user_id, data) is called as each user finishes,
+    with data=None for users that could not be fetched. Every user is emitted once.
+    on_section(user_id, section_key, parsed_data), if given, sees each endpoint result.
+    failures[user_id], if given, is set to the user's failed section keys before emit.
+    """
+    pending = deque(dict.fromkeys(user_ids))
+    sessions = max(1, sessions)
+    per_session = max(1, per_session)
+
+    async def lane():
+        async with pool.session() as session:
+            broken = False
+
+            async def worker():
+                nonlocal broken
+                while pending and not broken:
+                    user_id = pending.popleft()
+                    failed = []
+                    on_result = None
+                    if on_section is not None:
+                        on_result = lambda key, value, user_id=user_id: on_section(user_id, key, value)
+                    data = None
+                    try:
+                        data = await fetch_all_endpoints(session, user_id, failures=failed, on_result=on_result)
+                        if len(failed) == len(ENDPOINTS):
+                            broken = True
+                            data = None
+                        elif failures is not None:
+                            failures[user_id] = failed
+                    finally:
+                        # Popped users are always emitted, as failed (None) if anything above raised.
+                        emit(user_id, data)
+
+            await asyncio.gather(*(worker() for _ in range(per_session)))
+            if broken:
+                raise _BrokenSession("all endpoints failed for a user")
+
+    # A lane whose session breaks is replaced, but only up to a limit so a dead
+    # server does not turn into an endless reconnect loop.
+    lane_starts, max_lane_starts = 0, sessions * 2
+    running = set()
+    while pending or running:
+        while pending and len(running) < sessions and lane_starts < max_lane_starts:
+            running.add(asyncio.create_task(lane()))
+            lane_starts += 1
+        if not running:
+            break
+        done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                print(f"[mcp] Batch session closed: {task.exception()!r}")
+    while pending:
+        emit(pending.popleft(), None)
+
+
+async def next_emitted(results: asyncio.Queue, batch: "asyncio.Future") -> Optional[Tuple[str, Any]]:
+    """
+    Next (user_id, data) put on results by a fetch_batch running as batch, or None once
+    the batch has ended with nothing left to read (so callers stop waiting and await it).
+    """
+    if results.empty() and not batch.done():
+        getter = asyncio.ensure_future(results.get())
+        await asyncio.wait({getter, batch}, return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            return getter.result()
+        getter.cancel()
+    return None if results.empty() else results.get_nowait()
+
+
+class MCPClientService:
+    """
+    Runs an MCPSessionPool on a dedicated event loop thread so that both sync code
+    (the poller, FunctionTools) and async code on other loops can share it. Batches
+    (fetch_many, iter_user_data) run on a second pool of their own.
+    """
+
+    def __init__(self, url: str = MCP_SERVER_URL, pool_size: int = POOL_SIZE, batch_sessions: int = BATCH_SESSIONS):
+        self.pool = MCPSessionPool(url, pool_size)
+        self.batch_pool = MCPSessionPool(url, batch_sessions)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-client", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        with self._lock:
+            if self._thread is None:
+                return
+            for pool in (self.pool, self.batch_pool):
+                future = asyncio.run_coroutine_threadsafe(pool.close(), self._loop)
+                try:
+                    future.result(timeout)
+                except Exception as e:
+                    print(f"[mcp] Error while closing session pool: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    async def _fetch(self, user_id: str, endpoints: Optional[Dict[str, str]] = None,
+                     failures: Optional[List[str]] = None) -> Dict[str, Any]:
+        # One retry on a fresh session covers servers that dropped an idle pooled connection.
+        for attempt in range(2):
+            try:
+                async with self.pool.session() as session:
+                    endpoints = endpoints or ENDPOINTS
+                    failed = []
+                    data = await fetch_all_endpoints(session, user_id, endpoints, failures=failed)
+                    if len(failed) == len(endpoints):
+                        raise _BrokenSession(f"all {len(endpoints)} endpoints failed")
+                    if failures is not None:
+                        failures.extend(failed)
+                    return data
+            except _BrokenSession:
+                if attempt:
+                    raise
+                print(f"[mcp] Discarding session after total failure for user {user_id}; retrying once.")
+
+    def _submit(self, coro):
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def fetch_user_data(self, user_id: str, endpoints: Optional[Dict[str, str]] = None,
+                              failures: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Fetch all sections for user_id as a parsed dict. Safe to await from any event loop.
+        Keys of sections that failed (and are {} in the result) are appended to failures.
+        """
+        if self._loop is not None and asyncio.get_running_loop() is self._loop:
+            return await self._fetch(user_id, endpoints, failures)
+        return await asyncio.wrap_future(self._submit(self._fetch(user_id, endpoints, failures)))
+
+    async def fetch_many(self, user_ids: Iterable[str]) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Async batch API: yields (user_id, data or None) in completion order."""
+        user_ids = list(user_ids)
+        results: asyncio.Queue = asyncio.Queue()
+        caller_loop = asyncio.get_running_loop()
+        if caller_loop is self._loop:
+            emit = lambda user_id, data: results.put_nowait((user_id, data))
+        else:
+            emit = lambda user_id, data: caller_loop.call_soon_threadsafe(results.put_nowait, (user_id, data))
+        future = asyncio.wrap_future(self._submit(fetch_batch(self.batch_pool, user_ids, emit, self.batch_pool.size)))
+        for _ in range(len(dict.fromkeys(user_ids))):
+            item = await next_emitted(results, future)
+            if item is None:
+                break
+            yield item
+        await future
+
+    def iter_user_data(self, user_ids: Iterable[str]) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """Sync batch API for threads: yields (user_id, data or None) as each user finishes."""
+        user_ids = list(dict.fromkeys(user_ids))
+        results: queue.Queue = queue.Queue()
+        future = self._submit(fetch_batch(self.batch_pool, user_ids, lambda user_id, data: results.put((user_id, data)),
+                                          self.batch_pool.size))
+        for _ in range(len(user_ids)):
+            while True:
+                try:
+                    item = results.get(timeout=0.5)
+                    break
+                except queue.Empty:
+                    # Emits happen before the batch completes, so done + empty means nothing more is coming.
+                    if future.done() and results.empty():
+                        item = None
+                        break
+            if item is None:
+                break
+            yield item
+        future.result()
+
+    def fetch_user_data_blocking(self, user_id: str, endpoints: Optional[Dict[str, str]] = None,
+                                 timeout: float = USER_FETCH_TIMEOUT,
+                                 failures: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Sync wrapper for threads. Returns None if the fetch failed as a whole; failed sections go to failures."""
+        future = self._submit(self._fetch(user_id, endpoints, failures))
+        try:
+            return future.result(timeout)
+        except Exception as e:
+            future.cancel()
+            print(f"[fetch] MCP error for user {user_id}: {e!r}")
+            return None
+
+
+# Structured result channel of mcp_script.py (--format ndjson): one compact JSON record
+# per line, written as results arrive, with all log output on stderr.
+#   {"type": "section", "user_id": ..., "section": ..., "data": ...}
+#   {"type": "done", "user_id": ..., "failed": [...]}
+#   {"type": "error", "user_id": ..., "error": ...}
+
+def read_records(stream) -> Iterator[Dict[str, Any]]:
+    """Parse result records line by line from a text stream as they are written."""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def collect_user_data(records: Iterable[Dict[str, Any]],
+                      failures: Optional[Dict[str, List[str]]] = None) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Assemble section records into (user_id, data) pairs; data is None for failed users.
+    The failed sections of each done user are stored in failures[user_id].
+    """
+    partial: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        user_id = record.get("user_id")
+        if record.get("type") == "section":
+            partial.setdefault(user_id, {})[record["section"]] = record["data"]
+        elif record.get("type") == "done":
+            if failures is not None:
+                failures[user_id] = list(record.get("failed") or [])
+            yield user_id, partial.pop(user_id, {})
+        elif record.get("type") == "error":
+            partial.pop(user_id, None)
+            yield user_id, None
+
+
+_service: Optional[MCPClientService] = None
+_service_lock = threading.Lock()
+
+def get_mcp_client() -> MCPClientService:
+    """Process-wide MCP client service, created and started on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = MCPClientService()
+            _service.start()
+        return _service
+
+def close_mcp_client():
+    """Stop the process-wide client if it was ever started; the next get_mcp_client() starts a new one."""
+    global _service
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        service.stop()
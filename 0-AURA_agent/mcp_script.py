@@ -1,65 +1,156 @@
+import argparse
 import asyncio
+import contextlib
 import json
 import sys
-import firebase_admin
-from firebase_admin import credentials, db
 from mcp.client.session import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
-from mcp.types import TextContent
 
+from mcp_client import (BATCH_SESSIONS, BATCH_USERS_PER_SESSION, ENDPOINTS, MCP_SERVER_URL, MCPSessionPool,
+                        fetch_all_endpoints, fetch_batch, next_emitted)
+from firebase_sync import sync_user_data
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("firebase-cred-file.json")
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': "firebase data store URL here"
-    })
-ref = db.reference("/")
 
-async def main():
+_ref = None
+
+def get_ref():
+    """Database root reference; the Firebase app is initialized on first use (--no-save never needs it)."""
+    global _ref
+    if _ref is None:
+        import firebase_admin
+        from firebase_admin import credentials, db
+
+        if not firebase_admin._apps:
+            cred = credentials.Certificate("firebase-cred-file.json")
+            firebase_admin.initialize_app(cred, {
+                'databaseURL': "firebase data store URL here"
+            })
+        _ref = db.reference("/")
+    return _ref
+
+def read_user_ids(source):
+    """User IDs from a file (one per line, '-' for stdin); blank lines and '#' comments are ignored."""
+    with (contextlib.nullcontext(sys.stdin) if source == '-' else open(source)) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def open_output(path):
+    """Destination of structured records: a file path, or '-' for stdout."""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdout)
+    return open(path, 'w', encoding='utf-8')
+
+def write_record(out, record):
+    """
+    One compact JSON record per line, flushed so readers can parse it immediately.
+    Non-ASCII text is escaped, so records survive any stdout encoding (e.g. cp1252 on Windows).
+    """
+    out.write(json.dumps(record, separators=(',', ':'), ensure_ascii=True) + "\n")
+    out.flush()
+
+def section_writer(out):
+    return lambda user_id, key, value: write_record(
+        out, {"type": "section", "user_id": user_id, "section": key, "data": value}
+    )
+
+async def main_batch(source, sessions=BATCH_SESSIONS, per_session=BATCH_USERS_PER_SESSION, output='-', save=True):
+    """
+    Fetch (and save) many users over a few shared sessions. Section records are written
+    as each endpoint returns and a done/error record closes each user; progress goes to stderr.
+    """
+    with open_output(output) as out, contextlib.redirect_stdout(sys.stderr):
+        user_ids = read_user_ids(source)
+        print(f"--- SCRIPT: Starting batch MCP fetch for {len(user_ids)} users ---")
+        results = asyncio.Queue()
+        failures = {}
+        pool = MCPSessionPool(MCP_SERVER_URL, sessions)
+        batch = asyncio.create_task(fetch_batch(
+            pool, user_ids, lambda user_id, data: results.put_nowait((user_id, data)), sessions, per_session,
+            on_section=section_writer(out), failures=failures
+        ))
+        try:
+            for _ in range(len(dict.fromkeys(user_ids))):
+                item = await next_emitted(results, batch)
+                if item is None:
+                    break
+                user_id, data = item
+                if data is None:
+                    write_record(out, {"type": "error", "user_id": user_id, "error": "MCP fetch failed"})
+                    continue
+                record = {"type": "done", "user_id": user_id, "failed": failures.pop(user_id, [])}
+                if save:
+                    try:
+                        await asyncio.to_thread(sync_user_data, get_ref(), user_id, data, record["failed"])
+                    except Exception as e:
+                        record["save_error"] = str(e)
+                write_record(out, record)
+            await batch
+        finally:
+            await pool.close()
+        print("--- SCRIPT: Batch complete ---")
+
+async def main_structured(user_id, output='-', save=True):
+    """Single user with the structured result channel: section records, then done or error."""
+    with open_output(output) as out, contextlib.redirect_stdout(sys.stderr):
+        print("--- SCRIPT: Starting MCP fetch for user ---")
+        if not user_id:
+            write_record(out, {"type": "error", "user_id": None, "error": "No user_id provided."})
+            return
+        try:
+            failures = []
+            async with streamablehttp_client(MCP_SERVER_URL) as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    all_data = await fetch_all_endpoints(
+                        session, user_id, failures=failures,
+                        on_result=lambda key, value: section_writer(out)(user_id, key, value)
+                    )
+            if len(failures) == len(ENDPOINTS):
+                write_record(out, {"type": "error", "user_id": user_id, "error": "All MCP endpoints failed"})
+                return
+            if save:
+                sync_user_data(get_ref(), user_id, all_data, failures)
+                print(f"--- SCRIPT: Financial data saved to Firebase for user {user_id} ---")
+            write_record(out, {"type": "done", "user_id": user_id, "failed": failures})
+        except Exception as e:
+            write_record(out, {"type": "error", "user_id": user_id, "error": f"Script exception: {str(e)}"})
+
+async def main(user_id=None):
     print("--- SCRIPT: Starting MCP fetch for user ---")
     try:
         
-        if len(sys.argv) > 1:
-            user_id = sys.argv[1]
-        else:
+        if not user_id:
             print(json.dumps({"error": "No user_id provided. Please pass user_id as argument."}))
             return
 
-        endpoints = {
-            'net_worth': 'fetch_net_worth',
-            'credit_report': 'fetch_credit_report',
-            'epf_details': 'fetch_epf_details',
-            'mutual_fund_transactions': 'fetch_mf_transactions',
-            'stock_transactions': 'fetch_stock_transactions',
-            'bank_transactions': 'fetch_bank_transactions'
-        }
-        all_data = {}
-
-        
-        async with streamablehttp_client("http://localhost:8080/mcp/stream") as (read, write, _):
+        failures = []
+        async with streamablehttp_client(MCP_SERVER_URL) as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
-                for key, tool_name in endpoints.items():
-                    try:
-                        # Pass user_id in tool call
-                        tool_response = await session.call_tool(tool_name, {"user_id": user_id})
-                        if tool_response.content and isinstance(tool_response.content[0], TextContent):
-                            parsed = json.loads(tool_response.content[0].text)
-                            all_data[key] = parsed
-                        else:
-                            all_data[key] = {}
-                    except Exception as e:
-                        print(f"--- SCRIPT: Error fetching {tool_name}: {e}. Skipping... ---")
-                        all_data[key] = {}
+                all_data = await fetch_all_endpoints(session, user_id, failures=failures)
 
         print("--- SCRIPT: Final data collected ---")
         print(json.dumps(all_data, indent=2))
 
-        user_ref = ref.child(f"financial_data/{user_id}")
-        user_ref.set(all_data)
+        sync_user_data(get_ref(), user_id, all_data, failures)
         print(f"--- SCRIPT: Financial data saved to Firebase for user {user_id} ---")
     except Exception as e:
         print(json.dumps({"error": f"Script exception: {str(e)}"}))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Fetch MCP financial data and save it to Firebase.")
+    parser.add_argument("user_id", nargs="?", help="single user to fetch")
+    parser.add_argument("--batch", metavar="FILE", help="file with one user_id per line, or '-' for stdin")
+    parser.add_argument("--sessions", type=int, default=BATCH_SESSIONS, help="shared MCP sessions in batch mode")
+    parser.add_argument("--per-session", type=int, default=BATCH_USERS_PER_SESSION,
+                        help="users in flight per session in batch mode")
+    parser.add_argument("--format", choices=["text", "ndjson"], default="text",
+                        help="ndjson writes one result record per line and logs to stderr (batch mode is always ndjson)")
+    parser.add_argument("--output", metavar="FILE", default="-", help="where ndjson records go ('-' for stdout)")
+    parser.add_argument("--no-save", action="store_true", help="only report results, do not write to Firebase")
+    args = parser.parse_args()
+    if args.batch:
+        asyncio.run(main_batch(args.batch, args.sessions, args.per_session, args.output, not args.no_save))
+    elif args.format == "ndjson":
+        asyncio.run(main_structured(args.user_id, args.output, not args.no_save))
+    else:
+        asyncio.run(main(args.user_id))
@@ -0,0 +1,22 @@
+# conftest.py
+# Tests run from 0-AURA_agent (python -m pytest tests); the agent modules and benchmarks
+# are imported from there, as the agents and benchmarks/ import them.
+import sys
+from pathlib import Path
+
+import pytest
+
+AGENT_ROOT = Path(__file__).resolve().parent.parent
+if str(AGENT_ROOT) not in sys.path:
+    sys.path.insert(0, str(AGENT_ROOT))
+
+
+@pytest.fixture
+def generated_frame():
+    """Factory for normalized frames of synthetic bank data: generated_frame(rows=3000, seed=0, banks=...)."""
+    from benchmarks.behavior_tools import BANKS, generate_payload
+    from main_agent.sub_agents.financial_behavior_agent.transactions import normalize_bank_transactions
+
+    def make(rows=3000, seed=0, banks=BANKS[:1]):
+        return normalize_bank_transactions(generate_payload(rows, seed, banks))
+    return make
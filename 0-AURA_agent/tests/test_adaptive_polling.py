@@ -0,0 +1,67 @@
+# test_adaptive_polling.py
+# Per-section intervals: halved on change, stretched on no change, the chat fast tier and forget().
+import pytest
+
+from main_agent.tools.adaptive_polling import BACKOFF_FACTOR, AdaptivePollingPolicy
+
+
+def policy():
+    return AdaptivePollingPolicy(["net_worth", "bank_transactions"], min_interval=100.0, max_interval=1000.0,
+                                 fast_tier_seconds=500.0)
+
+
+def intervals(p, user_id):
+    return {section: state.interval for section, state in p._users[user_id].items()}
+
+
+def test_new_users_are_due_at_once():
+    p = policy()
+    assert p.due_sections("u1", now=0.0) == ["net_worth", "bank_transactions"]
+
+
+def test_unchanged_sections_stretch_and_changed_ones_halve():
+    p = policy()
+    now = 0.0
+    for _ in range(3):
+        p.record_outcome("u1", ["net_worth", "bank_transactions"], ["bank_transactions"], now=now)
+    assert intervals(p, "u1") == {"net_worth": pytest.approx(100.0 * BACKOFF_FACTOR ** 3), "bank_transactions": 100.0}
+    for _ in range(10):
+        p.record_outcome("u1", ["net_worth"], [], now=now)
+    assert intervals(p, "u1")["net_worth"] == 1000.0  # capped at max_interval
+    p.record_outcome("u1", ["net_worth"], ["net_worth"], now=now)
+    assert intervals(p, "u1")["net_worth"] == 500.0
+    assert p.due_sections("u1", now=now + 499.0) == ["bank_transactions"]
+    assert p.due_sections("u1", now=now + 499.0, slack=1.0) == ["net_worth", "bank_transactions"]
+
+
+def test_sections_not_polled_keep_their_schedule():
+    p = policy()
+    p.record_outcome("u1", ["net_worth"], [], now=0.0)
+    assert intervals(p, "u1")["bank_transactions"] == 100.0
+    assert p.due_sections("u1", now=1.0) == ["bank_transactions"]
+
+
+def test_mark_active_puts_the_user_in_the_fast_tier_until_it_expires():
+    p = policy()
+    for _ in range(6):
+        p.record_outcome("u1", ["net_worth", "bank_transactions"], [], now=0.0)
+    assert p.due_sections("u1", now=200.0) == []
+    p.mark_active("u1", now=200.0)
+    assert intervals(p, "u1") == {"net_worth": 100.0, "bank_transactions": 100.0}
+    assert p.due_sections("u1", now=300.0) == ["net_worth", "bank_transactions"]
+    # In the fast tier even unchanged sections come back after min_interval...
+    p.record_outcome("u1", ["net_worth", "bank_transactions"], [], now=300.0)
+    assert p.due_sections("u1", now=400.0) == ["net_worth", "bank_transactions"]
+    # ...and once it has expired they stretch again.
+    p.record_outcome("u1", ["net_worth", "bank_transactions"], [], now=800.0)
+    assert p.due_sections("u1", now=900.0) == []
+
+
+def test_forget_drops_the_user():
+    p = policy()
+    p.mark_active("u1", now=0.0)
+    p.record_outcome("u2", ["net_worth"], [], now=0.0)
+    p.forget("u1")
+    p.forget("unknown")
+    assert list(p._users) == ["u2"] and p._fast_until == {}
+    assert p.stats()["users"] == 1
@@ -0,0 +1,38 @@
+# test_analytics_executor.py
+# Thread and process pools give the same analyses as inline runs, and deadlines hold.
+import asyncio
+
+import pytest
+
+from main_agent.sub_agents.financial_behavior_agent.analysis_context import AnalysisContext
+from main_agent.sub_agents.financial_behavior_agent.analytics_executor import AnalyticsExecutor
+
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_pool_matches_inline(mode, generated_frame):
+    df = generated_frame(2000)
+    expected = AnalysisContext(df)
+    executor = AnalyticsExecutor(mode, workers=1)
+    try:
+        metrics, recurring = asyncio.run(executor.compute(df, ('metrics', 'recurring')))
+    finally:
+        executor.shutdown()
+    assert vars(metrics) == vars(expected.metrics)
+    assert recurring.equals(expected.recurring)
+    assert executor.stats()["calls"] == 1
+
+
+def test_deadline(monkeypatch):
+    executor = AnalyticsExecutor("thread", timeout=0.05)
+
+    async def slow(transactions, names):
+        await asyncio.sleep(5)
+    monkeypatch.setattr(executor, "_compute", slow)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(executor.compute([]))
+    assert executor.stats()["timeouts"] == 1
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        AnalyticsExecutor("fibers")
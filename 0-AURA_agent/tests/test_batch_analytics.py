@@ -0,0 +1,39 @@
+# test_batch_analytics.py
+# One combined multi-user pass against the single-user tool results for each user.
+import pandas as pd
+
+from benchmarks import behavior_tools
+from main_agent.sub_agents.financial_behavior_agent.batch_analytics import analyze_users, normalize_user_payloads
+from main_agent.sub_agents.financial_behavior_agent.metrics import BehaviorMetrics
+from main_agent.sub_agents.financial_behavior_agent.recurring import detect_recurring
+from main_agent.sub_agents.financial_behavior_agent.tools import (emotional_triggers_from_metrics,
+                                                                  financial_biases_from_metrics,
+                                                                  spending_patterns_from_metrics)
+from main_agent.sub_agents.financial_behavior_agent.transactions import normalize_bank_transactions
+
+
+def test_batch_equals_per_user():
+    payloads = {f"user-{seed}": behavior_tools.generate_payload(600 + 300 * seed, seed, [behavior_tools.BANKS[seed % 5]]) for seed in range(4)}
+    goals = {"user-1": behavior_tools.GOALS}
+    texts = {"user-2": "I was stressed this week"}
+    combined = normalize_user_payloads(payloads)
+    assert len(combined) == sum(600 + 300 * seed for seed in range(4))
+    results = analyze_users(combined, texts, goals)
+    assert sorted(results) == sorted(payloads)
+    for user_id, payload in payloads.items():
+        df = normalize_bank_transactions(payload)
+        metrics, recurring = BehaviorMetrics.from_frame(df), detect_recurring(df)
+        result = results[user_id]
+        assert result["spending_patterns"] == spending_patterns_from_metrics(metrics, recurring), user_id
+        assert result["emotional_triggers"] == emotional_triggers_from_metrics(metrics, texts.get(user_id)), user_id
+        assert result["financial_biases"] == financial_biases_from_metrics(metrics, goals.get(user_id), recurring), user_id
+        assert result["nudge_inputs"]["financial_goals"] == goals.get(user_id, [])
+
+
+def test_records_input_and_empty():
+    rows = [{"user_id": user, "date": f"2025-03-{day:02d}", "amount": 100.0 + day, "category": "Dining",
+             "description": "SWIGGY", "type": "expense"} for user in ("a", "b") for day in range(1, 11)]
+    results = analyze_users(rows)
+    assert sorted(results) == ["a", "b"]
+    assert results["a"]["spending_patterns"]["total_spending_by_category"] == {"Dining": 1055.0}
+    assert analyze_users(pd.DataFrame()) == {} and analyze_users([]) == {}
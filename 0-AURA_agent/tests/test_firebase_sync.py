@@ -0,0 +1,78 @@
+# test_firebase_sync.py
+# Delta writes of financial_data and the per-section digests, against the in-memory Firebase backend.
+from firebase_sync import compute_digests, diff_paths, sync_user_data
+from main_agent.tools.read_cache import CachedReference, InMemoryBackend, ReadThroughCache
+
+
+def transactions(n, start=0):
+    return [{"id": i, "amount": 100 + i} for i in range(start, start + n)]
+
+
+def database(data=None):
+    """Backend, a root reference on it (no caching), and the list of paths each write touched."""
+    backend = InMemoryBackend(data)
+    written = []
+    backend.listen("", written.append)
+    return backend, CachedReference(ReadThroughCache(backend, ttl=0)), written
+
+
+def test_one_changed_element_is_one_leaf():
+    old = transactions(6)
+    new = transactions(6)
+    new[3]["amount"] = 1
+    assert diff_paths(old, new, "p") == {"p/3/amount": 1}
+
+
+def test_list_rewritten_whole_when_most_elements_change():
+    old = transactions(6)
+    new = transactions(1, start=100) + old  # prepended: every index shifts
+    assert diff_paths(old, new, "p") == {"p": new}
+    # Exactly half changed still goes out element by element.
+    new = transactions(3) + transactions(3, start=50)
+    assert sorted(diff_paths(old, new, "p")) == [f"p/{i}/{field}" for i in (3, 4, 5) for field in ("amount", "id")]
+
+
+def test_nested_deletions():
+    old = {"a": {"b": {"c": 1, "d": 2}, "e": {"f": 1}}, "x": [1, 2, 3], "y": {"z": 1}}
+    new = {"a": {"b": {"c": 1}, "e": {}}, "x": [1, 2], "y": None}
+    assert diff_paths(old, new, "p") == {"p/a/b/d": None, "p/a/e": None, "p/x/2": None, "p/y": None}
+
+    backend, ref, _ = database({"financial_data": {"u1": {"accounts": old}}})
+    sync_user_data(ref, "u1", {"accounts": new})
+    assert backend.get("financial_data/u1/accounts") == {"a": {"b": {"c": 1}}, "x": [1, 2]}
+
+
+def test_digests_first_sync_and_no_change():
+    backend, ref, written = database()
+    data = {"net_worth": {"total": 100}, "bank_transactions": transactions(4)}
+    assert sorted(sync_user_data(ref, "u1", data)) == ["bank_transactions", "net_worth"]
+    assert backend.get("financial_digests/u1") == compute_digests(data)
+    assert backend.get("financial_data/u1") == data
+
+    written.clear()
+    reads = backend.reads
+    assert sync_user_data(ref, "u1", data) == []
+    # Nothing written, and only the digests node was read.
+    assert written == [] and backend.reads == reads + 1
+
+
+def test_digests_track_changes_and_skip_failed_sections():
+    backend, ref, written = database()
+    data = {"net_worth": {"total": 100}, "credit_report": {"score": 700}}
+    sync_user_data(ref, "u1", data)
+    written.clear()
+
+    changed = dict(data, net_worth={"total": 150}, credit_report={})
+    assert sync_user_data(ref, "u1", changed, failed=["credit_report"]) == ["net_worth"]
+    assert sorted(written) == ["financial_data/u1/net_worth/total", "financial_digests/u1/net_worth"]
+    assert backend.get("financial_data/u1/credit_report") == {"score": 700}
+    assert backend.get("financial_digests/u1") == compute_digests(dict(data, net_worth={"total": 150}))
+
+
+def test_data_written_before_digests_existed():
+    data = {"net_worth": {"total": 100}, "bank_transactions": transactions(3)}
+    backend, ref, written = database({"financial_data": {"u1": data}})
+    # The document matches: only the digests are written.
+    assert sync_user_data(ref, "u1", data) == []
+    assert sorted(written) == ["financial_digests/u1/bank_transactions", "financial_digests/u1/net_worth"]
+    assert backend.get("financial_digests/u1") == compute_digests(data)
@@ -0,0 +1,38 @@
+# test_instrumentation.py
+# Operation metrics: latency and errors always, payload sizes for tools but not for bulk paths by default.
+import pytest
+
+from main_agent.tools.instrumentation import MetricsRegistry, TimedBackend, payload_size
+from main_agent.tools.read_cache import InMemoryBackend
+
+
+def test_tool_calls_are_sized_and_errors_counted():
+    registry = MetricsRegistry(export="")
+    tool = registry.instrument(lambda user_id: {"user": user_id}, "tool.echo")
+    assert tool("u1") == {"user": "u1"}
+    failing = registry.instrument(lambda: 1 / 0, "tool.fail")
+    with pytest.raises(ZeroDivisionError):
+        failing()
+    operations = registry.snapshot()["operations"]
+    assert operations["tool.echo"]["bytes_in"] == payload_size(["u1"])
+    assert operations["tool.echo"]["bytes_out"] == payload_size({"user": "u1"})
+    assert operations["tool.fail"]["errors"] == 1 and operations["tool.fail"]["latency"]["count"] == 1
+
+
+def test_backend_reads_and_writes_are_not_serialized_by_default(monkeypatch):
+    registry = MetricsRegistry(export="")
+    backend = TimedBackend(InMemoryBackend(), registry)
+    monkeypatch.setattr("main_agent.tools.instrumentation.payload_size",
+                        lambda value: pytest.fail("sized a bulk payload"))
+    backend.set("financial_data/u1", {"net_worth": {"total": 1}})
+    assert backend.get("financial_data/u1/net_worth") == {"total": 1}
+    operations = registry.snapshot()["operations"]
+    assert operations["firebase.write"]["latency"]["count"] == 1 and operations["firebase.write"]["bytes_in"] == 0
+    assert operations["firebase.read"]["latency"]["count"] == 1 and operations["firebase.read"]["bytes_out"] == 0
+
+
+def test_bulk_sizing_can_be_enabled():
+    registry = MetricsRegistry(export="")
+    backend = TimedBackend(InMemoryBackend({"a": {"b": 1}}), registry, sizes=True)
+    backend.get("a")
+    assert registry.snapshot()["operations"]["firebase.read"]["bytes_out"] == payload_size({"b": 1})
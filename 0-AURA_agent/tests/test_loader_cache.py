@@ -0,0 +1,74 @@
+# test_loader_cache.py
+# Fingerprinted dataset cache: hits, file edits, payload hashing and byte-bounded eviction.
+import json
+import os
+
+import pytest
+
+from benchmarks import behavior_tools
+from main_agent.sub_agents.financial_behavior_agent.analysis_context import AnalysisContext
+from main_agent.sub_agents.financial_behavior_agent.loader_cache import Dataset, LoaderCache, frame_nbytes
+from main_agent.sub_agents.financial_behavior_agent.snapshot import Snapshot, write_snapshot
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return Dataset.from_payload(json.load(f))
+
+
+def test_file_hits_and_edits(tmp_path):
+    path = behavior_tools.generate_dataset(1000, seed=0, path=tmp_path / "a.json")
+    cache = LoaderCache()
+    first = cache.load_file(path, read)
+    assert cache.load_file(path, read) is first
+    assert len(first.transactions) == 1000 and first.goals == behavior_tools.GOALS
+    # An edit changes the fingerprint; the old version is dropped, not kept alongside.
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    payload["bankTransactions"] = payload["bankTransactions"][:0]
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    os.utime(path, ns=(1, 1))
+    assert cache.load_file(path, read).transactions.empty
+    assert cache.stats()["entries"] == 1 and cache.stats()["misses"] == 2
+    assert cache.load_file(tmp_path / "missing.json", read) is None
+
+
+def test_payloads_hash_by_content():
+    cache = LoaderCache()
+    payload = {"bankTransactions": [{"bank": "X", "txns": [["10", "A", "2025-01-02", 2, 1, "0"]]}]}
+    first = cache.load_payload(payload)
+    assert cache.load_payload(json.dumps(payload)) is not first  # text is hashed as given
+    assert cache.load_payload(dict(reversed(list(payload.items())))) is first
+
+
+def test_size_tracks_lazy_frames_and_memo(tmp_path):
+    path = behavior_tools.generate_dataset(2000, seed=0, path=tmp_path / "a.json")
+    write_snapshot(tmp_path / "a.snap", read(path).transactions)
+    cache = LoaderCache()
+    dataset = cache.load_file(tmp_path / "a.snap", lambda p: Dataset.from_snapshot(Snapshot(p)))
+    assert cache.stats()["bytes"] == 0
+    frame = dataset.transactions
+    assert cache.stats()["bytes"] == frame_nbytes(frame)
+    context = dataset.remember("analysis_context", AnalysisContext(frame))
+    # A memo entry that grows after it was added reports it.
+    assert context.recurring is not None and context.nbytes == frame_nbytes(context.recurring) > 0
+    assert cache.stats()["bytes"] == frame_nbytes(frame) + context.nbytes
+    context.metrics
+    assert cache.stats()["bytes"] == frame_nbytes(frame) + context.nbytes
+
+
+def test_hits_do_not_measure(tmp_path, monkeypatch):
+    path = behavior_tools.generate_dataset(1000, seed=0, path=tmp_path / "a.json")
+    cache = LoaderCache()
+    dataset = cache.load_file(path, read)
+    monkeypatch.setattr(Dataset, "nbytes", property(lambda self: pytest.fail("measured on a hit")))
+    assert cache.load_file(path, read) is dataset
+
+
+def test_evicts_past_max_bytes(tmp_path):
+    paths = [behavior_tools.generate_dataset(1000, seed=seed, path=tmp_path / f"{seed}.json") for seed in range(3)]
+    size = frame_nbytes(read(paths[0]).transactions)
+    cache = LoaderCache(max_bytes=int(size * 2.5))
+    for path in paths:
+        cache.load_file(path, read)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1 and stats["bytes"] <= cache.max_bytes
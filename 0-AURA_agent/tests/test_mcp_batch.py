@@ -0,0 +1,88 @@
+# test_mcp_batch.py
+# fetch_batch emits every user exactly once, and its consumers stop waiting when a batch dies.
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+from mcp.types import CallToolResult, TextContent
+
+import mcp_client
+
+
+class FakeSession:
+    async def call_tool(self, tool_name, arguments):
+        await asyncio.sleep(0)
+        text = json.dumps({"tool": tool_name, "user": arguments["user_id"]})
+        return CallToolResult(content=[TextContent(type="text", text=text)])
+
+
+class FakePool:
+    size = 2
+
+    @asynccontextmanager
+    async def session(self):
+        yield FakeSession()
+
+    async def close(self):
+        pass
+
+
+def test_every_user_emitted_when_a_callback_raises():
+    users = [f"user-{i}" for i in range(6)]
+    emitted = []
+
+    def on_section(user_id, key, value):
+        if user_id == "user-2":
+            raise OSError("broken pipe")
+
+    asyncio.run(mcp_client.fetch_batch(FakePool(), users, lambda user_id, data: emitted.append((user_id, data)),
+                                       sessions=2, per_session=2, on_section=on_section))
+    assert sorted(user_id for user_id, _ in emitted) == users
+    assert dict(emitted)["user-2"] is None
+    assert dict(emitted)["user-0"]["net_worth"] == {"tool": "fetch_net_worth", "user": "user-0"}
+
+
+def test_next_emitted_returns_none_once_the_batch_is_over():
+    async def run():
+        results = asyncio.Queue()
+
+        async def batch_body():
+            results.put_nowait(("user-0", {}))
+            raise RuntimeError("batch crashed")
+        batch = asyncio.ensure_future(batch_body())
+        seen = [await mcp_client.next_emitted(results, batch) for _ in range(2)]
+        with pytest.raises(RuntimeError):
+            await batch
+        return seen
+    assert asyncio.run(run()) == [("user-0", {}), None]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    async def crashed_batch(pool, user_ids, emit, *args, **kwargs):
+        emit(user_ids[0], None)
+        raise RuntimeError("batch crashed")
+    monkeypatch.setattr(mcp_client, "fetch_batch", crashed_batch)
+    service = mcp_client.MCPClientService()
+    service.batch_pool = FakePool()
+    yield service
+    service.stop()
+
+
+def test_iter_user_data_does_not_hang_on_a_crashed_batch(service):
+    seen = []
+    with pytest.raises(RuntimeError):
+        for item in service.iter_user_data(["a", "b", "c"]):
+            seen.append(item)
+    assert seen == [("a", None)]
+
+
+def test_fetch_many_does_not_hang_on_a_crashed_batch(service):
+    async def run():
+        seen = []
+        with pytest.raises(RuntimeError):
+            async for item in service.fetch_many(["a", "b", "c"]):
+                seen.append(item)
+        return seen
+    assert asyncio.run(asyncio.wait_for(run(), 5)) == [("a", None)]
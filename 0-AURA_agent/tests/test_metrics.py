@@ -0,0 +1,74 @@
+# test_metrics.py
+# The fused BehaviorMetrics pass against plain pandas groupbys, for one user and for
+# many users folded into the same pass.
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_agent.sub_agents.financial_behavior_agent.metrics import (ESSENTIAL_CATEGORIES, IMPULSE_GAP_MINUTES,
+                                                                    SUBSCRIPTION_CATEGORIES, BehaviorMetrics)
+
+
+def in_date_order(df, seed=0, timed=True):
+    """df sorted by date; timed adds a random time of day to each row first."""
+    if timed:
+        seconds = np.random.default_rng(seed).integers(0, 86400, len(df))
+        df = df.assign(date=df['date'] + pd.to_timedelta(seconds, unit='s'))
+    return df.sort_values('date', kind='stable').reset_index(drop=True)
+
+
+def assert_same(actual: BehaviorMetrics, expected: BehaviorMetrics):
+    a, e = vars(actual), vars(expected)
+    assert a.keys() == e.keys()
+    for name in a:
+        if isinstance(e[name], dict):
+            assert a[name].keys() == e[name].keys(), name
+            assert list(a[name].values()) == pytest.approx([e[name][key] for key in a[name]]), name
+        elif isinstance(e[name], (float, list)) and name != 'impulse_examples':
+            assert a[name] == pytest.approx(e[name]), name
+        else:
+            assert a[name] == e[name], name
+
+
+def test_matches_groupby(generated_frame):
+    df = in_date_order(generated_frame())
+    m = BehaviorMetrics.from_frame(df)
+    expenses = df[df['type'] == 'expense']
+    assert m.rows == len(df) and m.expense_count == len(expenses)
+    assert m.category_sum == pytest.approx(expenses.groupby('category')['amount'].sum().to_dict())
+    assert m.category_count == expenses.groupby('category').size().to_dict()
+    assert m.average_daily_spending() == pytest.approx(expenses.groupby(expenses['date'].dt.date)['amount'].sum().mean())
+    assert m.monthly_trends() == pytest.approx(expenses.groupby(expenses['date'].dt.strftime('%Y-%m'))['amount'].sum().to_dict())
+    by_day = expenses.groupby(expenses['date'].dt.day_name())['amount'].mean()
+    assert m.day_of_week_means() == pytest.approx(by_day.to_dict())
+    assert m.hourly_means() == pytest.approx(
+        expenses.groupby(expenses['date'].dt.hour)['amount'].mean().reindex(range(24), fill_value=0.0).to_dict())
+    assert m.income_total == pytest.approx(df.loc[df['type'] == 'income', 'amount'].sum())
+    assert m.discretionary_total == pytest.approx(df.loc[~df['category'].isin(ESSENTIAL_CATEGORIES), 'amount'].sum())
+    assert m.round_count == int((df['amount'] % 10 == 0).sum())
+    weekend = df['date'].dt.dayofweek >= 5
+    assert (m.weekend_total, m.weekend_count) == (pytest.approx(df.loc[weekend, 'amount'].sum()), int(weekend.sum()))
+    late = (df['date'].dt.hour >= 22) | (df['date'].dt.hour < 6)
+    assert m.late_night_total == pytest.approx(df.loc[late, 'amount'].sum())
+    subscriptions = expenses[expenses['category'].isin(SUBSCRIPTION_CATEGORIES)]
+    assert m.subscription_total == pytest.approx(subscriptions['amount'].sum())
+    assert m.subscription_descriptions == set(subscriptions['description'])
+    gaps = expenses['date'].diff() < pd.Timedelta(minutes=IMPULSE_GAP_MINUTES)
+    assert m.impulse_count == int(gaps.sum()) > 0
+    assert m.impulse_total == pytest.approx(expenses.loc[gaps, 'amount'].sum())
+    assert [example['description'] for example in m.impulse_examples] == expenses.loc[gaps, 'description'].iloc[:3].tolist()
+
+
+def test_dates_without_time_have_no_hours_or_impulses(generated_frame):
+    m = BehaviorMetrics.from_frame(in_date_order(generated_frame(), timed=False))
+    assert not m.has_time and m.hourly_means() == {} and m.impulse_count == 0
+
+
+def test_by_key_equals_per_user(generated_frame):
+    frames = [in_date_order(generated_frame(800, seed), seed).assign(user_id=f"user-{seed}") for seed in range(3)]
+    combined = pd.concat(frames, ignore_index=True).sample(frac=1.0, random_state=0)
+    per_user = BehaviorMetrics.by_key(combined)
+    assert sorted(per_user) == ["user-0", "user-1", "user-2"]
+    for frame in frames:
+        assert_same(per_user[frame['user_id'].iloc[0]], BehaviorMetrics.from_frame(frame))
+
@@ -0,0 +1,129 @@
+# test_notification_outbox.py
+# Alert coalescing, batched delivery and retries on a fake clock, and the change summaries.
+from main_agent.tools.notification_outbox import ALERT_HEADER, NotificationOutbox, summarize_changes
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class Deliveries:
+    """deliver() stand-in that fails for the users in failing."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+
+    def __call__(self, user_id, message):
+        if user_id in self.failing:
+            raise ConnectionError("messaging down")
+        self.sent.append((user_id, message))
+
+
+def outbox(deliver=None, clock=None, **kwargs):
+    options = dict(coalesce_window=60.0, batch_size=50, max_attempts=3, retry_base=5.0)
+    options.update(kwargs)
+    return NotificationOutbox(deliver or Deliveries(), clock=clock or FakeClock(), **options)
+
+
+def test_alerts_within_the_window_are_merged():
+    clock, deliver = FakeClock(), Deliveries()
+    box = outbox(deliver, clock)
+    box.notify("u1", {"net_worth": "Net worth: INR 100"})
+    clock.advance(30)
+    box.notify("u1", {"net_worth": "Net worth: INR 200", "epf_details": "EPF updated"})
+    assert box.flush() == 0  # not due until a window after the first alert
+    clock.advance(30)
+    assert box.flush() == 1
+    assert deliver.sent == [("u1", f"{ALERT_HEADER}\n- Net worth: INR 200\n- EPF updated")]
+    assert box.stats() == {"enqueued": 2, "coalesced": 1, "delivered": 1, "retried": 0, "dropped": 0, "pending": 0}
+    # After delivery a new alert starts a new window.
+    box.notify("u1", {"epf_details": "EPF updated"})
+    assert box.flush() == 0 and box.stats()["pending"] == 1
+
+
+def test_due_messages_go_out_in_batches_oldest_first():
+    clock, batches = FakeClock(), []
+
+    def deliver_batch(messages):
+        batches.append([user_id for user_id, _ in messages])
+        return [True] * len(messages)
+    box = NotificationOutbox(deliver_batch=deliver_batch, coalesce_window=0.0, batch_size=2, clock=clock)
+    for i in range(5):
+        box.notify(f"u{i}", {"net_worth": "updated"})
+        clock.advance(1)
+    assert box.flush() == 5
+    assert batches == [["u0", "u1"], ["u2", "u3"], ["u4"]]
+
+
+def test_failed_deliveries_back_off_and_are_dropped_after_max_attempts():
+    clock, deliver = FakeClock(), Deliveries(failing={"u1"})
+    box = outbox(deliver, clock, coalesce_window=0.0)
+    box.notify("u1", {"net_worth": "updated"})
+    box.notify("u2", {"net_worth": "updated"})
+    assert box.flush() == 1  # u1 failed and is not tried again in the same flush
+    clock.advance(4.9)
+    assert box.flush() == 0 and deliver.sent == [("u2", f"{ALERT_HEADER}\n- updated")]
+    clock.advance(0.1)  # retry_base after the first failure
+    assert box.flush() == 0
+    clock.advance(9.9)
+    assert box.flush() == 0 and box.stats()["pending"] == 1
+    clock.advance(0.1)  # twice that after the second; the third failure drops it
+    box.flush()
+    assert box.stats() == {"enqueued": 2, "coalesced": 0, "delivered": 1, "retried": 2, "dropped": 1, "pending": 0}
+
+
+def test_retry_is_merged_with_an_alert_that_arrived_meanwhile():
+    clock, deliver = FakeClock(), Deliveries(failing={"u1"})
+    box = outbox(deliver, clock, coalesce_window=0.0)
+    box.notify("u1", {"net_worth": "old", "epf_details": "EPF updated"})
+    batch = box._take_due(False, set())
+    box.notify("u1", {"net_worth": "new"})  # while the first attempt is in flight
+    box._retry("u1", batch[0][1])
+    deliver.failing.clear()
+    clock.advance(5)
+    assert box.flush() == 1
+    assert deliver.sent == [("u1", f"{ALERT_HEADER}\n- new\n- EPF updated")]
+
+
+def test_batch_errors_retry_every_message_and_stop_flushes():
+    calls = []
+
+    def deliver_batch(messages):
+        calls.append(len(messages))
+        if len(calls) == 1:
+            raise TimeoutError("gateway")
+        return [True] * len(messages)
+    box = NotificationOutbox(deliver_batch=deliver_batch, coalesce_window=60.0, retry_base=5.0, clock=FakeClock())
+    box.notify("u1", {"a": "x"})
+    box.notify("u2", {"a": "y"})
+    assert box.flush(force=True) == 0 and box.stats()["retried"] == 2
+    box.stop()  # not started: still delivers whatever is pending
+    assert calls == [2, 2] and box.stats()["pending"] == 0 and box.stats()["delivered"] == 2
+
+
+def test_summarize_changes():
+    data = {
+        "net_worth": {"netWorthResponse": {"totalNetWorthValue": {"currencyCode": "INR", "units": "1234567"}}},
+        "credit_report": {"creditReports": [{"creditReportData": {"score": {"bureauScore": "765"}}}]},
+        "bank_transactions": {"schemaDescription": "...", "bankTransactions": [
+            {"bank": "HDFC Bank", "txns": [["1"], ["2"]]}, {"bank": "ICICI Bank", "txns": [["3"]]}]},
+        "epf_details": {"unexpected": "shape"},
+        "stock_transactions": {"stockTransactions": []},
+    }
+    assert summarize_changes(data, list(data) + ["custom_section"]) == {
+        "net_worth": "Net worth: INR 1,234,567",
+        "credit_report": "Credit report: score 765",
+        "bank_transactions": "Bank transactions: 3 transactions across 2 accounts",
+        "epf_details": "EPF updated",
+        "stock_transactions": "Stock transactions updated",
+        "custom_section": "custom_section updated",
+    }
+    assert summarize_changes({"net_worth": {"netWorthResponse": {}}}, ["net_worth"]) == {"net_worth": "Net worth updated"}
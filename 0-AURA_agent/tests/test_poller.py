@@ -0,0 +1,147 @@
+# test_poller.py
+# PollingScheduler cycles driven by hand on a fake clock; workers only in the shutdown test.
+import random
+import threading
+
+from main_agent.tools.poller import PollingScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def scheduler(users, results=None, clock=None, **kwargs):
+    """A scheduler over users whose poll_user records calls and answers from results (default ok)."""
+    polled = []
+
+    def poll_user(user_id):
+        polled.append(user_id)
+        outcome = (results or {}).get(user_id, True)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    options = dict(interval=100.0, workers=1, jitter=0.0, backoff_base=50.0, backoff_max=300.0)
+    options.update(kwargs)
+    return PollingScheduler(poll_user, lambda: list(users), clock=clock or FakeClock(), **options), polled
+
+
+def drain(poller):
+    """Run every poll that is due on the fake clock, as a worker would."""
+    while True:
+        item = poller._next_item(block=False)
+        if item is None:
+            return
+        poller._poll(item)
+
+
+def test_jitter_spreads_polls_within_bound():
+    clock = FakeClock()
+    poller, polled = scheduler([f"u{i}" for i in range(20)], clock=clock, jitter=80.0, rng=random.Random(7))
+    assert poller.jitter == 50.0  # capped at half the interval
+    poller._start_cycle(0.0, 0)
+    offsets = sorted(item[0] - clock.now for item in poller._queue)
+    assert 0 <= offsets[0] and offsets[-1] <= 50.0 and len(set(offsets)) == 20
+    drain(poller)
+    assert polled == []  # nothing due before its jittered start
+    clock.advance(offsets[9])
+    drain(poller)
+    assert len(polled) == 10
+    clock.advance(50.0)
+    drain(poller)
+    assert sorted(polled) == sorted(f"u{i}" for i in range(20))
+
+
+def test_failing_user_backs_off_exponentially_until_it_recovers():
+    clock = FakeClock()
+    results = {"bad": False, "boom": RuntimeError("offline")}
+    poller, polled = scheduler(["ok", "bad", "boom"], results, clock)
+
+    def cycle():
+        polled.clear()
+        poller._start_cycle(0.0, 0)
+        drain(poller)
+        return sorted(polled)
+    assert cycle() == ["bad", "boom", "ok"]
+    assert poller.metrics()["polls_failed"] == 2 and poller.metrics()["users_in_backoff"] == 2
+    clock.advance(49)
+    assert cycle() == ["ok"]  # 50s backoff after the first failure
+    clock.advance(1)
+    assert cycle() == ["bad", "boom", "ok"]
+    clock.advance(99)
+    assert cycle() == ["ok"]  # 100s after the second
+    clock.advance(1)
+    assert cycle() == ["bad", "boom", "ok"]
+    clock.advance(300)
+    cycle()
+    assert poller._retry_at["bad"] == clock.now + 300.0  # 400s capped at backoff_max
+    results["bad"] = True
+    clock.advance(300)
+    cycle()
+    assert "bad" not in poller._retry_at and "bad" not in poller._failures
+    assert poller.metrics()["users_backed_off"] == 4
+
+
+def test_polls_reached_after_the_deadline_expire():
+    clock = FakeClock()
+    poller, polled = scheduler(["a", "b"], clock=clock)
+    poller._start_cycle(0.0, 0)
+    item = poller._next_item(block=False)
+    clock.advance(100.5)  # the worker gets to it after the cycle's deadline
+    poller._poll(item)
+    drain(poller)
+    assert polled == []
+    metrics = poller.metrics()
+    assert metrics["polls_expired"] == 2 and metrics["polls_ok"] == 0 and metrics["last_cycle_duration"] == 100.5
+    # Expired users are not stuck as scheduled: the next cycle queues them again.
+    poller._start_cycle(0.0, 0)
+    drain(poller)
+    assert sorted(polled) == ["a", "b"]
+
+
+def test_cycle_skipped_while_previous_one_is_queued():
+    clock = FakeClock()
+    poller, polled = scheduler(["a", "b"], clock=clock, jitter=40.0, rng=random.Random(1))
+    poller._start_cycle(0.0, 0)
+    poller._start_cycle(3.0, 2)  # two missed ticks plus this one, which finds a full queue
+    metrics = poller.metrics()
+    assert metrics["cycles_run"] == 1 and metrics["cycles_skipped"] == 3 and metrics["queue_depth"] == 2
+    # A user whose poll is still running is left out of the next cycle.
+    clock.advance(40.0)
+    running = poller._next_item(block=False)
+    finished = poller._next_item(block=False)
+    poller._poll(finished)
+    poller._start_cycle(0.0, 0)
+    assert [queued[2] for queued in poller._queue] == [finished[2]]
+    poller._poll(running)
+    assert poller.metrics()["cycles_run"] == 2
+
+
+def test_stop_lets_the_running_poll_finish_and_joins_workers():
+    started, release = threading.Event(), threading.Event()
+    polled = []
+
+    def poll_user(user_id):
+        polled.append(user_id)
+        started.set()
+        release.wait(5)
+        return True
+    poller = PollingScheduler(poll_user, lambda: ["a", "b", "c"], interval=3600.0, workers=1, jitter=0.0)
+    poller.start()
+    poller._start_cycle(0.0, 0)
+    assert started.wait(5)
+    threads = list(poller._threads)
+    stopper = threading.Thread(target=poller.stop)
+    stopper.start()
+    assert poller._stop.wait(5)
+    release.set()
+    stopper.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+    # The poll in progress completed; the queued ones were left for the next start.
+    assert polled == ["a"] and poller.metrics()["polls_ok"] == 1 and poller.metrics()["queue_depth"] == 2
@@ -0,0 +1,46 @@
+# test_portfolio_lifecycle.py
+# start()/stop() of the portfolio background services, with the services replaced by recorders.
+import pytest
+
+from main_agent.tools import portfolio_api
+
+
+class Recorder:
+    def __init__(self, calls, name):
+        self.calls, self.name = calls, name
+
+    def __getattr__(self, method):
+        return lambda *args, **kwargs: self.calls.append(f"{self.name}.{method}")
+
+
+@pytest.fixture
+def services(monkeypatch):
+    calls = []
+    for name in ("active_users", "registry", "firebase_cache", "notification_outbox", "poll_scheduler"):
+        monkeypatch.setattr(portfolio_api, name, Recorder(calls, name))
+    monkeypatch.setattr(portfolio_api, "close_mcp_client", lambda: calls.append("close_mcp_client"))
+    hooks = []
+    monkeypatch.setattr(portfolio_api.atexit, "register", hooks.append)
+    monkeypatch.setattr(portfolio_api, "_started", False)
+    monkeypatch.setattr(portfolio_api, "_exit_hook", False)
+    return calls, hooks
+
+
+def test_first_turn_starts_services_once_and_registers_stop(services):
+    calls, hooks = services
+    assert portfolio_api.start_services(callback_context=None) is None
+    portfolio_api.start_services()
+    assert calls == ["active_users.start", "registry.start_exporter", "notification_outbox.start", "poll_scheduler.start"]
+    assert hooks == [portfolio_api.stop]
+
+
+def test_stop_drains_and_shuts_down_in_order(services):
+    calls, hooks = services
+    portfolio_api.start()
+    calls.clear()
+    hooks[0]()
+    hooks[0]()  # a second stop (e.g. explicit stop, then exit) does nothing
+    assert calls == ["poll_scheduler.stop", "notification_outbox.stop", "active_users.leave",
+                     "firebase_cache.close", "close_mcp_client", "registry.stop_exporter"]
+    portfolio_api.start()
+    assert hooks == [portfolio_api.stop]
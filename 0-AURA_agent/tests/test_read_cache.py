@@ -0,0 +1,67 @@
+# test_read_cache.py
+# InMemoryBackend follows Firebase's storage rules; ReadThroughCache and sync_user_data run on top of it.
+from firebase_sync import sync_user_data
+from main_agent.tools.read_cache import CachedReference, InMemoryBackend, ReadThroughCache
+
+
+def test_child_write_under_list_changes_one_element():
+    backend = InMemoryBackend()
+    backend.set("a", [1, 2, 3])
+    backend.update("", {"a/0": 5})
+    assert backend.data == {"a": {"0": 5, "1": 2, "2": 3}}
+    assert backend.get("a") == [5, 2, 3]
+    backend.update("a", {"1": None})
+    assert backend.get("a") == [5, None, 3]
+    backend.set("sparse", {"0": "x", "7": "y"})
+    assert backend.get("sparse") == {"0": "x", "7": "y"}
+
+
+def test_nulls_and_empty_containers_vanish_with_their_parents():
+    backend = InMemoryBackend({"u": {"doc": {"list": [], "keep": 1}}})
+    assert backend.data == {"u": {"doc": {"keep": 1}}}
+    backend.update("u", {"doc/keep": None})
+    assert backend.data == {} and backend.get("u") is None
+
+
+def test_cache_hits_and_invalidates_related_paths():
+    backend = InMemoryBackend({"users": {"u1": {"name": "A", "tags": ["x", "y"]}}})
+    cache = ReadThroughCache(backend, ttl=60)
+    assert cache.get("users/u1/tags") == ["x", "y"]
+    assert cache.get("users/u1") == {"name": "A", "tags": ["x", "y"]}
+    assert cache.get("users/u1/tags") == ["x", "y"] and backend.reads == 2
+    # A write under a cached list invalidates the list and its ancestors, not siblings.
+    cache.get("users/u1/name")
+    cache.update("users/u1", {"tags/1": "z"})
+    assert cache.get("users/u1/name") == "A" and backend.reads == 3
+    assert cache.get("users/u1/tags") == ["x", "z"]
+    assert cache.get("users/u1")["tags"] == ["x", "z"] and backend.reads == 5
+
+
+def test_listener_invalidates_on_remote_writes():
+    backend = InMemoryBackend({"users": {"u1": {"name": "A"}}})
+    cache = ReadThroughCache(backend, ttl=60)
+    cache.listen("users")
+    assert cache.get("users/u1/name") == "A"
+    backend.set("users/u1/name", "B")  # another process writing directly
+    assert cache.get("users/u1/name") == "B"
+    cache.close()
+    backend.set("users/u1/name", "C")
+    assert cache.get("users/u1/name") == "B"
+
+
+def test_sync_user_data_through_cache():
+    backend = InMemoryBackend()
+    ref = CachedReference(ReadThroughCache(backend, ttl=60))
+    data = {"net_worth": {"total": 100}, "bank_transactions": [{"id": i, "amount": i * 10} for i in range(6)]}
+    assert sorted(sync_user_data(ref, "u1", data)) == ["bank_transactions", "net_worth"]
+    assert ref.child("financial_data/u1").get() == data
+
+    written = []
+    backend.listen("", written.append)
+    data["bank_transactions"][2] = {"id": 2, "amount": 25}
+    assert sync_user_data(ref, "u1", data) == ["bank_transactions"]
+    # Only the changed leaf was written; the rest of the list is untouched.
+    assert written == ["financial_data/u1/bank_transactions/2/amount", "financial_digests/u1/bank_transactions"]
+    assert backend.get("financial_data/u1") == data
+    assert ref.child("financial_data/u1/bank_transactions").get() == data["bank_transactions"]
+    assert sync_user_data(ref, "u1", data) == []
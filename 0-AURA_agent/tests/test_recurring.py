@@ -0,0 +1,75 @@
+# test_recurring.py
+# Recurring-payment detection and the subscription bias, on narrations from the
+# benchmark generator (benchmarks/behavior_tools.py).
+import pandas as pd
+
+from benchmarks import behavior_tools
+from main_agent.sub_agents.financial_behavior_agent import tools
+from main_agent.sub_agents.financial_behavior_agent.metrics import BehaviorMetrics
+from main_agent.sub_agents.financial_behavior_agent.recurring import active_recurring, detect_recurring, merchant_keys
+
+
+def test_merchant_keys_ignore_reference_numbers():
+    keys = merchant_keys(pd.Series([
+        "UPI-NETFLIX COM-NETFLIXUPI@HDFCBANK-HDFC0000001-512345678901-MONTHLY AUTOPAY",
+        "UPI-NETFLIX COM-NETFLIXUPI@HDFCBANK-HDFC0000001-998877665544-MONTHLY AUTOPAY",
+        "IMPS-018422244664-ADITYA BIRLA SUN LIF-HDFC-XXXXXXXX3578-RD3192534-1038644104",
+        "UPI-MAHESH S-9876543210@YBL-KKBK0008043-104558209248-PAYMENT FROM PHONE",
+        None,
+    ]))
+    assert list(keys) == ["NETFLIXUPI@HDFCBANK", "NETFLIXUPI@HDFCBANK", "ADITYA BIRLA SUN LIF", "9876543210@YBL", ""]
+
+
+def test_detects_scheduled_payments(generated_frame):
+    recurring = detect_recurring(generated_frame()).set_index('merchant')
+    assert recurring.loc["NETFLIXUPI@HDFCBANK", "cadence"] == "monthly"
+    assert recurring.loc["NETFLIXUPI@HDFCBANK", "monthly_cost"] == 649
+    assert recurring.loc["TDS ON INTEREST", "cadence"] == "quarterly"
+    # Discretionary spending is not periodic.
+    assert "SWIGGY8@YBL" not in recurring.index
+
+
+def test_loans_savings_tax_and_bills_are_not_subscriptions(generated_frame):
+    recurring = detect_recurring(generated_frame()).set_index('merchant')
+    assert bool(recurring.loc["NETFLIXUPI@HDFCBANK", "is_subscription"])
+    for merchant in ("EMI LOAN RECOVERY", "ADITYA BIRLA SUN LIF", "TDS ON INTEREST", "ACT BROADBAND"):
+        assert not recurring.loc[merchant, "is_subscription"], merchant
+
+
+def test_subscriptions_counted_once_per_merchant_with_monthly_cost(generated_frame):
+    df = generated_frame()
+    subscriptions, monthly = tools._active_subscriptions(BehaviorMetrics.from_frame(df), detect_recurring(df))
+    # Netflix has one narration per payment but is one subscription; the alert charges
+    # (Service Fee) are the only other subscription-category spending.
+    assert subscriptions == {"NETFLIXUPI@HDFCBANK", "INST ALERT CHG"}
+    assert 649 <= monthly < 700
+    biases = tools.financial_biases_from_metrics(BehaviorMetrics.from_frame(df), behavior_tools.GOALS, detect_recurring(df))
+    assert all(bias["bias"] != "loss_aversion_subscriptions" for bias in biases.get("biases", []))
+
+
+def test_stopped_series_are_not_active(generated_frame):
+    df = generated_frame()
+    recurring = detect_recurring(df)
+    netflix = (df['description'].str.contains("NETFLIX")).to_numpy()
+    # Netflix cancelled a year before the end of the history
+    cancelled = df[~netflix | (df['date'] < df['date'].max() - pd.Timedelta(days=365)).to_numpy()]
+    stopped = detect_recurring(cancelled)
+    assert "NETFLIXUPI@HDFCBANK" in set(stopped['merchant'])
+    assert "NETFLIXUPI@HDFCBANK" not in set(active_recurring(stopped, df['date'].max())['merchant'])
+    assert "NETFLIXUPI@HDFCBANK" in set(active_recurring(recurring, df['date'].max())['merchant'])
+    subscriptions, _ = tools._active_subscriptions(BehaviorMetrics.from_frame(cancelled), stopped)
+    assert "NETFLIXUPI@HDFCBANK" not in subscriptions
+
+
+def test_many_active_subscriptions_cost_scaled_to_window():
+    rows = []
+    for day in range(0, 180, 30):
+        for merchant, amount in (("SPOTIFY", 119), ("HOTSTAR", 299), ("CULTFIT", 999), ("AUDIBLE", 199), ("KINDLE", 169)):
+            rows.append({"date": pd.Timestamp("2025-01-01") + pd.Timedelta(days=day), "amount": float(amount),
+                         "type": "expense", "category": "Other",
+                         "description": f"UPI-{merchant} INDIA-{merchant.lower()}@ybl-YESB0YBLUPI-{100000000000 + day}-AUTOPAY"})
+    df = pd.DataFrame(rows)
+    biases = tools.financial_biases_from_metrics(BehaviorMetrics.from_frame(df), [], detect_recurring(df))
+    [bias] = [b for b in biases["biases"] if b["bias"] == "loss_aversion_subscriptions"]
+    # (119 + 299 + 999 + 199 + 169) a month, over 3 months
+    assert "₹5355.00" in bias["impact"]
@@ -0,0 +1,93 @@
+# test_snapshot.py
+# Snapshot write/read round trips and its TransactionStore queries.
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import behavior_tools
+from main_agent.sub_agents.financial_behavior_agent import fim_connector
+from main_agent.sub_agents.financial_behavior_agent import snapshot as snapshot_module
+from main_agent.sub_agents.financial_behavior_agent.loader_cache import LoaderCache
+from main_agent.sub_agents.financial_behavior_agent.snapshot import Snapshot, build_from_json, write_snapshot
+from main_agent.sub_agents.financial_behavior_agent.transaction_store import TransactionStore
+from main_agent.sub_agents.financial_behavior_agent.transactions import normalize_rows
+
+
+def test_round_trip(tmp_path, generated_frame):
+    df = generated_frame()
+    write_snapshot(tmp_path / "t.snap", df, {"financial_goals": behavior_tools.GOALS})
+    with Snapshot(tmp_path / "t.snap") as snapshot:
+        pd.testing.assert_frame_equal(snapshot.frame, TransactionStore(df).frame)
+        assert snapshot.extra == {"financial_goals": behavior_tools.GOALS}
+        np.testing.assert_array_equal(snapshot.days, TransactionStore(df).days)
+
+
+def test_windows_match_store(tmp_path, generated_frame):
+    df = generated_frame()
+    store = TransactionStore(df)
+    write_snapshot(tmp_path / "t.snap", df)
+    with Snapshot(tmp_path / "t.snap") as snapshot:
+        for start, end in [(None, None), ("2024-02-01", "2024-04-30"), ("2025-07-01", None), ("2030-01-01", None)]:
+            assert snapshot.count(start, end) == store.count(start, end)
+            pd.testing.assert_frame_equal(snapshot.window(start, end).reset_index(drop=True),
+                                          store.window(start, end).reset_index(drop=True))
+        assert snapshot.narrations(10, 12) == store.frame['description'].iloc[10:12].tolist()
+
+
+def test_non_ascii_and_missing_values(tmp_path):
+    df = normalize_rows([["10", "UPI-चाय वाला-1234", "2025-01-02", 2, 1, None],
+                         ["20", None, "2025-01-01", 9, None, "5.5"]], ["SBI", None])
+    write_snapshot(tmp_path / "t.snap", df)
+    with Snapshot(tmp_path / "t.snap") as snapshot:
+        frame = snapshot.frame
+        assert frame['description'].tolist() == ["", "UPI-चाय वाला-1234"]
+        assert np.isnan(frame['balance'].iloc[1]) and frame['balance'].iloc[0] == 5.5
+        assert frame['type'].tolist() == ["other", "expense"]
+        # Missing coded values stay missing rather than turning into ''.
+        assert pd.isna(frame['mode'].iloc[0]) and pd.isna(frame['bank'].iloc[0]) and frame['bank'].iloc[1] == "SBI"
+
+
+def test_frame_is_built_once_and_outlives_close(tmp_path, generated_frame):
+    write_snapshot(tmp_path / "t.snap", generated_frame(500))
+    snapshot = Snapshot(tmp_path / "t.snap")
+    frame = snapshot.frame
+    assert snapshot.frame is frame
+    snapshot.close()
+    assert snapshot._mm.closed and len(frame) == 500
+
+
+def test_rebuilding_the_local_snapshot_closes_the_cached_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(fim_connector, "LOCAL_DATA_FILE", behavior_tools.generate_dataset(500, path=tmp_path / "t.json"))
+    monkeypatch.setattr(fim_connector, "LOCAL_SNAPSHOT_FILE", tmp_path / "t.snap")
+    monkeypatch.setattr(fim_connector, "loader_cache", LoaderCache())
+    fim_connector.write_local_snapshot()
+    old = fim_connector.load_local_dataset().store
+    assert isinstance(old, Snapshot) and len(old.window()) == 500
+
+    replace = os.replace
+
+    def windows_replace(src, dst):
+        # Windows refuses to replace a file that is still mapped.
+        if os.fspath(dst) == os.fspath(old.path) and not old._mm.closed:
+            raise PermissionError("file is mapped")
+        replace(src, dst)
+    monkeypatch.setattr(snapshot_module.os, "replace", windows_replace)
+    fim_connector.write_local_snapshot()
+    assert old._mm.closed
+    assert fim_connector.load_local_dataset().store is not old
+
+
+def test_build_from_json(tmp_path):
+    path = behavior_tools.generate_dataset(5000, seed=2, path=tmp_path / "txns.json")
+    assert build_from_json(path, tmp_path / "t.snap") == 5000
+    with Snapshot(tmp_path / "t.snap") as snapshot:
+        assert snapshot.extra["financial_goals"] == behavior_tools.GOALS
+        assert len(snapshot) == 5000 and (np.diff(snapshot.days) >= 0).all()
+
+
+def test_rejects_other_files(tmp_path):
+    (tmp_path / "t.snap").write_bytes(b"not a snapshot at all")
+    with pytest.raises(ValueError):
+        Snapshot(tmp_path / "t.snap")
@@ -0,0 +1,61 @@
+# test_streaming_loader.py
+# The streaming reader against json.load + normalize_bank_transactions on the same file.
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from benchmarks import behavior_tools
+from main_agent.sub_agents.financial_behavior_agent.streaming_loader import (TransactionStream,
+                                                                             iter_transaction_chunks,
+                                                                             load_transactions_streaming)
+from main_agent.sub_agents.financial_behavior_agent.transactions import empty_frame, normalize_bank_transactions
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    path = behavior_tools.generate_dataset(9000, seed=1, path=tmp_path_factory.mktemp("data") / "txns.json")
+    with open(path, encoding="utf-8") as f:
+        return path, json.load(f)
+
+
+def since_filtered(df, since):
+    return df[df['date'] >= pd.Timestamp(since)].reset_index(drop=True)
+
+
+def test_matches_full_parse(dataset):
+    path, payload = dataset
+    expected = normalize_bank_transactions(payload)
+    pd.testing.assert_frame_equal(load_transactions_streaming(path), expected)
+    # Small chunks and blocks cut rows and tokens at every possible place.
+    stream = TransactionStream(path, chunk_rows=97, read_size=113)
+    pd.testing.assert_frame_equal(load_transactions_streaming(stream), expected)
+    assert stream.extra["financial_goals"] == payload["financial_goals"]
+    assert stream.rows_read == len(expected)
+    assert [len(chunk) for chunk in iter_transaction_chunks(path, chunk_rows=4000)] == [4000, 4000, 1000]
+
+
+def test_since(dataset):
+    path, payload = dataset
+    expected = since_filtered(normalize_bank_transactions(payload), "2025-01-01")
+    pd.testing.assert_frame_equal(load_transactions_streaming(path, since="2025-01-01", chunk_rows=500), expected)
+    # The generator writes accounts newest first, so skipping each account's tail is exact.
+    stream = TransactionStream(path, since="2025-01-01", assume_sorted=True)
+    pd.testing.assert_frame_equal(load_transactions_streaming(stream), expected)
+    assert stream.rows_read < len(normalize_bank_transactions(payload))
+
+
+def test_since_keeps_rows_out_of_order(dataset):
+    _, payload = dataset
+    account = payload["bankTransactions"][0]
+    shuffled = {"bankTransactions": [{"txns": account["txns"][::-1], "bank": account["bank"]}]}
+    expected = since_filtered(normalize_bank_transactions(shuffled), "2025-01-01")
+    loaded = load_transactions_streaming(io.StringIO(json.dumps(shuffled)), since="2025-01-01", chunk_rows=300)
+    pd.testing.assert_frame_equal(loaded, expected)
+    assert (loaded['bank'] == account["bank"]).all()
+
+
+def test_empty_sources():
+    for text in ('{}', '{"bankTransactions": []}', '{"bankTransactions": [{"bank": "X", "txns": []}], "x": 1}'):
+        pd.testing.assert_frame_equal(load_transactions_streaming(io.StringIO(text)), empty_frame())
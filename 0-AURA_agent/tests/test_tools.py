@@ -0,0 +1,127 @@
+# test_tools.py
+# The behavior tools, now formatting fused metrics from a shared context, against the
+# original per-tool pandas computations on the same 400 records.
+import asyncio
+import random
+
+import pandas as pd
+import pytest
+
+from main_agent.sub_agents.financial_behavior_agent import analysis_context, tools
+
+CATEGORIES = ['Dining', 'Shopping', 'Rent', 'Streaming', 'Subscription', 'Software', 'Membership', 'Groceries']
+ESSENTIAL = ['Rent', 'Utilities', 'Groceries', 'Health', 'Education', 'Salary', 'Savings']
+
+
+def sample_records(n=400, seed=1):
+    rng = random.Random(seed)
+    return [{"date": f"2025-0{rng.randint(1, 6)}-{rng.randint(10, 28)} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+             "amount": rng.choice([100, 250.5, 999, 40, 73.2]), "category": rng.choice(CATEGORIES),
+             "description": f"merchant {rng.choice('ABCDEFGHI')}", "type": rng.choice(["expense", "expense", "income"])}
+            for _ in range(n)]
+
+
+def baseline_spending_patterns(transactions):
+    """analyze_spending_patterns as it was before the fused metrics (without the recurring keys)."""
+    df = pd.DataFrame(transactions)
+    df['date'] = pd.to_datetime(df['date'])
+    expenses = df[df['type'] == 'expense']
+    counts = expenses.groupby('category')['amount'].count().sort_values(ascending=False)
+    # Stable, so rows with the same timestamp keep their order (the old default sort left ties arbitrary).
+    ordered = expenses.sort_values('date', kind='stable')
+    quick = ordered[ordered['date'].diff().dt.total_seconds().div(60).lt(30)]
+    score = len(quick) / len(expenses) * 100
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    return {
+        "summary": "Detailed spending patterns analyzed.",
+        "total_spending_by_category": {k: round(v, 2) for k, v in
+                                       expenses.groupby('category')['amount'].sum().sort_values(ascending=False).items()},
+        "average_daily_spending": round(expenses.groupby(expenses['date'].dt.date)['amount'].sum().mean(), 2),
+        "high_frequency_categories": counts[counts > len(expenses) * 0.05].index.tolist(),
+        "temporal_patterns": {
+            "day_of_week_spending": expenses.groupby(expenses['date'].dt.day_name())['amount'].mean().reindex(days).fillna(0).to_dict(),
+            "hourly_patterns": expenses.groupby(expenses['date'].dt.hour)['amount'].mean().reindex(range(24)).fillna(0).to_dict(),
+            "monthly_trends": {str(k.to_period('M')): v for k, v in expenses.set_index('date').resample('ME')['amount'].sum().items()},
+        },
+        "impulse_indicators": {
+            "impulse_score": round(score, 2),
+            "quick_transaction_count": len(quick),
+            "total_impulse_amount": round(quick['amount'].sum(), 2),
+            "risk_level": "high" if score > 20 else "medium" if score > 10 else "low",
+            "example_transactions": quick.head(3)[['date', 'amount', 'category', 'description']].to_dict(orient='records'),
+        },
+    }
+
+
+def baseline_trigger_totals(transactions):
+    df = pd.DataFrame(transactions)
+    df['date'] = pd.to_datetime(df['date'])
+    weekend = df['date'].dt.weekday >= 5
+    late = (df['date'].dt.hour >= 22) | (df['date'].dt.hour < 6)
+    return (df.loc[weekend, 'amount'].sum() / weekend.sum(), df.loc[~weekend, 'amount'].sum() / (~weekend).sum(),
+            df.loc[late, 'amount'].sum(), df.loc[~late, 'amount'].sum())
+
+
+def run(*calls):
+    async def main():
+        return [await call for call in calls]
+    return asyncio.run(main())
+
+
+def test_spending_patterns_match_baseline():
+    records = sample_records()
+    [patterns] = run(tools.analyze_spending_patterns(records))
+    expected = baseline_spending_patterns(records)
+    assert patterns["summary"] == expected["summary"]
+    assert list(patterns["total_spending_by_category"]) == list(expected["total_spending_by_category"])
+    assert patterns["total_spending_by_category"] == pytest.approx(expected["total_spending_by_category"])
+    assert patterns["average_daily_spending"] == pytest.approx(expected["average_daily_spending"])
+    assert patterns["high_frequency_categories"] == expected["high_frequency_categories"]
+    for key, values in expected["temporal_patterns"].items():
+        assert patterns["temporal_patterns"][key] == pytest.approx(values), key
+    impulse, expected_impulse = patterns["impulse_indicators"], expected["impulse_indicators"]
+    assert impulse["quick_transaction_count"] == expected_impulse["quick_transaction_count"] > 0
+    assert impulse["impulse_score"] == expected_impulse["impulse_score"]
+    assert impulse["total_impulse_amount"] == pytest.approx(expected_impulse["total_impulse_amount"])
+    assert impulse["risk_level"] == expected_impulse["risk_level"]
+    assert [(e["date"], e["amount"], e["description"]) for e in impulse["example_transactions"]] == \
+           [(e["date"], e["amount"], e["description"]) for e in expected_impulse["example_transactions"]]
+
+
+def test_triggers_and_biases_match_baseline():
+    records = sample_records()
+    triggers, biases = run(tools.identify_emotional_triggers(records, "feeling stressed"),
+                           tools.identify_financial_biases(records, [{"name": "Car", "type": "savings",
+                                                                      "target_amount": 100000, "saved": 1000}]))
+    weekend, weekday, late, day = baseline_trigger_totals(records)
+    found = {trigger["trigger"]: trigger for trigger in triggers["triggers"]}
+    assert ("weekend_emotional_spending" in found) == (weekend > weekday * 1.3)
+    assert ("late_night_impulse_spending" in found) == (late > day * 0.1 and late > 500)
+    assert found["late_night_impulse_spending"]["impact_details"] == f"Total late-night spending: ₹{late:.2f}"
+    assert "self_reported_stress_anxiety" in found
+
+    df = pd.DataFrame(records)
+    income = df.loc[df['type'] == 'income', 'amount'].sum()
+    discretionary = df.loc[~df['category'].isin(ESSENTIAL), 'amount'].sum()
+    found = {bias["bias"]: bias for bias in biases["biases"]}
+    assert found["present_bias"]["impact"].startswith(f"You spend a high percentage ({discretionary / income * 100:.1f}%)")
+    round_share = (df['amount'] % 10 == 0).mean()
+    assert found["anchoring_bias_round_numbers"]["impact"] == f"{round_share * 100:.1f}% of your transactions are at round numbers."
+    # Subscriptions are now counted per merchant and costed per month, so only the detection is compared.
+    assert "loss_aversion_subscriptions" in found
+
+
+def test_tools_share_one_context():
+    records = sample_records(seed=2)
+    analysis_context._contexts.clear()
+    run(tools.analyze_spending_patterns(records), tools.identify_emotional_triggers(records),
+        tools.identify_financial_biases(records, []))
+    assert len(analysis_context._contexts) == 1
+    context = analysis_context.get_analysis_context(records)
+    assert context.cached("metrics") is not None and context.cached("recurring") is not None
+
+
+def test_empty_input():
+    assert run(tools.analyze_spending_patterns([]))[0] == {"summary": "No transactions provided for analysis."}
+    income_only = [dict(record, type="income") for record in sample_records(20)]
+    assert run(tools.analyze_spending_patterns(income_only))[0] == {"summary": "No expenses found for detailed analysis."}
@@ -0,0 +1,64 @@
+# test_transaction_store.py
+# Binary-search window queries against a plain filter over the same frame.
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from main_agent.sub_agents.financial_behavior_agent.transaction_store import TransactionStore, day_number
+
+
+def filtered(df, start=None, end=None):
+    keep = pd.Series(True, index=df.index)
+    if start is not None:
+        keep &= df['date'] >= pd.Timestamp(start)
+    if end is not None:
+        keep &= df['date'] <= pd.Timestamp(end)
+    return df[keep].sort_values('date', kind='stable').reset_index(drop=True)
+
+
+def test_day_number():
+    assert day_number("1970-01-02") == 1
+    assert day_number(datetime(2025, 7, 9, 23, 59)) == day_number("2025-07-09")
+    assert day_number(np.datetime64("2025-07-09")) == day_number(pd.Timestamp("2025-07-09"))
+
+
+def test_windows_match_filter(generated_frame):
+    df = generated_frame()
+    store = TransactionStore(df)
+    assert len(store) == len(df)
+    assert store.first_day() == day_number(df['date'].min())
+    assert store.last_day() == day_number(df['date'].max())
+    for start, end in [(None, None), ("2024-01-01", None), (None, "2024-01-01"), ("2024-03-15", "2024-03-15"),
+                       ("2024-02-01", "2024-04-30"), ("2030-01-01", None), ("2024-05-01", "2024-04-01")]:
+        expected = filtered(df, start, end)
+        assert store.count(start, end) == len(expected), (start, end)
+        pd.testing.assert_frame_equal(store.window(start, end).reset_index(drop=True), expected)
+    newest = store.window("2024-02-01", "2024-04-30", newest_first=True)
+    assert newest['date'].is_monotonic_decreasing
+
+
+def test_same_day_rows_keep_their_order(generated_frame):
+    df = generated_frame(500)
+    store = TransactionStore(df)
+    for _, rows in store.frame.groupby('date', sort=False):
+        original = df[df['date'] == rows['date'].iloc[0]]
+        # The sort is stable: rows of one day stay in input order.
+        assert rows['description'].tolist() == original['description'].tolist()
+
+
+def test_last_days_excludes_partial_first_day(generated_frame):
+    df = generated_frame()
+    store = TransactionStore(df)
+    now = datetime(2025, 7, 9, 12, 0)
+    recent = store.last_days(30, now=now)
+    assert recent['date'].is_monotonic_decreasing
+    pd.testing.assert_frame_equal(recent.iloc[::-1].reset_index(drop=True), filtered(df, "2025-06-10"))
+    midnight = store.last_days(30, now=datetime(2025, 7, 9), newest_first=False)
+    pd.testing.assert_frame_equal(midnight.reset_index(drop=True), filtered(df, "2025-06-09"))
+
+
+def test_empty_store(generated_frame):
+    store = TransactionStore(generated_frame().iloc[:0])
+    assert len(store) == 0 and store.first_day() is None and store.last_day() is None
+    assert store.count("2025-01-01") == 0 and store.last_days(30).empty
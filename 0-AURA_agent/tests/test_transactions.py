@@ -0,0 +1,58 @@
+# test_transactions.py
+# Normalizing the compact bankTransactions schema into the typed frame the tools use.
+import numpy as np
+import pandas as pd
+
+from benchmarks import behavior_tools
+from main_agent.sub_agents.financial_behavior_agent.transactions import (COLUMNS, frame_from_records,
+                                                                          frame_to_records,
+                                                                          normalize_bank_transactions,
+                                                                          normalize_rows)
+
+
+def test_typed_columns():
+    df = normalize_bank_transactions({"bankTransactions": [{"bank": "HDFC Bank", "txns": [
+        ["649.00", "UPI-NETFLIX COM-NETFLIXUPI@HDFCBANK-HDFC0000001-512345678901-MONTHLY AUTOPAY",
+         "2025-07-01", 2, 3, "50351.00"],
+        ["85000", "SALARY CREDIT JUL", "2025-07-01", 1, 2, "135351.00"],
+        ["12.5", "TDS ON INTEREST", "2025-06-30", 5, 6, None],
+    ]}]})
+    assert list(df.columns) == COLUMNS
+    assert str(df['date'].dtype) == 'datetime64[ns]'
+    assert df['amount'].tolist() == [649.0, 85000.0, 12.5]
+    assert df['type'].tolist() == ['expense', 'income', 'expense']
+    assert df['category'].tolist() == ['Streaming', 'Salary', 'Interest']
+    assert df['bank'].tolist() == ['HDFC Bank'] * 3
+    assert np.isnan(df['balance'].iloc[2])
+
+
+def test_matches_row_by_row_parse():
+    payload = behavior_tools.generate_payload(2000, banks=behavior_tools.BANKS[:2])
+    df = normalize_bank_transactions(payload)
+    expected = [
+        (pd.Timestamp(txn[2]), float(txn[0]), txn[1], account['bank'], int(txn[3]))
+        for account in payload['bankTransactions'] for txn in account['txns']
+    ]
+    assert list(zip(df['date'], df['amount'], df['description'], df['bank'], df['txn_type'])) == expected
+    assert (df['type'] == df['txn_type'].map({1: 'income', 3: 'income', 4: 'income'}).fillna('expense')).all()
+
+
+def test_invalid_dates_are_dropped():
+    df = normalize_rows([["10", "A", "2025-13-01", 2, 1, "0"], ["20", "B", "2025-01-02", 2, 1, "0"]], ["X", "X"])
+    assert df['description'].tolist() == ["B"]
+    assert df.index.tolist() == [0]
+
+
+def test_empty_payload_and_extra_columns():
+    for payload in (None, {}, {"bankTransactions": []}, {"bankTransactions": [{"bank": "X", "txns": []}]}):
+        df = normalize_bank_transactions(payload)
+        assert df.empty and list(df.columns) == COLUMNS
+    df = normalize_rows([["10", "A", "2025-01-02", 2, 1, "0"]], ["X"], extra={"user_id": ["u1"]})
+    assert list(df.columns) == COLUMNS + ["user_id"]
+    assert normalize_rows([], [], extra={"user_id": []}).columns[-1] == "user_id"
+
+
+def test_records_round_trip(generated_frame):
+    df = generated_frame(200, banks=behavior_tools.BANKS[:2])
+    back = frame_from_records(frame_to_records(df))
+    pd.testing.assert_frame_equal(back[COLUMNS], df, check_dtype=False)
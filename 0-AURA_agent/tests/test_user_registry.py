@@ -0,0 +1,128 @@
+# test_user_registry.py
+# Two poller replicas sharing one membership and one persisted user list.
+import time
+
+from main_agent.tools.user_registry import ActiveUserRegistry, HashRing, shard_of
+
+
+class FakeMembership:
+    """In-memory stand-in for FirebaseMembership (same heartbeat/leave/live_workers calls)."""
+
+    def __init__(self, dead_after=3000.0):
+        self.dead_after = dead_after
+        self.beats = {}
+
+    def heartbeat(self, worker_id):
+        self.beats[worker_id] = time.time()
+
+    def leave(self, worker_id):
+        self.beats.pop(worker_id, None)
+
+    def live_workers(self):
+        cutoff = time.time() - self.dead_after
+        return [worker for worker, beat in self.beats.items() if beat >= cutoff]
+
+
+def replicas(persisted, membership):
+    return [ActiveUserRegistry(num_shards=16, worker_id=worker, membership=membership, heartbeat_interval=1000.0,
+                               user_source=lambda: list(persisted))
+            for worker in ("poller-a", "poller-b")]
+
+
+def refresh(*registries):
+    for registry in registries:
+        registry.refresh_membership(force=True)
+
+
+def test_every_user_polled_by_exactly_one_replica():
+    persisted = [f"user-{i}" for i in range(40)]
+    membership = FakeMembership()
+    a, b = replicas(persisted, membership)
+    a.start()
+    b.start()
+    try:
+        refresh(a, b)
+        assert a.owned_shards().isdisjoint(b.owned_shards())
+        assert a.owned_shards() | b.owned_shards() == set(range(16))
+        assert sorted(a.owned_users() + b.owned_users()) == sorted(persisted)
+    finally:
+        a.leave()
+        b.leave()
+
+
+def test_user_added_after_start_reaches_its_shard_owner():
+    persisted = ["user-0"]
+    membership = FakeMembership()
+    a, b = replicas(persisted, membership)
+    a.start()
+    b.start()
+    try:
+        refresh(a, b)
+        # A user that lives in one of b's shards registers through a (which persists it).
+        ring = HashRing(["poller-a", "poller-b"])
+        newcomer = next(f"user-{i}" for i in range(1, 1000)
+                        if ring.owner(f"shard-{shard_of(f'user-{i}', 16)}") == "poller-b")
+        persisted.append(newcomer)
+        a.add(newcomer)
+        assert newcomer not in a.owned_users() and newcomer not in b.owned_users()
+        refresh(a, b)
+        assert newcomer in b.owned_users() and newcomer not in a.owned_users()
+    finally:
+        a.leave()
+        b.leave()
+
+
+def test_reload_drops_removed_users_and_survives_errors():
+    persisted = ["user-1", "user-2"]
+    registry = ActiveUserRegistry(num_shards=16, user_source=lambda: list(persisted))
+    registry.reload_users()
+    assert sorted(registry) == ["user-1", "user-2"]
+    persisted.remove("user-1")
+    registry.reload_users()
+    assert list(registry) == ["user-2"]
+
+    def broken():
+        raise RuntimeError("offline")
+    registry.user_source = broken
+    registry.reload_users()
+    assert list(registry) == ["user-2"]
+
+
+def test_leaving_replica_hands_over_its_shards():
+    persisted = [f"user-{i}" for i in range(20)]
+    membership = FakeMembership()
+    a, b = replicas(persisted, membership)
+    a.start()
+    b.start()
+    refresh(a, b)
+    b.leave()
+    refresh(a)
+    try:
+        assert a.owned_shards() == set(range(16)) and sorted(a.owned_users()) == sorted(persisted)
+    finally:
+        a.leave()
+
+
+def test_users_no_longer_polled_here_are_released():
+    persisted = [f"user-{i}" for i in range(40)]
+    membership = FakeMembership()
+    released = []
+    a = ActiveUserRegistry(num_shards=16, worker_id="poller-a", membership=membership, heartbeat_interval=1000.0,
+                           user_source=lambda: list(persisted), on_release=released.append)
+    b = replicas(persisted, membership)[1]
+    a.start()
+    try:
+        refresh(a)
+        assert released == [] and len(a.owned_users()) == 40
+        persisted.remove("user-0")
+        refresh(a)
+        a.discard("user-1")
+        assert released == ["user-0", "user-1"]
+        # b joins: the users in the shards that moved to b are released by a.
+        released.clear()
+        b.start()
+        refresh(a, b)
+        assert sorted(released) == sorted(b.owned_users()) and released
+    finally:
+        a.leave()
+        b.leave()